@@ -1,10 +1,16 @@
 from nbodykit.lab import *
-from nbodykit import setup_logging
+from nbodykit import setup_logging, set_options
+from nbodykit.utils import affinity_nthreads
 import pytest
 
 setup_logging()
 
-def test_strong_scaling(benchmark, sample):
+@pytest.mark.parametrize('layout', ['mpi', 'hybrid'])
+def test_strong_scaling(benchmark, sample, layout):
+
+    # pure MPI runs one Corrfunc thread per rank; the hybrid layout runs
+    # as many threads as the cores each rank is bound to
+    nthreads = 1 if layout == 'mpi' else affinity_nthreads(CurrentMPIComm.get())
 
     # generate fake data
     with benchmark("Data"):
@@ -19,7 +25,8 @@ def test_strong_scaling(benchmark, sample):
         edges = numpy.linspace(10., 150.0, nbins+1)
 
         # run the algorithm
-        r = SimulationBoxPairCount('2d', data, edges, periodic=True, Nmu=Nmu)
+        with set_options(corrfunc_nthreads=nthreads):
+            r = SimulationBoxPairCount('2d', data, edges, periodic=True, Nmu=Nmu)
 
     # save meta-data
-    benchmark.attrs.update(N=sample.N, sample=sample.name)
+    benchmark.attrs.update(N=sample.N, sample=sample.name, layout=layout, nthreads=nthreads)
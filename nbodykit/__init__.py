@@ -5,6 +5,10 @@ from mpi4py import MPI
 import dask
 
 import warnings
+import atexit
+import shutil
+import os
+import weakref
 
 
 try:
@@ -19,6 +23,20 @@ _global_options = {}
 _global_options['global_cache_size'] = 1e8 # 100 MB
 _global_options['dask_chunk_size'] = 100000
 _global_options['paint_chunk_size'] = 1024 * 1024 * 4
+_global_options['selection_pushdown'] = False
+_global_options['column_cache_dir'] = None
+_global_options['column_cache_size'] = 1e10 # 10 GB
+_global_options['data_stats_cache_size'] = 1024
+_global_options['save_queue_size'] = 8
+_global_options['mesh_cache_dir'] = None
+_global_options['mesh_cache_size'] = 1e10 # 10 GB
+_global_options['paircount_cache_dir'] = None
+_global_options['paircount_cache_size'] = 1e9 # 1 GB
+_global_options['global_cache_spill_dir'] = None
+_global_options['global_cache_spill_size'] = 1e10 # 10 GB
+_global_options['threads_per_rank'] = 1
+_global_options['merge_common_tasks'] = False
+_global_options['corrfunc_nthreads'] = None
 
 from contextlib import contextmanager
 import logging
@@ -190,10 +208,120 @@ class CurrentMPIComm(object):
         cls._stack[-1].barrier()
 
 import dask.cache
+import cachey
+
+class _CacheStore(cachey.Cache):
+    """
+    The storage of :class:`GlobalCache`: a :class:`cachey.Cache` that
+    counts hits and evictions, never evicts pinned keys, and optionally
+    spills evicted arrays to memory mapped files instead of dropping them.
+    """
+    def __init__(self, available_bytes):
+        cachey.Cache.__init__(self, available_bytes)
+        self.pinned = {} # key -> number of times pinned
+        self.spilled = {} # key -> (filename, nbytes), in order of spilling
+        self.spilldir = None
+        self.stats = dict(hits=0, misses=0, evictions=0, spills=0, spill_hits=0)
+
+    @property
+    def spilled_bytes(self):
+        return sum(nbytes for filename, nbytes in self.spilled.values())
+
+    def put(self, key, value, cost, nbytes=None):
+        if key in self.pinned and key not in self.data:
+            if nbytes is None:
+                nbytes = self.get_nbytes(value)
+            self.data[key] = value
+            self.heap[key] = self.scorer.touch(key, cost)
+            self.nbytes[key] = nbytes
+            self.total_bytes += nbytes
+            self.shrink()
+        else:
+            cachey.Cache.put(self, key, value, cost, nbytes=nbytes)
+
+    def shrink(self):
+        # never evict pinned keys; put them back afterwards
+        held = []
+        while self.total_bytes > self.available_bytes and self.heap:
+            key, score = self.heap.popitem()
+            if key in self.pinned:
+                held.append((key, score))
+                continue
+            value = self.data[key]
+            self.retire(key)
+            self.stats['evictions'] += 1
+            self._spill(key, value)
+        for key, score in held:
+            self.heap[key] = score
+
+    def _spill(self, key, value):
+        """
+        Write an evicted array to the spill area, if enabled.
+        """
+        import numpy
+        import tempfile
+        from dask.base import tokenize
+
+        path = _global_options['global_cache_spill_dir']
+        if path is None or not isinstance(value, numpy.ndarray) or value.dtype.hasobject:
+            return
+        if value.nbytes > _global_options['global_cache_spill_size']:
+            return
+
+        if self.spilldir is None or not os.path.isdir(self.spilldir):
+            if not os.path.isdir(path):
+                os.makedirs(path)
+            self.spilldir = tempfile.mkdtemp(dir=path, prefix='nbodykit-cache-')
+            atexit.register(shutil.rmtree, self.spilldir, True)
+
+        # drop the oldest spilled arrays to make room
+        while self.spilled and self.spilled_bytes + value.nbytes > _global_options['global_cache_spill_size']:
+            self.unspill(next(iter(self.spilled)))
+
+        filename = os.path.join(self.spilldir, tokenize(key) + '.npy')
+        numpy.save(filename, value)
+        self.spilled[key] = (filename, value.nbytes)
+        self.stats['spills'] += 1
+
+    def load_spilled(self, key):
+        """
+        Return the spilled value of ``key``, memory mapped.
+        """
+        import numpy
+        filename, nbytes = self.spilled[key]
+        mmap_mode = 'r' if nbytes > 0 else None
+        return numpy.load(filename, mmap_mode=mmap_mode)
+
+    def unspill(self, key):
+        filename, nbytes = self.spilled.pop(key)
+        try:
+            os.remove(filename)
+        except OSError:
+            pass
+
+    def clear(self):
+        cachey.Cache.clear(self)
+        for key in list(self.spilled):
+            self.unspill(key)
+
 class GlobalCache(dask.cache.Cache):
     """
-        A Cache object.
+    A Cache object, holding the results of dask tasks across computations.
+
+    In addition to :class:`dask.cache.Cache`, this cache counts hits,
+    misses and evictions, keeps the size of each entry (:func:`usage`), can
+    pin keys (e.g., the columns of a catalog, see
+    :func:`~nbodykit.base.catalog.CatalogSource.pin`) such that they are
+    never evicted, and can spill evicted arrays to memory mapped files,
+    if the ``global_cache_spill_dir`` option is set; see :class:`set_options`.
+
+    Use :func:`report` to summarize the cache across ranks.
     """
+    logger = logging.getLogger('GlobalCache')
+
+    def __init__(self, cache):
+        dask.cache.Cache.__init__(self, _CacheStore(cache))
+        self._owners = {} # id -> weak reference to the owner of pinned keys
 
     @classmethod
     def get(cls):
@@ -209,9 +337,156 @@ class GlobalCache(dask.cache.Cache):
         # if not created, use default cache size
         return _global_cache
 
+    def _start(self, dsk):
+        from dask.core import istask
+
+        self.durations = dict()
+        store = self.cache
+        for key in dsk:
+            if key in store.data:
+                dsk[key] = store.data[key]
+                store.stats['hits'] += 1
+            elif key in store.spilled:
+                dsk[key] = store.load_spilled(key)
+                store.stats['spill_hits'] += 1
+            elif istask(dsk[key]):
+                # only tasks are looked up; literals and aliases are not cached
+                store.stats['misses'] += 1
+
+    def usage(self):
+        """
+        Return a dictionary of the number of bytes used by each key in
+        memory on this rank.
+        """
+        return dict(self.cache.nbytes)
+
+    def pin(self, keys, owner=None):
+        """
+        Pin dask keys in the cache, such that they are never evicted;
+        keys not yet in the cache are kept once computed.
+
+        Keys can be pinned several times, e.g. by catalogs sharing
+        columns, and stay pinned until unpinned as many times.
+
+        Parameters
+        ----------
+        keys : iterable
+            the dask keys to pin
+        owner : object, optional
+            if given, the keys are unpinned once ``owner`` is garbage
+            collected
+        """
+        keys = list(keys)
+        pinned = self.cache.pinned
+        for key in keys:
+            pinned[key] = pinned.get(key, 0) + 1
+
+        if owner is not None:
+            # do not shrink from the garbage collector; the unpinned keys
+            # are evicted by the next shrink of the cache
+            def callback(ref):
+                self._owners.pop(id(ref), None)
+                self.unpin(keys, shrink=False)
+            ref = weakref.ref(owner, callback)
+            self._owners[id(ref)] = ref
+
+    def unpin(self, keys, shrink=True):
+        """
+        Unpin dask keys once, such that they can be evicted again when
+        unpinned as many times as they were pinned.
+
+        Parameters
+        ----------
+        keys : iterable
+            the dask keys to unpin
+        shrink : bool, optional
+            whether to evict entries beyond the size of the cache now
+        """
+        pinned = self.cache.pinned
+        for key in keys:
+            if key not in pinned:
+                continue
+            pinned[key] -= 1
+            if pinned[key] == 0:
+                del pinned[key]
+        if shrink:
+            self.cache.shrink()
+
+    def report(self, comm=None, top=5):
+        """
+        Summarize the usage and efficiency of the cache across ranks, and
+        log the summary on rank 0.
+
+        Parameters
+        ----------
+        comm : MPI.Communicator, optional
+            the ranks to summarize; default is the current communicator
+        top : int, optional
+            the number of largest keys to report
+
+        Returns
+        -------
+        dict :
+            the counters and sizes summed over ranks: ``entries``,
+            ``nbytes``, ``available_bytes``, ``pinned_bytes``,
+            ``spilled_entries``, ``spilled_bytes``, ``hits``,
+            ``spill_hits``, ``misses``, ``evictions``, ``spills``, and
+            ``hit_rate``; and ``largest``, a list of the ``top`` largest
+            ``(key, nbytes, rank)`` entries
+        """
+        if comm is None:
+            comm = CurrentMPIComm.get()
+
+        store = self.cache
+        local = dict(store.stats)
+        local['entries'] = len(store.data)
+        local['nbytes'] = store.total_bytes
+        local['available_bytes'] = store.available_bytes
+        local['pinned_bytes'] = sum(store.nbytes.get(key, 0) for key in store.pinned)
+        local['spilled_entries'] = len(store.spilled)
+        local['spilled_bytes'] = store.spilled_bytes
+
+        total = {}
+        for key in sorted(local):
+            total[key] = comm.allreduce(local[key])
+
+        largest = sorted(store.nbytes.items(), key=lambda item: -item[1])[:top]
+        largest = sum(comm.allgather([(str(key), nbytes, comm.rank) for key, nbytes in largest]), [])
+        total['largest'] = sorted(largest, key=lambda item: -item[1])[:top]
+
+        lookups = total['hits'] + total['spill_hits'] + total['misses']
+        total['hit_rate'] = (total['hits'] + total['spill_hits']) / lookups if lookups else 0.
+
+        if comm.rank == 0:
+            self.logger.info("cache on %d ranks: %d entries, %.1f MB in memory (%.1f MB pinned), "
+                        "%d entries, %.1f MB spilled" % (comm.size, total['entries'],
+                        total['nbytes'] / 1024.**2, total['pinned_bytes'] / 1024.**2,
+                        total['spilled_entries'], total['spilled_bytes'] / 1024.**2))
+            self.logger.info("cache hits %d (%d from spill), misses %d, hit rate %.1f%%, "
+                        "evictions %d, spills %d" % (total['hits'] + total['spill_hits'],
+                        total['spill_hits'], total['misses'], 100 * total['hit_rate'],
+                        total['evictions'], total['spills']))
+            for key, nbytes, rank in total['largest']:
+                self.logger.info("cache key %s: %.1f MB on rank %d" % (key, nbytes / 1024.**2, rank))
+
+        return total
+
 _global_cache = GlobalCache(_global_options['global_cache_size'])
 _global_cache.register()
 
+_thread_pools = {}
+def _get_thread_pool(nthreads):
+    """
+    Return the pool of ``nthreads`` worker threads used to compute dask
+    graphs on this rank; the pool is created once and reused.
+    """
+    from multiprocessing.pool import ThreadPool
+    if nthreads not in _thread_pools:
+        pool = ThreadPool(nthreads)
+        atexit.register(pool.terminate)
+        _thread_pools[nthreads] = pool
+    return _thread_pools[nthreads]
+
 class set_options(object):
     """
     Set global configuration options.
@@ -223,9 +498,69 @@ class set_options(object):
         chunks should usually hold between 10 MB and 100 MB
     global_cache_size : float
         the size of the internal dask cache in bytes; default is 1e9
+    global_cache_spill_dir : str
+        if set, the arrays evicted from the internal dask cache are spilled
+        to memory mapped files in this directory, instead of being dropped;
+        default is None
+    global_cache_spill_size : float
+        the maximum size of the spilled arrays in bytes; default is 1e10
     paint_chunk_size : int
         the number of objects to paint at the same time. This is independent
         from dask chunksize.
+    threads_per_rank : int
+        the number of threads each rank uses to compute the chunks of
+        dask graphs in :func:`~nbodykit.base.catalog.CatalogSource.compute`;
+        only the chunks run on the threads, while the scheduler and the MPI
+        calls stay on the main thread. Useful when running fewer ranks than
+        cores, e.g., one rank per socket. Default is 1, single-threaded
+    corrfunc_nthreads : int
+        the number of OpenMP threads each rank uses in the :mod:`Corrfunc`
+        pair counting functions; with the default, None, the number is
+        set from the CPU affinity of the ranks, sharing the cores of a node
+        between the ranks bound to them; see
+        :func:`~nbodykit.utils.affinity_nthreads`
+    merge_common_tasks : bool
+        if True, :func:`~nbodykit.base.catalog.CatalogSource.compute` merges
+        the tasks that compute the same function of the same arguments under
+        different keys, such that they run once; only valid if all the
+        functions in the graph are pure, e.g., not drawing random numbers.
+        Default is False
+    selection_pushdown : bool
+        if True, evaluate the ``Selection`` column first when painting
+        or computing data bounds, and read the other columns only at the
+        selected rows if the catalog supports it (e.g. columns read from
+        files); default is False
+    column_cache_dir : str
+        the directory of the on-disk column cache used by
+        :func:`~nbodykit.base.catalog.CatalogSource.checkpoint`; default is
+        None, no cache
+    column_cache_size : float
+        the maximum size of the on-disk column cache in bytes; the least
+        recently used columns are evicted beyond this size; default is 1e10
+    data_stats_cache_size : int
+        the number of summary statistics of columns, e.g. their bounds,
+        kept in memory by :func:`~nbodykit.utils.get_data_stats`; setting
+        it to 0 disables and clears this cache; default is 1024
+    save_queue_size : int
+        the maximum number of computed chunks waiting to be written by
+        :func:`~nbodykit.base.catalog.CatalogSource.save` with
+        ``overlap=True``; default is 8
+    mesh_cache_dir : str
+        the directory of the on-disk cache of painted meshes; if set,
+        :class:`~nbodykit.source.mesh.catalog.CatalogMesh` loads a mesh
+        painted before with the same columns and parameters from the cache
+        instead of painting it again; default is None, no cache
+    mesh_cache_size : float
+        the maximum size of the on-disk mesh cache in bytes; the least
+        recently used meshes are evicted beyond this size; default is 1e10
+    paircount_cache_dir : str
+        the directory of the on-disk cache of random - random pair counts;
+        if set, the Landy-Szalay estimator loads the pairs of randoms counted
+        before with the same randoms and binning from the cache instead of
+        counting them again; default is None, no cache
+    paircount_cache_size : float
+        the maximum size of the on-disk pair count cache in bytes; the least
+        recently used pair counts are evicted beyond this size; default is 1e9
     """
     def __init__(self, **kwargs):
         self.old = _global_options.copy()
@@ -242,6 +577,10 @@ class set_options(object):
             cache.available_bytes = _global_options['global_cache_size']
             cache.shrink()
 
+        if 'data_stats_cache_size' in kwargs:
+            from nbodykit.utils import _trim_data_stats_cache
+            _trim_data_stats_cache()
+
     def __enter__(self):
         return
 
@@ -255,6 +594,9 @@ class set_options(object):
         cache.available_bytes = _global_options['global_cache_size']
         cache.shrink()
 
+        from nbodykit.utils import _trim_data_stats_cache
+        _trim_data_stats_cache()
+
 _logging_handler = None
 def setup_logging(log_level="info"):
     """
@@ -15,6 +15,7 @@ from .cgm import CylindricalGroups
 from .pair_counters import SurveyDataPairCount, SimulationBoxPairCount
 from .paircount_tpcf import SurveyData2PCF, SimulationBox2PCF
 from .threeptcf import SimulationBox3PCF, SurveyData3PCF
+from .hybridcorr import HybridCorr
 
 # miscellaneous
 from .kdtree import KDDensity
@@ -36,6 +37,7 @@ __all__ = ['FFTPower',
            'SimulationBoxPairCount',
            'SimulationBox2PCF',
            'SimulationBox3PCF',
+           'HybridCorr',
            'KDDensity',
            'RedshiftHistogram',
            'FFTRecon',
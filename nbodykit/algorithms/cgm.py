@@ -8,6 +8,7 @@ import warnings
 
 from nbodykit import CurrentMPIComm
 from nbodykit.source.catalog import ArrayCatalog
+from nbodykit.utils import ExchangeColumns
 
 class CylindricalGroups(object):
     """
@@ -46,6 +47,10 @@ class CylindricalGroups(object):
     BoxSize : float, 3-vector, optional
         the size of the box of the input data; must be provided as
         a keyword or in ``source.attrs`` if ``periodic=True``
+    decomposition : 'grid', 'bisection', optional
+        the domain decomposition; ``'grid'`` splits the bounding box of
+        the data evenly, and ``'bisection'`` recursively bisects the actual
+        distribution of the data, which balances clustered or survey data
 
     References
     ----------
@@ -56,7 +61,7 @@ class CylindricalGroups(object):
     logger = logging.getLogger('CylindricalGroups')
 
     def __init__(self, source, rankby, rperp, rpar, flat_sky_los=None,
-                    periodic=False, BoxSize=None):
+                    periodic=False, BoxSize=None, decomposition='grid'):
 
         if 'Position' not in source:
             raise ValueError("the 'Position' column must be defined in the input source")
@@ -82,6 +87,9 @@ class CylindricalGroups(object):
             raise ValueError("please specify a BoxSize if using periodic boundary conditions")
         self.attrs['BoxSize'][:] = BoxSize
 
+        if decomposition not in ['grid', 'bisection']:
+            raise ValueError("decomposition should be 'grid' or 'bisection', not '%s'" % decomposition)
+
         # LOS must be unit vector
         if flat_sky_los is not None:
             if numpy.isscalar(flat_sky_los) or len(flat_sky_los) != 3:
@@ -100,6 +108,7 @@ class CylindricalGroups(object):
         self.attrs['periodic'] = periodic
         self.attrs['rankby'] = rankby
         self.attrs['flat_sky_los'] = flat_sky_los
+        self.attrs['decomposition'] = decomposition
 
         # log some info
         if self.comm.rank == 0:
@@ -141,6 +150,7 @@ class CylindricalGroups(object):
         """
         from pmesh.domain import GridND
         from nbodykit.algorithms.fof import split_size_3d
+        from nbodykit.algorithms.pair_counters.domain import BisectionDomain
 
         comm = self.comm
         rperp, rpar = self.attrs['rperp'], self.attrs['rpar']
@@ -151,10 +161,6 @@ class CylindricalGroups(object):
         else:
             boxsize = None
 
-        np = split_size_3d(self.comm.size)
-        if self.comm.rank == 0:
-            self.logger.info("using cpu grid decomposition: %s" %str(np))
-
         # add a column for original index
         self.source['origind'] = self.source.Index
 
@@ -164,18 +170,29 @@ class CylindricalGroups(object):
         # add a column to track sorted index
         data['sortindex'] = data.Index
 
-        # global min/max across all ranks
         pos = data.compute(data['Position'])
-        posmin = numpy.asarray(comm.allgather(pos.min(axis=0))).min(axis=0)
-        posmax = numpy.asarray(comm.allgather(pos.max(axis=0))).max(axis=0)
 
         # domain decomposition
-        grid = [
-            numpy.linspace(posmin[0], posmax[0], np[0] + 1, endpoint=True),
-            numpy.linspace(posmin[0], posmax[1], np[1] + 1, endpoint=True),
-            numpy.linspace(posmin[0], posmax[2], np[2] + 1, endpoint=True),
-        ]
-        domain = GridND(grid, comm=comm)
+        if self.attrs['decomposition'] == 'bisection':
+            if self.comm.rank == 0:
+                self.logger.info("using bisection domain decomposition")
+            domain = BisectionDomain.from_positions(pos, comm, BoxSize=boxsize)
+
+        else:
+            np = split_size_3d(self.comm.size)
+            if self.comm.rank == 0:
+                self.logger.info("using cpu grid decomposition: %s" %str(np))
+
+            # global min/max across all ranks
+            posmin = numpy.asarray(comm.allgather(pos.min(axis=0))).min(axis=0)
+            posmax = numpy.asarray(comm.allgather(pos.max(axis=0))).max(axis=0)
+
+            grid = [
+                numpy.linspace(posmin[0], posmax[0], np[0] + 1, endpoint=True),
+                numpy.linspace(posmin[0], posmax[1], np[1] + 1, endpoint=True),
+                numpy.linspace(posmin[0], posmax[2], np[2] + 1, endpoint=True),
+            ]
+            domain = GridND(grid, comm=comm)
 
         # run the CGM algorithm
         groups = cgm(comm, data, domain, rperp, rpar, self.attrs['flat_sky_los'], boxsize)
@@ -238,17 +255,13 @@ def cgm(comm, data, domain, rperp, rpar, los, boxsize):
 
     pos0, origind0, sortindex0 = data.compute(data['Position'], data['origind'], data['sortindex'])
 
-    layout1    = domain.decompose(pos0, smoothing=0)
-    pos1       = layout1.exchange(pos0)
-    origind1   = layout1.exchange(origind0)
-    sortindex1 = layout1.exchange(sortindex0)
+    layout1 = domain.decompose(pos0, smoothing=0)
+    pos1, origind1, sortindex1 = ExchangeColumns(layout1, pos0, origind0, sortindex0)
 
     # exchange particles across ranks, accounting for smoothing radius
-    layout2    = domain.decompose(pos1, smoothing=rmax)
-    pos2       = layout2.exchange(pos1)
-    origind2   = layout2.exchange(origind1)
-    sortindex2 = layout2.exchange(sortindex1)
-    startrank  = layout2.exchange(numpy.ones(len(pos1), dtype='i4')*comm.rank)
+    layout2 = domain.decompose(pos1, smoothing=rmax)
+    startrank = numpy.ones(len(pos1), dtype='i4')*comm.rank
+    pos2, origind2, sortindex2, startrank = ExchangeColumns(layout2, pos1, origind1, sortindex1, startrank)
 
     # make the KD-tree
     tree1 = kdcount.KDTree(pos1, boxsize=boxsize).root
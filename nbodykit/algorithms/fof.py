@@ -6,6 +6,7 @@ from mpi4py import MPI
 from nbodykit.source.catalog import ArrayCatalog
 from nbodykit.utils import split_size_3d
 from nbodykit.utils import DistributedArray
+from nbodykit.utils import ExchangeColumns
 
 class FOF(object):
     """
@@ -280,7 +281,10 @@ def _fof_local(layout, pos, boxsize, ll, comm):
 
     N = len(pos)
 
-    pos = layout.exchange(pos)
+    PID = numpy.arange(N, dtype='intp')
+    PID += numpy.sum(comm.allgather(N)[:comm.rank], dtype='intp')
+
+    pos, PID = ExchangeColumns(layout, pos, PID)
     if boxsize is not None:
         pos %= boxsize
     data = cluster.dataset(pos, boxsize=boxsize)
@@ -288,10 +292,6 @@ def _fof_local(layout, pos, boxsize, ll, comm):
     labels = fof.labels
     del fof
 
-    PID = numpy.arange(N, dtype='intp')
-    PID += numpy.sum(comm.allgather(N)[:comm.rank], dtype='intp')
-
-    PID = layout.exchange(PID)
     # initialize global labels
     minid = equiv_class(labels, PID, op=numpy.fmin)[labels]
 
@@ -457,8 +457,6 @@ def fof_catalog(source, label, comm,
         sorted such that the most massive halo is first. ``catalog[0]``
         does not correspond to any halo.
     """
-    from nbodykit.utils import ScatterArray
-
     # make sure all of the columns are there
     for col in [position, velocity]:
         if col not in source:
@@ -502,24 +500,29 @@ def fof_catalog(source, label, comm,
         ppos = centerofmass(label1, source.compute(source[position]), boxsize=boxsize, comm=comm)
         pvel = centerofmass(label1, source.compute(source[velocity]), boxsize=None, comm=comm)
 
+    # all ranks have the properties of all halos, so each rank fills its
+    # even share of the catalog, without sending it through the root
+    counts = numpy.zeros(comm.size, dtype='intp') + len(N) // comm.size
+    counts[:len(N) % comm.size] += 1
+    start = counts[:comm.rank].sum()
+    sl = slice(start, start + counts[comm.rank])
+
     dtype = numpy.dtype(dtype)
-    if comm.rank == 0:
-        catalog = numpy.empty(shape=len(N), dtype=dtype)
+    catalog = numpy.empty(shape=counts[comm.rank], dtype=dtype)
 
-        catalog['CMPosition'] = hpos
-        catalog['CMVelocity'] = hvel
-        catalog['Length'] = N
+    catalog['CMPosition'] = hpos[sl]
+    catalog['CMVelocity'] = hvel[sl]
+    catalog['Length'] = N[sl]
+    if start == 0 and len(catalog) > 0:
         catalog['Length'][0] = 0
-        if 'InitialPosition' in dtype.names:
-            catalog['InitialPosition'] = hpos_init
+    if 'InitialPosition' in dtype.names:
+        catalog['InitialPosition'] = hpos_init[sl]
 
-        if peakcolumn is not None:
-            catalog['PeakPosition'] = ppos
-            catalog['PeakVelocity'] = pvel
-    else:
-        catalog = None
+    if peakcolumn is not None:
+        catalog['PeakPosition'] = ppos[sl]
+        catalog['PeakVelocity'] = pvel[sl]
 
-    return ScatterArray(catalog, comm, root=0)
+    return catalog
 
 # -----------------------
 # Helpers
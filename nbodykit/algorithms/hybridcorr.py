@@ -0,0 +1,345 @@
+import numpy
+import logging
+import warnings
+from six import string_types
+
+from nbodykit import CurrentMPIComm
+
+class HybridCorr(object):
+    r"""
+    Compute the 1d or 2d correlation function in a periodic simulation box,
+    using direct pair counts on small scales and a Fast Fourier Transform
+    (FFT) on large scales.
+
+    Direct pair counting costs :math:`\mathcal{O}(N n r_\mathrm{max}^3)`,
+    which is prohibitive out to large separations in big simulations,
+    while the FFT estimator of :class:`~nbodykit.algorithms.fftcorr.FFTCorr`
+    reaches any scale for the cost of a single FFT, but is smoothed by the
+    mesh on scales of a few cells. Here, the bins below the crossover
+    scale ``rcross`` are computed by
+    :class:`~nbodykit.algorithms.paircount_tpcf.tpcf.SimulationBox2PCF`,
+    with a maximum separation just beyond ``rcross``, and the bins above it by
+    :class:`~nbodykit.algorithms.fftcorr.FFTCorr`.
+
+    The two estimates are matched at the crossover as follows:
+
+    - the mesh is compensated for the mass assignment window and
+      interlaced, such that the FFT estimate is unbiased down to a few
+      cells; see :attr:`min_cross_cells`
+    - the FFT estimate is measured at each of the distinct separations of
+      the mesh, and averaged into the requested bins weighting each
+      separation by its number of cell pairs, as the pair counts weight the
+      separations of the pairs within a bin
+    - both estimates are computed in the ``overlap`` bins above the
+      crossover, and the difference is stored as the
+      ``crossover_residual`` attribute of :attr:`corr`, to check that the
+      crossover is at large enough scales
+
+    Results are computed when the object is inititalized. See the
+    documenation of :func:`~HybridCorr.run` for the attributes storing the
+    results.
+
+    Parameters
+    ----------
+    mode : '1d', '2d'
+        compute the correlation function as a function of :math:`r` or of
+        :math:`(r,\mu)`
+    data1 : CatalogSource
+        the data catalog, providing the position column
+    edges : array_like
+        the separation bin edges; ``rcross`` should be one of them
+    rcross : float
+        the crossover separation; the bins below are computed from direct
+        pair counts, and the bins above from FFTs
+    Nmesh : int, 3-vector
+        the number of cells per side of the mesh of the FFTs
+    Nmu : int, optional
+        the number of :math:`\mu` bins, ranging from 0 to 1; requred if
+        ``mode='2d'``
+    data2 : CatalogSource, optional
+        the second data catalog to cross-correlate
+    BoxSize : float, 3-vector, optional
+        the size of the box; if 'BoxSize' is not provided in the source
+        'attrs', it must be provided here
+    los : {'x', 'y', 'z'}, int, optional
+        the axis of the simulation box to treat as the line-of-sight direction
+    resampler : str, optional
+        the mass assignment window used to paint the mesh
+    interlaced : bool, optional
+        whether to interlace the mesh, reducing the aliasing of the FFT
+        estimate near the crossover
+    overlap : int, optional
+        the number of bins above the crossover computed with both
+        estimators, to check the match
+    weight : str, optional
+        the name of the column in the source specifying the particle weights
+    position : str, optional
+        name of the column of the position of particles
+    show_progress : bool, optional
+        if ``True``, log the progress of the pair counting
+    **config : key/value pairs
+        additional keywords to pass to the :mod:`Corrfunc` function
+    """
+    logger = logging.getLogger('HybridCorr')
+
+    #: the smallest crossover scale in units of the mesh cell size; the FFT
+    #: estimate is smoothed by the mass assignment window below a few cells
+    min_cross_cells = 4
+
+    def __init__(self, mode, data1, edges, rcross, Nmesh, Nmu=None, data2=None,
+                    BoxSize=None, los='z', resampler='tsc', interlaced=True, overlap=1,
+                    weight='Weight', position='Position', show_progress=False, **config):
+
+        from .pair_counters.base import verify_input_sources
+
+        if mode not in ['1d', '2d']:
+            raise ValueError("`mode` should be either '1d' or '2d'")
+        if mode == '2d' and Nmu is None:
+            raise ValueError("'Nmu' keyword is required when 'mode' is '2d'")
+        if mode == '1d':
+            Nmu = None
+
+        # the line-of-sight axis
+        if isinstance(los, string_types):
+            if not los in 'xyz':
+                raise ValueError("``los`` should be one of 'x', 'y', 'z'")
+            los = 'xyz'.index(los)
+        if isinstance(los, int):
+            if los < 0: los += 3
+        if los not in [0,1,2]:
+            raise ValueError("``los`` should be either ['x', 'y', 'z'] or [0,1,2]")
+
+        self.comm = data1.comm
+        BoxSize = verify_input_sources(data1, data2, BoxSize, [position, weight])
+        _Nmesh = numpy.empty(3, dtype='i8')
+        _Nmesh[:] = Nmesh
+        Nmesh = _Nmesh
+
+        # the crossover should be a bin edge
+        edges = numpy.array(edges, dtype='f8')
+        if edges.min() <= 0.:
+            raise ValueError(("the lower edge of the 1st separation bin must "
+                              "greater than zero (no self-pairs)"))
+        if not numpy.isclose(edges, rcross).any():
+            raise ValueError("the crossover ``rcross`` should be one of the bin ``edges``")
+        ncross = int(numpy.argmin(abs(edges - rcross)))
+        if edges.max() > 0.5 * BoxSize.min():
+            raise ValueError("the correlation function cannot be computed for Rmax > BoxSize/2")
+
+        cellsize = (BoxSize / Nmesh).max()
+        if ncross < len(edges) - 1 and rcross < self.min_cross_cells * cellsize:
+            msg = ("the crossover rcross = %g is smaller than %d mesh cells; the FFT estimate "
+                   "will be smoothed by the mesh near the crossover. Try increasing Nmesh "
+                   "and/or rcross." % (rcross, self.min_cross_cells))
+            warnings.warn(msg)
+
+        self.data1 = data1
+        self.data2 = data2
+
+        # store the meta-data
+        self.attrs = {}
+        self.attrs['mode'] = mode
+        self.attrs['edges'] = edges
+        self.attrs['rcross'] = edges[ncross]
+        self.attrs['Nmesh'] = Nmesh
+        self.attrs['Nmu'] = Nmu
+        self.attrs['BoxSize'] = BoxSize
+        self.attrs['los'] = los
+        self.attrs['resampler'] = resampler
+        self.attrs['interlaced'] = interlaced
+        self.attrs['overlap'] = overlap
+        self.attrs['weight'] = weight
+        self.attrs['position'] = position
+        self.attrs['show_progress'] = show_progress
+        self.attrs['config'] = config
+
+        self.run()
+
+    def run(self):
+        r"""
+        Compute the correlation function from the direct pair counts
+        below the crossover, and from FFTs above it.
+        This attaches the following attributes:
+
+        - :attr:`HybridCorr.corr`
+        - :attr:`HybridCorr.direct`
+        - :attr:`HybridCorr.fft`
+
+        Attributes
+        ----------
+        corr : :class:`~nbodykit.binned_statistic.BinnedStatistic`
+            a BinnedStatistic object holding the correlation function in the
+            requested bins. It stores the following variables:
+
+            - r :
+                the mean separation of each bin
+            - corr :
+                the correlation function
+            - provenance :
+                the estimator of each bin; 0 for the direct pair counts and
+                1 for the FFT, as listed in the ``provenance`` attribute
+
+            The ``crossover_residual`` attribute holds the FFT estimate
+            minus the direct estimate in the ``overlap`` bins above the
+            crossover.
+        direct : :class:`~nbodykit.algorithms.paircount_tpcf.tpcf.SimulationBox2PCF`, None
+            the pair count estimate, in the bins below the crossover and the
+            overlap bins; ``None`` if there are none
+        fft : :class:`~nbodykit.algorithms.fftcorr.FFTCorr`, None
+            the FFT estimate, in the distinct separations of the mesh;
+            ``None`` if all of the bins are below the crossover
+        """
+        from .paircount_tpcf import SimulationBox2PCF
+        from .paircount_tpcf.estimators import WedgeBinnedStatistic
+        from .fftcorr import FFTCorr
+
+        attrs = self.attrs
+        edges = attrs['edges']
+        nbins = len(edges) - 1
+        ncross = int(numpy.searchsorted(edges, attrs['rcross']))
+        ndirect = min(ncross + attrs['overlap'], nbins)
+        Nmu = attrs['Nmu'] or 1
+
+        # the correlation in each bin, with the estimator of each
+        shape = (nbins,) if attrs['mode'] == '1d' else (nbins, Nmu)
+        r = numpy.zeros(shape)
+        corr = numpy.zeros(shape)
+        provenance = numpy.ones(shape, dtype='i4')
+        provenance[:ncross] = 0
+
+        # direct pair counts, out to the crossover and the overlap bins
+        self.direct = None
+        if ndirect > 0:
+            self.direct = SimulationBox2PCF(attrs['mode'], self.data1, edges[:ndirect+1],
+                                            Nmu=attrs['Nmu'], data2=self.data2,
+                                            periodic=True, BoxSize=attrs['BoxSize'], los=attrs['los'],
+                                            weight=attrs['weight'], position=attrs['position'],
+                                            show_progress=attrs['show_progress'], **attrs['config'])
+            r[:ncross] = self.direct.corr['r'][:ncross]
+            corr[:ncross] = self.direct.corr['corr'][:ncross]
+
+        # FFTs, averaged from the distinct separations of the mesh
+        self.fft = None
+        residual = numpy.zeros((0,) + shape[1:])
+        if ncross < nbins:
+            meshes = []
+            for source in [self.data1, self.data2]:
+                if source is not None:
+                    meshes.append(source.to_mesh(Nmesh=attrs['Nmesh'], BoxSize=attrs['BoxSize'],
+                                                 dtype='f8', compensated=True,
+                                                 resampler=attrs['resampler'],
+                                                 interlaced=attrs['interlaced'],
+                                                 weight=attrs['weight'], position=attrs['position']))
+            if len(meshes) == 1:
+                meshes.append(None)
+
+            los = numpy.zeros(3)
+            los[attrs['los']] = 1
+            cellsize = (attrs['BoxSize'] / attrs['Nmesh']).max()
+            self.fft = FFTCorr(meshes[0], attrs['mode'], second=meshes[1], los=los, Nmu=Nmu,
+                               dr=0, rmax=edges[-1] + cellsize)
+
+            fft_r, fft_corr = _average_in_bins(self.fft.corr, edges)
+            r[ncross:] = fft_r[ncross:]
+            corr[ncross:] = fft_corr[ncross:]
+
+            # the match between the estimators above the crossover
+            if ndirect > ncross:
+                residual = fft_corr[ncross:ndirect] - self.direct.corr['corr'][ncross:ndirect]
+                if self.comm.rank == 0:
+                    self.logger.info("FFT minus direct correlation above the crossover: %s" % str(residual))
+
+        if self.comm.rank == 0:
+            self.logger.info("%d bins from direct pair counts, %d bins from FFTs" % (ncross, nbins - ncross))
+
+        # the result
+        dtype = [('r', 'f8'), ('corr', 'f8'), ('provenance', 'i4')]
+        data = numpy.empty(shape, dtype=dtype)
+        data['r'], data['corr'], data['provenance'] = r, corr, provenance
+        if attrs['mode'] == '1d':
+            dims, binedges = ['r'], [edges]
+        else:
+            dims, binedges = ['r', 'mu'], [edges, numpy.linspace(0, 1, Nmu+1)]
+
+        self.corr = WedgeBinnedStatistic(dims, binedges, data)
+        self.corr.attrs['rcross'] = attrs['rcross']
+        self.corr.attrs['provenance'] = ['direct', 'fft']
+        self.corr.attrs['crossover_residual'] = residual
+
+    def __getstate__(self):
+        edges = [self.corr.edges[d] for d in self.corr.dims]
+        return {'corr':self.corr.data, 'dims':self.corr.dims, 'edges':edges,
+                'corr_attrs':self.corr.attrs, 'attrs':self.attrs}
+
+    def __setstate__(self, state):
+        from .paircount_tpcf.estimators import WedgeBinnedStatistic
+
+        self.attrs = state['attrs']
+        self.corr = WedgeBinnedStatistic(state['dims'], state['edges'], state['corr'])
+        self.corr.attrs.update(state['corr_attrs'])
+
+    def save(self, output):
+        """
+        Save result as a JSON file with name ``output``
+        """
+        import json
+        from nbodykit.utils import JSONEncoder
+
+        # only the master rank writes
+        if self.comm.rank == 0:
+            self.logger.info('measurement done; saving result to %s' % output)
+
+            with open(output, 'w') as ff:
+                json.dump(self.__getstate__(), ff, cls=JSONEncoder)
+
+    @classmethod
+    @CurrentMPIComm.enable
+    def load(cls, output, comm=None):
+        """
+        Load a result has been saved to disk with :func:`save`.
+        """
+        import json
+        from nbodykit.utils import JSONDecoder
+        if comm.rank == 0:
+            with open(output, 'r') as ff:
+                state = json.load(ff, cls=JSONDecoder)
+        else:
+            state = None
+        state = comm.bcast(state)
+        self = object.__new__(cls)
+        self.__setstate__(state)
+        self.comm = comm
+        return self
+
+def _average_in_bins(corr, edges):
+    """
+    Average the FFT correlation ``corr``, measured at the distinct
+    separations of the mesh, in the separation bins ``edges``, weighting
+    each separation by its number of cell pairs.
+
+    Returns the mean separation and the correlation in each bin, of shape
+    ``(len(edges)-1,)`` followed by the remaining dimensions of ``corr``.
+    """
+    nbins = len(edges) - 1
+
+    # the bin of each distinct separation; as the pair counts, bins
+    # include the lower edge
+    x = corr.coords['r']
+    index = numpy.digitize(x, edges) - 1
+    valid = (index >= 0) & (index < nbins)
+
+    modes = numpy.asarray(corr['modes'], dtype='f8')
+    xi = numpy.asarray(corr['corr']).real
+    r = numpy.asarray(corr['r']).real
+    modes = numpy.where(numpy.isfinite(xi), modes, 0.)
+
+    shape = (nbins,) + modes.shape[1:]
+    N = numpy.zeros(shape)
+    rsum = numpy.zeros(shape)
+    xisum = numpy.zeros(shape)
+    numpy.add.at(N, index[valid], modes[valid])
+    numpy.add.at(rsum, index[valid], (modes * numpy.nan_to_num(r))[valid])
+    numpy.add.at(xisum, index[valid], (modes * numpy.nan_to_num(xi))[valid])
+
+    with numpy.errstate(invalid='ignore', divide='ignore'):
+        return rsum / N, xisum / N
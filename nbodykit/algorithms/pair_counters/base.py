@@ -1,5 +1,7 @@
 from nbodykit import CurrentMPIComm
 from nbodykit.binned_statistic import BinnedStatistic
+from mpi4py import MPI
+from six import string_types
 import numpy
 
 class PairCountBase(object):
@@ -8,7 +10,7 @@ class PairCountBase(object):
 
     Users should use one of the subclasses of this class.
     """
-    def __init__(self, mode, edges, first, second, Nmu, pimax, weight, show_progress=False):
+    def __init__(self, mode, edges, first, second, Nmu, pimax, weight, show_progress=False, region=None):
 
         # check input 'mode'
         valid_modes = ['1d', '2d', 'projected', 'angular']
@@ -48,26 +50,141 @@ class PairCountBase(object):
         self.attrs['N1'] = first.csize
         self.attrs['N2'] = second.csize if second is not None else None
 
-        if second is None or second is first:
-            wpairs1, wpairs2 = self.comm.allreduce(first.compute(first[weight].sum())), self.comm.allreduce(first.compute((first[weight]**2).sum()))
+        # the weighting schemes; the first one gives 'wnpairs'
+        weights = weight_columns(weight)
+        self.attrs['is_cross'] = not (second is None or second is first)
+
+        if not self.attrs['is_cross']:
+            wsums = first.compute(*[first[w].sum() for w in weights] + [(first[w]**2).sum() for w in weights])
+            wsums = self.comm.allreduce(numpy.array(wsums, dtype='f8'))
+            wpairs1, wpairs2 = wsums[:len(weights)], wsums[len(weights):]
             # for auto excluding self pairs to avoid a biased estimator. The factor 0.5 is by convention.
             # In the end it will cancel out in two point function estimators.
-            self.attrs['total_wnpairs'] = 0.5*(wpairs1**2-wpairs2)
-            self.attrs['is_cross'] = False
+            total_wnpairs = 0.5*(wpairs1**2-wpairs2)
         else:
-            wpairs1, wpairs2 = self.comm.allreduce(first.compute(first[weight].sum())), self.comm.allreduce(second.compute(second[weight].sum()))
-            self.attrs['total_wnpairs'] = 0.5*wpairs1*wpairs2
-            self.attrs['is_cross'] = True
+            wpairs1 = self.comm.allreduce(numpy.ravel(first.compute(*[first[w].sum() for w in weights])).astype('f8'))
+            wpairs2 = self.comm.allreduce(numpy.ravel(second.compute(*[second[w].sum() for w in weights])).astype('f8'))
+            total_wnpairs = 0.5*wpairs1*wpairs2
+
+        self.attrs['total_wnpairs'] = float(total_wnpairs[0])
+        if not isinstance(weight, string_types):
+            for w, total in zip(weights, total_wnpairs):
+                self.attrs['total_wnpairs_%s' % w] = float(total)
+
+        # the regions, and the total weighted pairs with each region left out
+        self.attrs['region'] = region
+        if region is not None:
+            self._init_regions(region, weights[0])
+
+    def _init_regions(self, region, weight):
+        """
+        Set the number of regions, and the ``total_wnpairs`` with each of
+        the regions left out in turn.
+        """
+        sources = [self.first]
+        if self.attrs['is_cross']:
+            sources.append(self.second)
+        for source in sources:
+            if region not in source:
+                raise ValueError("the region column '%s' is missing from input source" % region)
+
+        # the sums of the weights in each region
+        labels = [source.compute(source[region], source[weight]) for source in sources]
+        for r, w in labels:
+            if r.dtype.kind not in 'iu':
+                raise ValueError("the region column '%s' must be integer, not '%s'" % (region, str(r.dtype)))
+        nregions = self.comm.allreduce(max([r.max() + 1 if len(r) else 0 for r, w in labels]), op=MPI.MAX)
+        if self.comm.allreduce(min([r.min() if len(r) else 0 for r, w in labels]), op=MPI.MIN) < 0:
+            raise ValueError("the region column '%s' must not be negative" % region)
+
+        def wsum(r, w):
+            toret = numpy.bincount(r, weights=w, minlength=nregions)
+            return self.comm.allreduce(toret)
+
+        W1 = wsum(*labels[0])
+        if self.attrs['is_cross']:
+            W2 = wsum(*labels[1])
+            total = 0.5 * (W1.sum() - W1) * (W2.sum() - W2)
+        else:
+            W11 = wsum(labels[0][0], labels[0][1] ** 2)
+            total = 0.5 * ((W1.sum() - W1) ** 2 - (W11.sum() - W11))
+
+        self.attrs['nregions'] = int(nregions)
+        self.attrs['region_total_wnpairs'] = total
+
+    def get_region_pairs(self, nregions=None):
+        """
+        Return the pairs between each pair of regions, and the
+        ``total_wnpairs`` with each region left out, padded with empty
+        regions up to ``nregions`` regions.
+
+        The number of regions is found from the largest region label of
+        the catalogs, so pair counts of different catalogs with the same
+        regions may be padded to the same number of regions.
+        """
+        if self.attrs.get('region', None) is None:
+            raise ValueError("the pairs were not counted by region; use the ``region`` keyword")
+
+        region_pairs = self.region_pairs
+        total = numpy.array(self.attrs['region_total_wnpairs'])
+        n = self.attrs['nregions']
+        if nregions is not None and nregions > n:
+            padded = numpy.zeros((nregions, nregions) + region_pairs.shape[2:], dtype=region_pairs.dtype)
+            padded[:n, :n] = region_pairs
+            region_pairs = padded
+            total = numpy.concatenate([total, numpy.repeat(self.attrs['total_wnpairs'], nregions - n)])
+        return region_pairs, total
+
+    def leave_one_out(self, nregions=None):
+        """
+        Return the pair counts with each of the regions left out in turn.
+
+        The pairs between each pair of regions are counted in the same pass
+        as the total pairs, if the ``region`` column was given, and the
+        pairs without region :math:`k` are the total pairs, less the pairs
+        with either object in region :math:`k`. This gives all of the
+        jackknife samples of the pair counts at the cost of a single pair
+        count.
+
+        Parameters
+        ----------
+        nregions : int, optional
+            the number of regions, if larger than the number of regions of
+            these catalogs; see :func:`get_region_pairs`
+
+        Returns
+        -------
+        pairs : numpy.ndarray
+            the ``npairs`` and ``wnpairs`` with each region left out, of
+            shape ``(nregions,)`` followed by the shape of :attr:`pairs`
+        total_wnpairs : numpy.ndarray
+            the ``total_wnpairs`` with each region left out
+        """
+        region_pairs, total_wnpairs = self.get_region_pairs(nregions)
+        nregions = len(region_pairs)
+        k = numpy.arange(nregions)
+
+        toret = numpy.empty((nregions,) + region_pairs.shape[2:], dtype=region_pairs.dtype)
+        for name in ['npairs', 'wnpairs']:
+            pairs = region_pairs[name].astype('f8' if name == 'wnpairs' else 'i8')
+            total = pairs.sum(axis=(0, 1))
+            loo = total - pairs.sum(axis=1) - pairs.sum(axis=0) + pairs[k, k]
+            toret[name] = loo
+        return toret, total_wnpairs
 
     def __getstate__(self):
-        return {'pairs':self.pairs.data, 'attrs':self.attrs}
+        state = {'pairs':self.pairs.data, 'attrs':self.attrs}
+        if getattr(self, 'region_pairs', None) is not None:
+            state['region_pairs'] = self.region_pairs
+        return state
 
     def __setstate__(self, state):
         self.__dict__.update(state)
         edges = self.attrs['edges']
 
         # reconstruct the result based on mode
-        kws = {'fields_to_sum' : ['npairs', 'wnpairs']}
+        names = numpy.dtype(self.pairs.dtype).names
+        kws = {'fields_to_sum' : [name for name in names if name == 'npairs' or name.startswith('wnpairs')]}
         if self.attrs['mode'] == '1d':
             dims, edges = ['r'], [edges]
 
@@ -123,6 +240,23 @@ class PairCountBase(object):
         self.comm = comm
         return self
 
+def weight_columns(weight):
+    """
+    Return the list of the names of the weight columns, given either the
+    name of a single column, or a list of names, one per weighting scheme.
+    """
+    if isinstance(weight, string_types):
+        return [weight]
+    weight = list(weight)
+    if not len(weight):
+        raise ValueError("at least one weight column is required")
+    for w in weight:
+        if not isinstance(w, string_types):
+            raise ValueError("the weight columns should be given by name, not %s" % repr(w))
+    if len(set(weight)) != len(weight):
+        raise ValueError("duplicate weight columns in %s" % str(weight))
+    return weight
+
 def verify_input_sources(first, second, BoxSize, required_columns, inspect_boxsize=True):
     """
     Verify that the input source objects have all of the required columns
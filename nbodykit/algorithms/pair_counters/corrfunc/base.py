@@ -1,6 +1,9 @@
 import numpy
 import logging
-from nbodykit import CurrentMPIComm
+import time
+from mpi4py import MPI
+from nbodykit.utils import affinity_nthreads
+from nbodykit import CurrentMPIComm, _global_options
 from nbodykit.binned_statistic import BinnedStatistic
 
 class MissingCorrfuncError(Exception):
@@ -26,8 +29,10 @@ class CorrfuncResult(object):
 
     def __init__(self, data):
 
-        # copy over the valid colums from the input result
-        dtype = [(col, data.dtype[col]) for col in data.dtype.names if col in self.valid]
+        # copy over the valid colums from the input result; the
+        # 'weightavg_<i>' columns hold the weighting schemes, if several
+        dtype = [(col, data.dtype[col]) for col in data.dtype.names
+                    if col in self.valid or col.startswith('weightavg_')]
         self.data = numpy.zeros(data.shape, dtype=dtype)
         self.columns = self.data.dtype.names
         for col in self.columns:
@@ -44,6 +49,22 @@ class CorrfuncResult(object):
     def dtype(self):
         return self.data.dtype
 
+    @classmethod
+    def from_schemes(cls, results):
+        """
+        Combine the results of several weighting schemes of the same pairs,
+        adding the ``weightavg`` of each as the column ``weightavg_<i>``;
+        the ``weightavg`` column is that of the first scheme.
+        """
+        first = results[0].data
+        dtype = first.dtype.descr + [('weightavg_%d' % i, first.dtype['weightavg']) for i in range(len(results))]
+        data = numpy.zeros(first.shape, dtype=dtype)
+        for col in first.dtype.names:
+            data[col] = first[col]
+        for i, result in enumerate(results):
+            data['weightavg_%d' % i] = result['weightavg']
+        return cls(data)
+
     def reshape(self, *args, **kwargs):
         self.data = self.data.reshape(*args, **kwargs)
         return self
@@ -83,6 +104,12 @@ class MPICorrfuncCallable(object):
     - If ``show_progress`` is ``True``, execute the function in chunks,
       logging to screen the progress along the way. This is useful for
       potentially long running pair counting jobs.
+    - Run the function with OpenMP threads on each rank, as set by the
+      ``corrfunc_nthreads`` option of :class:`~nbodykit.set_options`. By
+      default, the number of threads follows from the CPU affinity of the
+      ranks, such that with one rank per socket or node (a hybrid
+      MPI + OpenMP layout) the ghost objects are only copied once per rank,
+      rather than once per core.
     - When calling the function, capture stdout/stderr and C-level output
       and if an error occurs, raise an exception with all generated output for
       the user.
@@ -92,13 +119,20 @@ class MPICorrfuncCallable(object):
     binning_dims = None
     logger = logging.getLogger("MPICorrfuncCallable")
 
+    #: the names of the arguments of :attr:`callable` holding the second catalog
+    second_columns = ()
+
+    #: the smallest number of objects per thread in a chunk with ``show_progress``;
+    #: smaller chunks leave the threads idle while the catalogs are gridded
+    min_chunk_per_thread = 10000
+
     def __init__(self, callable, comm, show_progress=True):
 
         self.callable = callable
         self.comm = comm
         self.show_progress = show_progress
 
-    def __call__(self, loads, kwargs, callback=None):
+    def __call__(self, loads, kwargs, callback=None, regions=None, weight_names=None):
         """
         Calls :attr:`callable` in iterations, optionally
         calling ``callback`` before each iteration.
@@ -106,6 +140,18 @@ class MPICorrfuncCallable(object):
         This allows the :mod:`Corrfunc` function :attr:`callable` to be called
         in chunks, giving the user a progress report after each iteration.
 
+        With ``regions``, the objects are labelled by region, and the pairs
+        between each pair of regions are counted in the same pass: each
+        iteration correlates the local objects of a region of the first
+        catalog with those of a region of the second catalog. As the
+        objects of a rank are spatially tight, a rank only holds a few of
+        the regions.
+
+        If the weights in ``kwargs`` have a column per weighting scheme,
+        the weighted pairs of each scheme are counted on the same chunks of
+        the decomposed objects; :mod:`Corrfunc` only accumulates a single
+        weight, so it is called once per scheme.
+
         Parameters
         ----------
         loads : list of int
@@ -117,15 +163,35 @@ class MPICorrfuncCallable(object):
             a callable takings ``kwargs`` as its first argument and a slice
             object as its second argument; this will be called first during
             each iteration
+        regions : tuple, optional
+            the region labels of the local objects of the first and the
+            second catalog, and the number of regions, as
+            ``(region1, region2, nregions)``
+        weight_names : list of str, optional
+            the names of the weighting schemes, one per column of the
+            weights; the weighted pairs of each are returned as the
+            variable ``wnpairs_<name>``
 
         Returns
         -------
         result : BinnedStatistic
-            the total binned pair counting result
+            the total binned pair counting result; ``wnpairs`` holds the
+            weighted pairs of the first weighting scheme
+        region_pairs : numpy.ndarray
+            if ``regions`` is given, the ``npairs`` and ``wnpairs`` between
+            each pair of regions, of shape ``(nregions, nregions)`` followed
+            by the shape of ``result``
         """
         # the rank with the largest load
         largest_load = numpy.argmax(loads)
 
+        # the number of OpenMP threads of this rank, unless given explicitly
+        if 'nthreads' not in kwargs:
+            kwargs['nthreads'] = _global_options['corrfunc_nthreads']
+            if kwargs['nthreads'] is None:
+                kwargs['nthreads'] = affinity_nthreads(self.comm)
+        nthreads = kwargs['nthreads']
+
         # do the pair counting
         def run(chunk):
             if callback is not None:
@@ -135,21 +201,34 @@ class MPICorrfuncCallable(object):
         # log the function start
         if self.comm.rank == 0:
             name = self.callable.__module__ + '.' + self.callable.__name__
-            self.logger.info("calling function '%s'" % name)
+            self.logger.info("calling function '%s' with %d thread(s) on rank 0" % (name, nthreads))
 
-        # number of iterations
+        # number of iterations; each call grids the second catalog again,
+        # so the chunks are kept large enough to keep all threads busy
         N = 10 if self.show_progress else 1
+        N = max(1, min(N, loads[self.comm.rank] // (nthreads * self.min_chunk_per_thread)))
 
         # run in chunks
         pc = None
-        chunks = numpy.array_split(numpy.arange(loads[self.comm.rank],dtype='intp'), N, axis=0)
-        for i, chunk in enumerate(chunks):
-            this_pc = run(chunk)
-            if self.comm.rank == largest_load and self.show_progress:
-                self.logger.info("%d%% done" % (N*(i+1)))
-
-            # sum up the results
-            pc = this_pc if pc is None else pc + this_pc
+        start = time.time()
+        if regions is None:
+            chunks = numpy.array_split(numpy.arange(loads[self.comm.rank],dtype='intp'), N, axis=0)
+            for i, chunk in enumerate(chunks):
+                this_pc = run(chunk)
+                if self.comm.rank == largest_load and self.show_progress:
+                    self.logger.info("%d%% done" % (100*(i+1)//N))
+
+                # sum up the results
+                pc = this_pc if pc is None else pc + this_pc
+        else:
+            pc, region_pc = self._run_regions(run, kwargs, regions, largest_load)
+
+        # log the measured cost per rank, before waiting for the others
+        elapsed = self.comm.gather(time.time() - start, root=0)
+        if self.comm.rank == 0:
+            self.logger.info("measured pair counting time per rank: "
+                             "min = %.2f s, median = %.2f s, max = %.2f s"
+                             % (min(elapsed), numpy.median(elapsed), max(elapsed)))
 
         # convert flattened 1D results to 2D array
         if len(self.edges) > 1:
@@ -162,21 +241,85 @@ class MPICorrfuncCallable(object):
         dims = list(self.binning_dims) # make a copy here
         if 's' in dims: dims[dims.index('s')] = 'r'
 
+        # the weighted pairs of each weighting scheme
+        wnpairs = [('wnpairs', 'weightavg')]
+        for i, name in enumerate(weight_names or []):
+            wnpairs.append(('wnpairs_%s' % name, 'weightavg_%d' % i))
+
         # make a new structured array
         dtype = numpy.dtype([(dims[0], 'f8'),
-                    ('npairs', 'u8'),
-                    ('wnpairs', 'f8')])
+                    ('npairs', 'u8')] +
+                    [(name, 'f8') for name, col in wnpairs])
         data = numpy.zeros(pc.shape, dtype=dtype)
 
         # copy over main results
         data[dims[0]] = pc[self.binning_dims[0]+'avg']
         data['npairs'] = pc['npairs']
-        data['wnpairs'] = pc['weightavg'] * pc['npairs']
-        # patch up when there is no pair, the weighted value shall be zero as well.
-        data['wnpairs'][pc['npairs'] == 0] = 0
+        for name, col in wnpairs:
+            data[name] = pc[col] * pc['npairs']
+            # patch up when there is no pair, the weighted value shall be zero as well.
+            data[name][pc['npairs'] == 0] = 0
 
         # return the BinnedStatistic
-        return BinnedStatistic(dims, self.edges, data, fields_to_sum=['npairs', 'wnpairs'])
+        fields_to_sum = ['npairs'] + [name for name, col in wnpairs]
+        result = BinnedStatistic(dims, self.edges, data, fields_to_sum=fields_to_sum)
+        if regions is None:
+            return result
+
+        # the pairs between each pair of regions, summed over all ranks
+        nregions = regions[2]
+        region_pairs = numpy.zeros((nregions, nregions) + pc.shape, dtype=[('npairs', 'u8'), ('wnpairs', 'f8')])
+        for (i, j), this_pc in region_pc.items():
+            npairs = numpy.reshape(this_pc['npairs'], pc.shape)
+            region_pairs['npairs'][i, j] = npairs
+            region_pairs['wnpairs'][i, j] = numpy.reshape(this_pc['weightavg'], pc.shape) * npairs
+        for name in ['npairs', 'wnpairs']:
+            buf = numpy.ascontiguousarray(region_pairs[name])
+            self.comm.Allreduce(MPI.IN_PLACE, buf, op=MPI.SUM)
+            region_pairs[name] = buf
+        return result, region_pairs
+
+    def _run_regions(self, run, kwargs, regions, largest_load):
+        """
+        Internal function to count the pairs between each pair of regions
+        of the local objects, restricting the second catalog in ``kwargs``
+        to one region at a time.
+
+        Returns the total result, and a dictionary of the results of each
+        pair of regions ``(i, j)``.
+        """
+        region1, region2, nregions = regions
+        second = dict((k, kwargs[k]) for k in self.second_columns if k in kwargs)
+
+        labels1 = numpy.unique(region1)
+        labels2 = numpy.unique(region2)
+        if len(labels1) and (labels1.min() < 0 or labels1.max() >= nregions):
+            raise ValueError("region labels should be between 0 and %d" % (nregions - 1))
+        if len(labels2) and (labels2.min() < 0 or labels2.max() >= nregions):
+            raise ValueError("region labels should be between 0 and %d" % (nregions - 1))
+
+        pc = None
+        toret = {}
+        try:
+            for n, i in enumerate(labels1):
+                chunk = numpy.flatnonzero(region1 == i)
+                for j in labels2:
+                    sel = region2 == j
+                    for k in second:
+                        kwargs[k] = second[k][sel]
+                    this_pc = run(chunk)
+                    toret[int(i), int(j)] = this_pc
+                    pc = this_pc if pc is None else pc + this_pc
+
+                if self.comm.rank == largest_load and self.show_progress:
+                    self.logger.info("%d of %d regions done" % (n + 1, len(labels1)))
+        finally:
+            kwargs.update(second)
+
+        # no local pairs of regions; count the (empty) pairs once
+        if pc is None:
+            pc = run(numpy.arange(0, dtype='intp'))
+        return pc, toret
 
     def _run(self, func, kws):
         """
@@ -189,6 +332,17 @@ class MPICorrfuncCallable(object):
         """
         from nbodykit.utils import captured_output
 
+        # one call per weighting scheme, for weights with several columns
+        if numpy.ndim(kws.get('weights1', None)) == 2:
+            w1, w2 = kws['weights1'], kws.get('weights2', None)
+            results = []
+            for i in range(w1.shape[1]):
+                this_kws = dict(kws, weights1=w1[:,i])
+                if w2 is not None:
+                    this_kws['weights2'] = w2[:,i]
+                results.append(self._run(func, this_kws))
+            return CorrfuncResult.from_schemes(results)
+
         kws = kws.copy()
 
         # cast the array items to the native endianness
@@ -13,17 +13,17 @@ class CorrfuncMocksCallable(MPICorrfuncCallable):
         the list of arrays specifying the bin edges in each coordinate direction
     """
     binning_dims = None
+    second_columns = ('RA2', 'DEC2', 'CZ2', 'weights2')
 
     def __init__(self, func, edges, comm, show_progress=True):
 
         MPICorrfuncCallable.__init__(self, func, comm, show_progress=show_progress)
         self.edges = edges
 
-    def __call__(self, pos1, w1, pos2, w2, **config):
+    def __call__(self, pos1, w1, pos2, w2, regions=None, weight_names=None, **config):
 
         kws = {}
         kws['autocorr'] = 0
-        kws['nthreads'] = 1
         kws['binfile'] = self.edges[0]
         kws['RA2'] = pos2[:,0]
         kws['DEC2'] = pos2[:,1]
@@ -49,7 +49,8 @@ class CorrfuncMocksCallable(MPICorrfuncCallable):
 
         # compute the result
         sizes = self.comm.allgather(len(pos1))
-        return MPICorrfuncCallable.__call__(self, sizes, kws, callback=callback)
+        return MPICorrfuncCallable.__call__(self, sizes, kws, callback=callback,
+                                            regions=regions, weight_names=weight_names)
 
 
 class DDsmu_mocks(CorrfuncMocksCallable):
@@ -17,6 +17,7 @@ class CorrfuncTheoryCallable(MPICorrfuncCallable):
         the size of the simulation box in each direction
     """
     binning_dims = None
+    second_columns = ('X2', 'Y2', 'Z2', 'weights2')
 
     def __init__(self, func, edges, periodic, BoxSize, comm, show_progress=True):
         MPICorrfuncCallable.__init__(self, func, comm, show_progress=show_progress)
@@ -33,11 +34,10 @@ class CorrfuncTheoryCallable(MPICorrfuncCallable):
             self.BoxSize = None
 
 
-    def __call__(self, pos1, w1, pos2, w2, **config):
+    def __call__(self, pos1, w1, pos2, w2, regions=None, weight_names=None, **config):
 
         kws = {}
         kws['autocorr'] = 0
-        kws['nthreads'] = 1
         kws['binfile'] = self.edges[0]
         kws['X2'] = pos2[:,0]
         kws['Y2'] = pos2[:,1]
@@ -59,7 +59,8 @@ class CorrfuncTheoryCallable(MPICorrfuncCallable):
 
         # compute the result
         sizes = self.comm.allgather(len(pos1))
-        return MPICorrfuncCallable.__call__(self, sizes, kws, callback=callback)
+        return MPICorrfuncCallable.__call__(self, sizes, kws, callback=callback,
+                                            regions=regions, weight_names=weight_names)
 
 class DD(CorrfuncTheoryCallable):
     """
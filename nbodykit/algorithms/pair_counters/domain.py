@@ -1,5 +1,8 @@
 from pmesh.domain import GridND
-from nbodykit.utils import split_size_3d
+from mpi4py import MPI
+from nbodykit.utils import split_size_3d, ExchangeColumns
+from six import string_types
+from .base import weight_columns
 import numpy
 
 def log_decomposition(comm, logger, N1, N2, pos1, pos2):
@@ -44,19 +47,437 @@ def log_decomposition(comm, logger, N1, N2, pos1, pos2):
         args = (N1//comm.size, N2)
         logger.info("(even distribution would result in %d x %d)" % args)
 
-def decompose_box_data(first, second, attrs, logger, smoothing):
+class BisectionLayout(object):
     """
+    The layout of objects decomposed by :class:`BisectionDomain`, which
+    moves the objects (and any array matching them) to their domains.
+
+    Use :func:`BisectionDomain.decompose` to create one.
+
+    Parameters
+    ----------
+    comm :
+        the MPI communicator
+    indices : array_like
+        the index of the object sent with each message
+    dest : array_like
+        the rank each message is sent to, in ascending order
+    sendlength : int
+        the number of objects that were decomposed
+    """
+    def __init__(self, comm, indices, dest, sendlength):
+        self.comm = comm
+        self.indices = indices
+        self.dest = dest
+        self.sendlength = sendlength
+        sendcounts = numpy.bincount(dest, minlength=comm.size)
+        self.recvcounts = numpy.array(comm.alltoall(sendcounts.tolist()), dtype='intp')
+        self.newlength = self.recvcounts.sum()
+
+    def exchange(self, data):
+        """
+        Deliver the data to the domains it intersects, with a copy
+        for every domain (ghosts included).
+
+        Parameters
+        ----------
+        data : array_like
+            the data to exchange, in the order of the positions that
+            were decomposed
+
+        Returns
+        -------
+        newdata : array_like
+            the data delivered to the domain of this rank
+        """
+        from nbodykit.utils import ExchangeArray
+        data = numpy.asarray(data)
+        return ExchangeArray(data.take(self.indices, axis=0), self.dest, self.comm)
+
+    def gather(self, data, mode='sum'):
+        """
+        Send the data of the exchanged objects back to the rank they came
+        from, reducing the copies of each object.
+
+        Parameters
+        ----------
+        data : array_like
+            the data of each object received by :func:`exchange`
+        mode : 'sum', 'any', numpy.ufunc
+            how to reduce the copies of an object; ``'sum'`` is
+            the same as ``numpy.add``, and ``'any'`` takes any one copy
+
+        Returns
+        -------
+        gathered : array_like
+            the reduced data, in the order of the positions that were
+            decomposed
+        """
+        from nbodykit.utils import ExchangeArray
+        if mode == 'sum':
+            mode = numpy.add
+        if mode != 'any' and not isinstance(mode, numpy.ufunc):
+            raise ValueError("gather mode should be 'sum', 'any' or a numpy ufunc")
+
+        # received objects are ordered by the rank they came from, and
+        # they come back in the order of the indices
+        data = numpy.asarray(data)
+        source = numpy.repeat(numpy.arange(self.comm.size), self.recvcounts)
+        data = ExchangeArray(data, source, self.comm)
+
+        order = numpy.argsort(self.indices, kind='mergesort')
+        indices = self.indices[order]
+        toret = numpy.zeros((self.sendlength,) + data.shape[1:], dtype=data.dtype)
+        if len(indices):
+            starts = numpy.flatnonzero(numpy.concatenate([[True], indices[1:] != indices[:-1]]))
+            if mode == 'any':
+                toret[indices[starts]] = data[order][starts]
+            else:
+                toret[indices[starts]] = mode.reduceat(data[order], starts, axis=0)
+        return toret
+
+class BisectionDomain(object):
+    """
+    A domain decomposition that assigns one rectangular domain to each
+    rank, found by recursive coordinate bisection: the space is cut
+    along its longest dimension such that the two halves carry a load
+    proportional to the number of ranks they are given, and the halves
+    are cut again until each holds a single rank.
+
+    Unlike a uniform :class:`pmesh.domain.GridND`, the domains shrink
+    where the load is concentrated, e.g., around clusters.
+
+    Use :func:`from_load` or :func:`from_positions` to create a domain.
+
+    Parameters
+    ----------
+    tree : int, tuple
+        the bisection tree; a leaf is the rank owning the domain, and a
+        node is a tuple ``(axis, cut, left, right)``, where ``left`` holds
+        the positions below ``cut`` along ``axis``
+    comm :
+        the MPI communicator
+    BoxSize : array_like, optional
+        the size of the box, if the boundary is periodic
+    load : array_like, optional
+        the predicted load of each rank
+    """
+    def __init__(self, tree, comm, BoxSize=None, load=None):
+        self.tree = tree
+        self.comm = comm
+        self.BoxSize = None if BoxSize is None else numpy.asarray(BoxSize, dtype='f8')
+        self.load = load
+
+    @classmethod
+    def from_load(cls, load, edges, comm, BoxSize=None):
+        """
+        Bisect the space with the load estimated on a mesh.
+
+        The cuts are on the edges of the mesh cells, so the mesh must be
+        fine enough to give several cells per rank along each dimension
+        to balance the load well.
+
+        Parameters
+        ----------
+        load : array_like
+            the load in each cell of the mesh, the same on all ranks
+        edges : list of array_like
+            the edges of the cells along each dimension
+        comm :
+            the MPI communicator
+        BoxSize : array_like, optional
+            the size of the box, if the boundary is periodic
+
+        Returns
+        -------
+        domain : BisectionDomain
+            the domain, with the predicted load of each rank in :attr:`load`
+        """
+        load = numpy.asarray(load, dtype='f8')
+        edges = [numpy.asarray(e) for e in edges]
+        ndim = load.ndim
+        predicted = numpy.zeros(comm.size)
+
+        def bisect(start, stop, ranks):
+            region = tuple(slice(a, b) for a, b in zip(start, stop))
+            if len(ranks) == 1:
+                predicted[ranks[0]] = load[region].sum()
+                return ranks[0]
+
+            nleft = len(ranks) // 2
+            ncells = stop - start
+            if (ncells > 1).any():
+                # cut the longest dimension, at the cell edge closest
+                # to the share of the load of the left ranks
+                extent = [edges[d][stop[d]] - edges[d][start[d]] for d in range(ndim)]
+                axis = numpy.argmax(numpy.where(ncells > 1, extent, -1))
+                other = tuple(d for d in range(ndim) if d != axis)
+                cumload = numpy.cumsum(load[region].sum(axis=other))
+                if cumload[-1] <= 0:
+                    cumload = numpy.arange(1., ncells[axis] + 1)
+                target = cumload[-1] * nleft / len(ranks)
+                k = start[axis] + 1 + numpy.argmin(abs(cumload[:-1] - target))
+            else:
+                # a single cell left; the right ranks get nothing
+                axis = 0
+                k = stop[0]
+
+            lstop = stop.copy(); lstop[axis] = k
+            rstart = start.copy(); rstart[axis] = k
+            left = bisect(start, lstop, ranks[:nleft])
+            right = bisect(rstart, stop, ranks[nleft:])
+            return (int(axis), edges[axis][k], left, right)
+
+        start = numpy.zeros(ndim, dtype='intp')
+        stop = numpy.array(load.shape, dtype='intp')
+        tree = bisect(start, stop, list(range(comm.size)))
+        return cls(tree, comm, BoxSize=BoxSize, load=predicted)
+
+    @classmethod
+    def from_positions(cls, pos, comm, BoxSize=None, weights=None, nbins=256):
+        """
+        Bisect the space at the weighted medians of the objects.
+
+        The domains follow the actual distribution of the objects, e.g.,
+        the footprint of a survey, such that no rank holds a domain that
+        is mostly empty. Each node is cut along the longest dimension of
+        the bounding box of its objects, and the cuts of all nodes at the
+        same depth of the tree are found together, with a few histograms
+        that narrow down the position of the cut.
+
+        This is a **collective** operation.
+
+        Parameters
+        ----------
+        pos : array_like (, ndim)
+            the positions of the objects on this rank
+        comm :
+            the MPI communicator
+        BoxSize : array_like, optional
+            the size of the box, if the boundary is periodic
+        weights : array_like, optional
+            the load of each object; default is one per object
+        nbins : int, optional
+            the number of bins of the histograms; the cuts are accurate
+            to a fraction ``1 / nbins**2`` of the extent of a node
+
+        Returns
+        -------
+        domain : BisectionDomain
+            the domain, with the predicted load of each rank in :attr:`load`
+        """
+        pos = numpy.asarray(pos, dtype='f8')
+        if BoxSize is not None:
+            pos = pos % BoxSize
+        if weights is None:
+            weights = numpy.ones(len(pos))
+        weights = numpy.asarray(weights, dtype='f8')
+        ndim = pos.shape[1]
+
+        # the nodes at the current depth, as (first rank, number of ranks),
+        # and the node of each object not yet in a leaf
+        nodes = [(0, comm.size)]
+        member = numpy.zeros(len(pos), dtype='intp')
+        cuts = {}
+        predicted = numpy.zeros(comm.size)
+
+        while len(nodes):
+            n = len(nodes)
+            nranks = numpy.array([node[1] for node in nodes])
+
+            # the load and the bounding box of each node
+            total = numpy.bincount(member, weights=weights, minlength=n)
+            lo = numpy.full((n, ndim), numpy.inf)
+            hi = numpy.full((n, ndim), -numpy.inf)
+            numpy.minimum.at(lo, member, pos)
+            numpy.maximum.at(hi, member, pos)
+            comm.Allreduce(MPI.IN_PLACE, total, op=MPI.SUM)
+            comm.Allreduce(MPI.IN_PLACE, lo, op=MPI.MIN)
+            comm.Allreduce(MPI.IN_PLACE, hi, op=MPI.MAX)
+            empty = ~numpy.isfinite(lo).all(axis=1)
+            lo[empty] = hi[empty] = 0
+
+            # leaves are done
+            for i in numpy.flatnonzero(nranks == 1):
+                predicted[nodes[i][0]] = total[i]
+
+            # cut the longest dimension at the share of the left ranks,
+            # narrowing down the bin of the cut in each pass
+            axis = numpy.argmax(hi - lo, axis=1)
+            a = lo[numpy.arange(n), axis]
+            b = hi[numpy.arange(n), axis]
+            target = total * (nranks // 2) / nranks
+            below = numpy.zeros(n)
+            x = pos[numpy.arange(len(pos)), axis[member]]
+            for npass in range(2):
+                width = (b - a) / nbins
+                bins = numpy.floor((x - a[member]) / numpy.where(width > 0, width, 1)[member])
+                valid = (bins >= 0) & (bins < nbins)
+                if npass == 0:
+                    valid |= x == b[member]
+                bins = member * nbins + bins.clip(0, nbins - 1).astype('intp')
+                hist = numpy.bincount(bins[valid], weights=weights[valid], minlength=n * nbins)
+                comm.Allreduce(MPI.IN_PLACE, hist, op=MPI.SUM)
+                cumhist = below[:, None] + numpy.cumsum(hist.reshape(n, nbins), axis=1)
+                reached = cumhist >= target[:, None]
+                reached[:, -1] = True
+                k = numpy.argmax(reached, axis=1)
+                below = cumhist[numpy.arange(n), k] - hist.reshape(n, nbins)[numpy.arange(n), k]
+                a, b = a + k * width, a + (k + 1) * width
+            cut = b
+
+            # split the objects between the children
+            children = []
+            index = numpy.zeros(n, dtype='intp') - 1
+            for i, (first, size) in enumerate(nodes):
+                if size == 1: continue
+                cuts[(first, size)] = (int(axis[i]), cut[i])
+                index[i] = len(children)
+                children += [(first, size // 2), (first + size // 2, size - size // 2)]
+
+            child = index[member] + (x >= cut[member])
+            keep = index[member] >= 0
+            pos, weights, member = pos[keep], weights[keep], child[keep]
+            nodes = children
+
+        def build(first, size):
+            if size == 1:
+                return first
+            axis, cut = cuts[(first, size)]
+            return (axis, cut, build(first, size // 2), build(first + size // 2, size - size // 2))
+
+        return cls(build(0, comm.size), comm, BoxSize=BoxSize, load=predicted)
+
+    def decompose(self, pos, smoothing=0):
+        """
+        Decompose the objects at ``pos`` into the domains.
+
+        An object goes to the domain that holds it, and with a non-zero
+        ``smoothing``, also to every other domain within ``smoothing`` of
+        it (as a ghost). Objects outside of the bisected space go to the
+        closest domain.
+
+        Parameters
+        ----------
+        pos : array_like (, ndim)
+            the positions of the objects
+        smoothing : float, optional
+            the distance from the domains within which objects are sent
+            as ghosts
+
+        Returns
+        -------
+        layout : BisectionLayout
+            the layout to exchange the objects and their data
+        """
+        pos = numpy.asarray(pos)
+        N = len(pos)
+        index = numpy.arange(N, dtype='intp')
+
+        # on a periodic box, add the images of the objects near the faces
+        if self.BoxSize is not None:
+            pos = pos % self.BoxSize
+            if smoothing > 0:
+                for axis, L in enumerate(self.BoxSize):
+                    low = pos[:, axis] < smoothing
+                    high = pos[:, axis] >= L - smoothing
+                    images = [pos[low], pos[high]]
+                    images[0][:, axis] += L
+                    images[1][:, axis] -= L
+                    pos = numpy.concatenate([pos] + images, axis=0)
+                    index = numpy.concatenate([index, index[low], index[high]], axis=0)
+
+        # walk down the tree
+        indices, dest = [], []
+        stack = [(self.tree, numpy.arange(len(pos), dtype='intp'))]
+        while stack:
+            node, i = stack.pop()
+            if not isinstance(node, tuple):
+                indices.append(index[i])
+                dest.append(numpy.zeros(len(i), dtype='intp') + node)
+                continue
+            axis, cut, left, right = node
+            x = pos[i, axis]
+            stack.append((left, i[x - smoothing < cut] if smoothing > 0 else i[x < cut]))
+            stack.append((right, i[x + smoothing >= cut]))
+
+        indices = numpy.concatenate(indices)
+        dest = numpy.concatenate(dest)
+
+        # an object is sent once per rank, even if several images got there
+        if self.BoxSize is not None and smoothing > 0:
+            key = numpy.unique(indices * self.comm.size + dest)
+            indices, dest = key // self.comm.size, key % self.comm.size
+
+        # sort by rank, keeping the input order
+        order = numpy.lexsort((indices, dest))
+        return BisectionLayout(self.comm, indices[order], dest[order], N)
+
+def paircount_load(comm, pos1, pos2, edges, smoothing, BoxSize=None):
+    """
+    Estimate the cost of counting pairs on a mesh from the density
+    of the objects.
+
+    Each of the ``n1`` objects of the first source in a cell is paired
+    with all objects of the second source within ``smoothing``, of which
+    there are ``n2 / V * 4/3 pi smoothing^3``, where ``V`` is the volume of
+    the cell. Every object adds one more unit of cost, for the gridding.
+
+    Parameters
+    ----------
+    comm :
+        the MPI communicator
+    pos1, pos2 : array_like
+        the positions of the first and second source on this rank
+    edges : list of array_like
+        the edges of the mesh cells along each dimension
+    smoothing : float
+        the maximum separation of pairs
+    BoxSize : array_like, optional
+        the size of the box, if the boundary is periodic
+
+    Returns
+    -------
+    load : array_like
+        the estimated cost of each cell, the same on all ranks
+    """
+    def histogram(pos):
+        if BoxSize is not None:
+            pos = pos % BoxSize
+        cells = [(numpy.searchsorted(e, pos[:, d], side='right') - 1).clip(0, len(e) - 2)
+                 for d, e in enumerate(edges)]
+        shape = tuple(len(e) - 1 for e in edges)
+        n = numpy.bincount(numpy.ravel_multi_index(cells, shape),
+                           minlength=numpy.prod(shape)).reshape(shape)
+        return comm.allreduce(n.astype('f8'))
+
+    n1 = histogram(pos1)
+    n2 = histogram(pos2) if pos2 is not pos1 else n1
+
+    volume = numpy.ones(n1.shape)
+    for d, e in enumerate(edges):
+        volume *= numpy.diff(e).reshape([-1 if i == d else 1 for i in range(len(edges))])
+
+    return n1 * n2 / volume * (4. / 3 * numpy.pi * smoothing ** 3) + n1 + n2
+
+def decompose_box_data(first, second, attrs, logger, smoothing, region=None):
+    r"""
     Perform a domain decomposition on simulation box data, returning the
     domain-demposed position and weight arrays for each object in the
     correlating pair.
 
-    No load balancing is required since the particles in are assumed to
-    be in a box.
+    The cost of pair counting grows like :math:`n^2 r_\mathrm{max}^3`, so
+    on clustered data the densest part of a uniform grid takes much longer
+    than the rest. The cost is instead estimated on a mesh with
+    :func:`paircount_load`, and the box is split with a
+    :class:`BisectionDomain` such that the predicted cost of each rank is
+    the same. The predicted cost is logged, for comparison with the
+    measured time of the pair counting.
 
     The implementation follows:
 
     1. Decompose the first source such that the objects are spatially
-       tight on a given rank.
+       tight on a given rank, and the cost is balanced.
     2. Decompose the second source, ensuring a given rank holds all
        particles within the desired maximum separation.
 
@@ -72,24 +493,27 @@ def decompose_box_data(first, second, attrs, logger, smoothing):
         the current active logger
     smoothing :
         the maximum Cartesian separation implied by the user's binning
+    region : str, optional
+        the name of a column holding an integer region label of each
+        object, e.g., of a jackknife region, decomposed along with the
+        weights
 
     Returns
     -------
     (pos1, w1), (pos2, w2) : array_like
-        the (decomposed) set of positions and weights to correlate
+        the (decomposed) set of positions and weights to correlate; with
+        ``region``, the region labels are a third array of each tuple; the
+        weights have one column per weighting scheme if ``attrs['weight']``
+        is a list of columns
     """
     comm = first.comm
 
-    # determine processor division for domain decomposition
-    np = split_size_3d(comm.size)
-    if comm.rank == 0:
-        logger.info("using cpu grid decomposition: %s" %str(np))
-
     # get the (periodic-enforced) position for first
     pos1 = first[attrs['position']]
     if attrs['periodic']:
         pos1 %= attrs['BoxSize']
-    pos1, w1 = first.compute(pos1, first[attrs['weight']])
+    cols1 = _compute_columns(first, pos1, attrs['weight'], region)
+    pos1 = cols1[0]
     N1 = comm.allreduce(len(pos1))
 
     # get the (periodic-enforced) position for second
@@ -97,43 +521,67 @@ def decompose_box_data(first, second, attrs, logger, smoothing):
         pos2 = second[attrs['position']]
         if attrs['periodic']:
             pos2 %= attrs['BoxSize']
-        pos2, w2 = second.compute(pos2, second[attrs['weight']])
+        cols2 = _compute_columns(second, pos2, attrs['weight'], region)
+        pos2 = cols2[0]
         N2 = comm.allreduce(len(pos2))
     else:
+        cols2 = cols1
         pos2 = pos1
-        w2 = w1
         N2 = N1
 
-    # domain decomposition
-    grid = [
-        numpy.linspace(0, attrs['BoxSize'][0], np[0] + 1, endpoint=True),
-        numpy.linspace(0, attrs['BoxSize'][1], np[1] + 1, endpoint=True),
-        numpy.linspace(0, attrs['BoxSize'][2], np[2] + 1, endpoint=True),
-    ]
-    domain = GridND(grid, comm=comm)
+    # estimate the cost on a mesh with several cells per rank per dimension
+    BoxSize = attrs['BoxSize'] if attrs['periodic'] else None
+    nmesh = max(64, 4 * int(numpy.ceil(comm.size ** (1. / 3))))
+    edges = [numpy.linspace(0, L, nmesh + 1, endpoint=True) for L in attrs['BoxSize']]
+    load = paircount_load(comm, pos1, pos2, edges, smoothing, BoxSize=BoxSize)
+
+    # domain decomposition, balancing the cost
+    domain = BisectionDomain.from_load(load, edges, comm, BoxSize=BoxSize)
+    if comm.rank == 0:
+        load = domain.load / domain.load.mean()
+        logger.info("predicted pair counting cost per rank relative to the mean: "
+                    "min = %.2f, median = %.2f, max = %.2f"
+                    % (load.min(), numpy.median(load), load.max()))
 
     # exchange first particles
     layout = domain.decompose(pos1, smoothing=0)
-    pos1 = layout.exchange(pos1)
-    w1 = layout.exchange(w1)
+    cols1 = ExchangeColumns(layout, *cols1)
 
     # exchange second particles
     if smoothing > attrs['BoxSize'].max() * 0.25:
-        pos2 = numpy.concatenate(comm.allgather(pos2), axis=0)
-        w2   = numpy.concatenate(comm.allgather(w2), axis=0)
+        cols2 = tuple(numpy.concatenate(comm.allgather(col), axis=0) for col in cols2)
     else:
         layout  = domain.decompose(pos2, smoothing=smoothing)
-        pos2 = layout.exchange(pos2)
-        w2   = layout.exchange(w2)
+        cols2 = ExchangeColumns(layout, *cols2)
 
     # log the decomposition breakdown
-    log_decomposition(comm, logger, N1, N2, pos1, pos2)
+    log_decomposition(comm, logger, N1, N2, cols1[0], cols2[0])
 
-    return (pos1, w1), (pos2, w2)
+    return cols1, cols2
+
+def _compute_columns(source, pos, weight, region=None):
+    """
+    Compute the position, the weight, and optionally the region label
+    columns of ``source`` at once.
+
+    If ``weight`` is a list of columns, the weights are stacked into a
+    single array of shape ``(N, len(weight))``, such that all of the
+    weighting schemes are decomposed together.
+    """
+    weights = weight_columns(weight)
+    columns = [pos] + [source[w] for w in weights]
+    if region is not None:
+        columns.append(source[region])
+    columns = source.compute(*columns)
+
+    pos, w = columns[0], columns[1:len(weights)+1]
+    w = w[0] if isinstance(weight, string_types) else numpy.stack(w, axis=-1)
+    return (pos, w) + tuple(columns[len(weights)+1:])
 
 
 def decompose_survey_data(first, second, attrs, logger, smoothing, domain_factor=2,
-                            angular=False, return_cartesian=False):
+                            angular=False, return_cartesian=False, decomposition='grid',
+                            region=None):
     """
     Perform a domain decomposition on survey data, returning the
     domain-demposed position and weight arrays for each object in the
@@ -143,7 +591,12 @@ def decompose_survey_data(first, second, attrs, logger, smoothing, domain_factor
     the input data (assumed to be in sky coordinates).
 
     Load balancing is required since the distribution in Cartesian space
-    will likely not be uniform.
+    will likely not be uniform. With ``decomposition='grid'``, the bounding
+    box is split into a mesh of cells, which are assigned to ranks to
+    balance the load. With ``decomposition='bisection'``, the domains are
+    found by recursive bisection of the actual distribution of the objects
+    (see :class:`BisectionDomain`), which avoids mostly empty domains, and
+    the ghosts they bring, on curved sky footprints.
 
     The implementation follows:
 
@@ -173,27 +626,35 @@ def decompose_survey_data(first, second, attrs, logger, smoothing, domain_factor
         decomposition are on the unit sphere
     return_cartesian : bool, optional
         whether to return the pos as (ra, dec, z), or the Cartesian (x, y, z)
+    decomposition : 'grid', 'bisection', optional
+        the type of domain decomposition
+    region : str, optional
+        the name of a column holding an integer region label of each
+        object, e.g., of a jackknife region, decomposed along with the
+        weights
 
     Returns
     -------
     (pos1, w1), (pos2, w2) : array_like
-        the (decomposed) set of positions and weights to correlate
+        the (decomposed) set of positions and weights to correlate; with
+        ``region``, the region labels are a third array of each tuple; the
+        weights have one column per weighting scheme if ``attrs['weight']``
+        is a list of columns
     """
     from nbodykit.transform import StackColumns
     comm = first.comm
 
+    if decomposition not in ['grid', 'bisection']:
+        raise ValueError("decomposition should be 'grid' or 'bisection', not '%s'" % decomposition)
+
     # either (ra,dec) or (ra,dec,redshift)
     poscols = [attrs['ra'], attrs['dec']]
     if not angular: poscols += [attrs['redshift']]
 
-    # determine processor division for domain decomposition
-    np = split_size_3d(comm.size)
-    if comm.rank == 0:
-        logger.info("using cpu grid decomposition: %s" %str(np))
-
     # stack position and compute
     pos1 = StackColumns(*[first[col] for col in poscols])
-    pos1, w1 = first.compute(pos1, first[attrs['weight']])
+    cols1 = _compute_columns(first, pos1, attrs['weight'], region)
+    pos1 = cols1[0]
     N1 = comm.allreduce(len(pos1))
 
     # only need cosmo if not angular
@@ -212,7 +673,8 @@ def decompose_survey_data(first, second, attrs, logger, smoothing, domain_factor
 
         # stack position and compute for "second"
         pos2 = StackColumns(*[second[col] for col in poscols])
-        pos2, w2 = second.compute(pos2, second[attrs['weight']])
+        cols2 = _compute_columns(second, pos2, attrs['weight'], region)
+        pos2 = cols2[0]
         N2 = comm.allreduce(len(pos2))
 
         # get comoving dist and boxsize
@@ -224,7 +686,6 @@ def decompose_survey_data(first, second, attrs, logger, smoothing, domain_factor
             pos2[:,2] = rdist2
     else:
         pos2 = pos1
-        w2 = w1
         N2 = N1
         cpos2_min = cpos1_min
         cpos2_max = cpos1_max
@@ -243,44 +704,57 @@ def decompose_survey_data(first, second, attrs, logger, smoothing, domain_factor
     if comm.rank == 0:
         logger.info("position variable range on rank 0 (max, min) = %s, %s" % (cpos_max, cpos_min))
 
-    # initialize the domain
-    # NOTE: over-decompose by factor of 2 to trigger load balancing
-    grid = [
-        numpy.linspace(cpos_min[0], cpos_max[0], domain_factor*np[0] + 1, endpoint=True),
-        numpy.linspace(cpos_min[1], cpos_max[1], domain_factor*np[1] + 1, endpoint=True),
-        numpy.linspace(cpos_min[2], cpos_max[2], domain_factor*np[2] + 1, endpoint=True),
-    ]
-    domain = GridND(grid, comm=comm, periodic=False)
-
-    # balance the load
-    domain.loadbalance(domain.load(cpos1))
+    if decomposition == 'bisection':
+        # bisect the distribution of the first source
+        domain = BisectionDomain.from_positions(cpos1, comm)
+        if comm.rank == 0:
+            logger.info("using bisection domain decomposition")
 
-    if comm.rank == 0:
-        logger.info("Load balance done")
+    else:
+        # determine processor division for domain decomposition
+        np = split_size_3d(comm.size)
+        if comm.rank == 0:
+            logger.info("using cpu grid decomposition: %s" %str(np))
+
+        # initialize the domain
+        # NOTE: over-decompose by factor of 2 to trigger load balancing
+        grid = [
+            numpy.linspace(cpos_min[0], cpos_max[0], domain_factor*np[0] + 1, endpoint=True),
+            numpy.linspace(cpos_min[1], cpos_max[1], domain_factor*np[1] + 1, endpoint=True),
+            numpy.linspace(cpos_min[2], cpos_max[2], domain_factor*np[2] + 1, endpoint=True),
+        ]
+        domain = GridND(grid, comm=comm, periodic=False)
+
+        # balance the load
+        domain.loadbalance(domain.load(cpos1))
+
+        if comm.rank == 0:
+            logger.info("Load balance done")
 
     # if we want to return cartesian, redefine pos
     if return_cartesian:
         pos1 = cpos1
         pos2 = cpos2
 
+    # the columns to decompose, with the converted positions
+    cols1 = (pos1,) + cols1[1:]
+    cols2 = (pos2,) + (cols2[1:] if second is not None else cols1[1:])
+
     # decompose based on cartesian positions
     layout = domain.decompose(cpos1, smoothing=0)
-    pos1   = layout.exchange(pos1)
-    w1     = layout.exchange(w1)
+    cols1 = ExchangeColumns(layout, *cols1)
 
     # get the position/weight of the secondaries
     if smoothing > boxsize.max() * 0.25:
-        pos2 = numpy.concatenate(comm.allgather(pos2), axis=0)
-        w2   = numpy.concatenate(comm.allgather(w2), axis=0)
+        cols2 = tuple(numpy.concatenate(comm.allgather(col), axis=0) for col in cols2)
     else:
         layout  = domain.decompose(cpos2, smoothing=smoothing)
-        pos2 = layout.exchange(pos2)
-        w2   = layout.exchange(w2)
+        cols2 = ExchangeColumns(layout, *cols2)
 
     # log the decomposition breakdown
-    log_decomposition(comm, logger, N1, N2, pos1, pos2)
+    log_decomposition(comm, logger, N1, N2, cols1[0], cols2[0])
 
-    return (pos1, w1), (pos2, w2)
+    return cols1, cols2
 
 def get_cartesian(comm, pos, cosmo=None):
     """
@@ -1,6 +1,7 @@
-from .base import PairCountBase, verify_input_sources
+from .base import PairCountBase, verify_input_sources, weight_columns
 import numpy
 import logging
+from six import string_types
 
 
 class SurveyDataPairCount(PairCountBase):
@@ -63,8 +64,12 @@ class SurveyDataPairCount(PairCountBase):
     redshift : str, optional
         the name of the column in the source specifying the redshift
         coordinates; default is 'Redshift'
-    weight : str, optional
-        the name of the column in the source specifying the object weights
+    weight : str, list of str, optional
+        the name of the column in the source specifying the object weights;
+        with a list of columns, e.g., of several weighting schemes, the
+        weighted pairs of each are counted on the same domain decomposition
+        and returned as ``wnpairs_<column>``, while ``wnpairs`` uses the
+        first one
     show_progress : bool, optional
         if ``True``, perform the pair counting calculation in 10 iterations,
         logging the progress after each iteration; this is useful for
@@ -73,6 +78,17 @@ class SurveyDataPairCount(PairCountBase):
         the integer value by which to oversubscribe the domain decomposition
         mesh before balancing loads; this number can affect the distribution
         of loads on the ranks -- an optimal value will lead to balanced loads
+    decomposition : 'grid', 'bisection', optional
+        the domain decomposition; ``'grid'`` balances the cells of a mesh
+        over the bounding box of the data, and ``'bisection'`` recursively
+        bisects the actual distribution of the data, which avoids mostly
+        empty domains on curved sky footprints
+    region : str, optional
+        the name of an integer column labelling the region of each object,
+        from 0 to the number of regions minus one, e.g., for jackknife
+        errors; if given, the pairs between each pair of regions are
+        counted as well, in the same pass, such that the pair counts with
+        any region left out follow; see :func:`leave_one_out`
     **config : key/value pairs
         additional keywords to pass to the :mod:`Corrfunc` function
 
@@ -94,16 +110,16 @@ class SurveyDataPairCount(PairCountBase):
     def __init__(self, mode, first, edges, cosmo=None, second=None,
                     Nmu=None, pimax=None,
                     ra='RA', dec='DEC', redshift='Redshift', weight='Weight',
-                    show_progress=False, domain_factor=4,
-                    **config):
+                    show_progress=False, domain_factor=4, decomposition='grid',
+                    region=None, **config):
 
         # verify the input sources
-        required_cols = [ra, dec, weight]
+        required_cols = [ra, dec] + weight_columns(weight)
         if mode != 'angular': required_cols.append(redshift)
         verify_input_sources(first, second, None, required_cols, inspect_boxsize=False)
 
         # init the base class (this verifies input arguments)
-        PairCountBase.__init__(self, mode, edges, first, second, Nmu, pimax, weight, show_progress)
+        PairCountBase.__init__(self, mode, edges, first, second, Nmu, pimax, weight, show_progress, region=region)
 
         # need cosmology if not angular!
         if mode != 'angular' and cosmo is None:
@@ -117,6 +133,7 @@ class SurveyDataPairCount(PairCountBase):
         self.attrs['redshift'] = redshift
         self.attrs['config'] = config
         self.attrs['domain_factor'] = domain_factor
+        self.attrs['decomposition'] = decomposition
 
         # run the algorithm
         self.run()
@@ -127,6 +144,7 @@ class SurveyDataPairCount(PairCountBase):
         This adds the following attribute:
 
         - :attr:`SurveyDataPairCount.pairs`
+        - :attr:`SurveyDataPairCount.region_pairs` (if ``region`` is given)
 
         self.pairs.attrs['total_wnpairs']: The total of wnpairs.
 
@@ -144,8 +162,13 @@ class SurveyDataPairCount(PairCountBase):
             - ``npairs``: the number of pairs in the bin
             - ``wnpairs``: the weighted npairs in the bin; each pair
               contributes the product of the individual weight values
-
-
+            - ``wnpairs_<column>``: if ``weight`` is a list of columns,
+              the weighted npairs of each weight column, with the totals
+              in the ``total_wnpairs_<column>`` attributes
+        region_pairs : numpy.ndarray
+            if ``region`` is given, the ``npairs`` and ``wnpairs`` between
+            each pair of regions, of shape ``(nregions, nregions)`` followed
+            by the shape of :attr:`pairs`; see :func:`leave_one_out`
         """
         from .domain import decompose_survey_data
 
@@ -163,10 +186,13 @@ class SurveyDataPairCount(PairCountBase):
             smoothing = 2 * numpy.sin(0.5 * numpy.deg2rad(smoothing))
 
         # do a domain decomposition on the data
-        (pos1, w1), (pos2, w2) = decompose_survey_data(first, second, attrs,
-                                                        self.logger, smoothing,
-                                                        angular=(mode=='angular'),
-                                                        domain_factor=attrs['domain_factor'])
+        cols1, cols2 = decompose_survey_data(first, second, attrs,
+                                                self.logger, smoothing,
+                                                angular=(mode=='angular'),
+                                                domain_factor=attrs['domain_factor'],
+                                                decomposition=attrs['decomposition'],
+                                                region=attrs['region'])
+        (pos1, w1), (pos2, w2) = cols1[:2], cols2[:2]
 
         # get the Corrfunc callable based on mode
         if attrs['mode'] in ['1d', '2d']:
@@ -182,9 +208,19 @@ class SurveyDataPairCount(PairCountBase):
             func = DDtheta_mocks(attrs['edges'], comm=self.comm, show_progress=attrs['show_progress'])
 
         # do the calculation
-        self.pairs = func(pos1, w1, pos2, w2, **attrs['config'])
-        self.pairs.attrs['total_wnpairs'] = self.attrs['total_wnpairs']
+        weight_names = None if isinstance(attrs['weight'], string_types) else attrs['weight']
+        if attrs['region'] is not None:
+            regions = (cols1[2], cols2[2], attrs['nregions'])
+            self.pairs, self.region_pairs = func(pos1, w1, pos2, w2, regions=regions,
+                                                 weight_names=weight_names, **attrs['config'])
+        else:
+            self.pairs = func(pos1, w1, pos2, w2, weight_names=weight_names, **attrs['config'])
+        for name in self.attrs:
+            if name.startswith('total_wnpairs'):
+                self.pairs.attrs[name] = self.attrs[name]
 
         # squeeze the result if '1d' (single mu bin was used)
         if mode == '1d':
             self.pairs = self.pairs.squeeze(dim='mu')
+            if attrs['region'] is not None:
+                self.region_pairs = self.region_pairs[..., 0]
@@ -1,4 +1,4 @@
-from .base import PairCountBase, verify_input_sources
+from .base import PairCountBase, verify_input_sources, weight_columns
 import numpy
 import logging
 from six import string_types
@@ -56,14 +56,24 @@ class SimulationBoxPairCount(PairCountBase):
         Distances along the :math:`\pi` direction are binned with unit
         depth. For instance, if ``pimax=40``, then 40 bins will be created
         along the :math:`\pi` direction.
-    weight : str, optional
-        the name of the column in the source specifying the particle weights
+    weight : str, list of str, optional
+        the name of the column in the source specifying the particle weights;
+        with a list of columns, e.g., of several weighting schemes, the
+        weighted pairs of each are counted on the same domain decomposition
+        and returned as ``wnpairs_<column>``, while ``wnpairs`` uses the
+        first one
     position : str, optional
         name of the column of the position of particles
     show_progress : bool, optional
         if ``True``, perform the pair counting calculation in 10 iterations,
         logging the progress after each iteration; this is useful for
         understanding the scaling of the code
+    region : str, optional
+        the name of an integer column labelling the region of each object,
+        from 0 to the number of regions minus one, e.g., for jackknife
+        errors; if given, the pairs between each pair of regions are
+        counted as well, in the same pass, such that the pair counts with
+        any region left out follow; see :func:`leave_one_out`
     **config : key/value pairs
         additional keywords to pass to the :mod:`Corrfunc` function
 
@@ -88,7 +98,7 @@ class SimulationBoxPairCount(PairCountBase):
 
     def __init__(self, mode, first, edges, BoxSize=None, periodic=True,
                     second=None, los='z', Nmu=None, pimax=None,
-                    weight='Weight', position='Position', show_progress=False, **config):
+                    weight='Weight', position='Position', show_progress=False, region=None, **config):
 
         # check input 'los'
         if isinstance(los, string_types):
@@ -103,11 +113,11 @@ class SimulationBoxPairCount(PairCountBase):
             raise ValueError("``los`` should be either ['x', 'y', 'z'] or [0,1,2]")
 
         # verify the input sources
-        required_cols = [position, weight]
+        required_cols = [position] + weight_columns(weight)
         BoxSize = verify_input_sources(first, second, BoxSize, required_cols)
 
         # init the base class (this verifies input arguments)
-        PairCountBase.__init__(self, mode, edges, first, second, Nmu, pimax, weight, show_progress)
+        PairCountBase.__init__(self, mode, edges, first, second, Nmu, pimax, weight, show_progress, region=region)
 
         # save the rest of the meta-data
         self.attrs['BoxSize'] = BoxSize
@@ -132,6 +142,7 @@ class SimulationBoxPairCount(PairCountBase):
         This adds the following attributes to the class:
 
         - :attr:`SimulationBoxPairCount.pairs`
+        - :attr:`SimulationBoxPairCount.region_pairs` (if ``region`` is given)
 
         Attributes
         ----------
@@ -147,6 +158,13 @@ class SimulationBoxPairCount(PairCountBase):
             - ``npairs``: the number of pairs in the bin
             - ``wnpairs``: the average weight value in the bin; each pair
               contributes the product of the individual weight values
+            - ``wnpairs_<column>``: if ``weight`` is a list of columns,
+              the weighted npairs of each weight column, with the totals
+              in the ``total_wnpairs_<column>`` attributes
+        region_pairs : numpy.ndarray
+            if ``region`` is given, the ``npairs`` and ``wnpairs`` between
+            each pair of regions, of shape ``(nregions, nregions)`` followed
+            by the shape of :attr:`pairs`; see :func:`leave_one_out`
         """
         # setup
         mode = self.attrs['mode']
@@ -171,8 +189,9 @@ class SimulationBoxPairCount(PairCountBase):
             from .domain import decompose_box_data
 
             # domain decompose the data
-            (pos1, w1), (pos2, w2) = decompose_box_data(first, second, attrs,
-                                                        self.logger, smoothing)
+            cols1, cols2 = decompose_box_data(first, second, attrs, self.logger,
+                                              smoothing, region=attrs['region'])
+            (pos1, w1), (pos2, w2) = cols1[:2], cols2[:2]
 
             # reorder to make LOS last column
             pos1 = pos1[:,axes_order]
@@ -196,8 +215,9 @@ class SimulationBoxPairCount(PairCountBase):
 
             # domain decompose the data
             attrs['ra'], attrs['dec'] = 'ra', 'dec'
-            (pos1, w1), (pos2, w2) = decompose_survey_data(first, second, attrs,
-                                                            self.logger, smoothing, angular=True)
+            cols1, cols2 = decompose_survey_data(first, second, attrs, self.logger,
+                                                 smoothing, angular=True, region=attrs['region'])
+            (pos1, w1), (pos2, w2) = cols1[:2], cols2[:2]
 
         # get the Corrfunc callable based on mode
         kws = {k:attrs[k] for k in ['periodic', 'BoxSize', 'show_progress']}
@@ -220,9 +240,17 @@ class SimulationBoxPairCount(PairCountBase):
             func = DDtheta_mocks(attrs['edges'], comm=self.comm, show_progress=attrs['show_progress'])
 
         # do the calculation
-        self.pairs = func(pos1, w1, pos2, w2, **attrs['config'])
+        weight_names = None if isinstance(attrs['weight'], string_types) else attrs['weight']
+        if attrs['region'] is not None:
+            regions = (cols1[2], cols2[2], attrs['nregions'])
+            self.pairs, self.region_pairs = func(pos1, w1, pos2, w2, regions=regions,
+                                                 weight_names=weight_names, **attrs['config'])
+        else:
+            self.pairs = func(pos1, w1, pos2, w2, weight_names=weight_names, **attrs['config'])
 
-        self.pairs.attrs['total_wnpairs'] = self.attrs['total_wnpairs']
+        for name in self.attrs:
+            if name.startswith('total_wnpairs'):
+                self.pairs.attrs[name] = self.attrs[name]
 
 def shift_to_box_center(pos, BoxSize, comm):
     """
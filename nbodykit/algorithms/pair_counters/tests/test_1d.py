@@ -120,6 +120,35 @@ def test_sim_periodic_cross(comm):
     assert_allclose(npairs, r.pairs['npairs'])
     assert_allclose(wsum, r.pairs['wnpairs'])
 
+@MPITest([1, 3])
+def test_sim_multiple_weights(comm):
+
+    # uniform source of particles, with two weighting schemes
+    source = generate_sim_data(seed=42, dtype='f8', comm=comm)
+    source['Weight'] = source.rng.uniform()
+    source['FKP'] = 1. / (1. + source['Position'][:,0] / 512.)
+
+    # make the bin edges
+    redges = numpy.linspace(10, 150, 10)
+
+    # count the pairs of both weights at once
+    r = SimulationBoxPairCount('1d', source, redges, periodic=True, weight=['Weight', 'FKP'])
+    assert r.pairs.variables == ['r', 'npairs', 'wnpairs', 'wnpairs_Weight', 'wnpairs_FKP']
+
+    pos = gather_data(source, "Position")
+    for name in ['Weight', 'FKP']:
+        w = gather_data(source, name)
+
+        # verify with kdcount
+        npairs, ravg, wsum = reference_paircount(pos, w, redges, source.attrs['BoxSize'])
+        assert_allclose(npairs, r.pairs['npairs'])
+        assert_allclose(wsum, r.pairs['wnpairs_%s' % name])
+        assert_allclose(0.5 * (w.sum() ** 2 - (w ** 2).sum()), r.pairs.attrs['total_wnpairs_%s' % name])
+
+    # the first weight is the default
+    assert_array_equal(r.pairs['wnpairs'], r.pairs['wnpairs_Weight'])
+    assert r.pairs.attrs['total_wnpairs'] == r.pairs.attrs['total_wnpairs_Weight']
+
 @MPITest([1])
 def test_bad_los1(comm):
     source = generate_sim_data(seed=42, dtype='f8', comm=comm)
@@ -0,0 +1,89 @@
+from runtests.mpi import MPITest
+from nbodykit.algorithms.pair_counters.domain import BisectionDomain, paircount_load
+from nbodykit.utils import ExchangeColumns
+from numpy.testing import assert_array_equal
+import numpy
+import pytest
+
+def clustered_positions(comm, N, BoxSize):
+    # half of the objects in a small clump
+    rng = numpy.random.RandomState(42 + comm.rank)
+    pos = rng.uniform(size=(N, 3)) * BoxSize
+    pos[:N//2] = 0.1 * BoxSize + rng.normal(scale=0.02 * BoxSize, size=(N//2, 3))
+    return pos % BoxSize
+
+def check_neighbors(comm, pos, pos1, pos2, smoothing, BoxSize):
+    # all of the objects within smoothing of the local objects are local
+    allpos = numpy.concatenate(comm.allgather(pos), axis=0)
+    for x in pos1:
+        dx = allpos - x
+        if BoxSize is not None:
+            dx -= numpy.round(dx / BoxSize) * BoxSize
+        near = (dx ** 2).sum(axis=-1) < smoothing ** 2
+        dx = pos2 - x
+        if BoxSize is not None:
+            dx -= numpy.round(dx / BoxSize) * BoxSize
+        assert ((dx ** 2).sum(axis=-1) < smoothing ** 2).sum() == near.sum()
+
+@MPITest([1, 4])
+def test_bisection_domain(comm):
+    for periodic in [True, False]:
+        check_bisection_domain(comm, periodic)
+
+def check_bisection_domain(comm, periodic):
+    BoxSize = numpy.array([100., 100., 100.])
+    smoothing = 5.0
+    pos = clustered_positions(comm, 500, BoxSize)
+    index = numpy.arange(len(pos)) + 500 * comm.rank
+
+    edges = [numpy.linspace(0, L, 17, endpoint=True) for L in BoxSize]
+    load = paircount_load(comm, pos, pos, edges, smoothing, BoxSize=BoxSize if periodic else None)
+    domain = BisectionDomain.from_load(load, edges, comm, BoxSize=BoxSize if periodic else None)
+    assert domain.load.sum() == pytest.approx(load.sum())
+
+    # the predicted cost is better balanced than with equal volumes
+    if comm.size == 4:
+        uniform = [load[:8, :8].sum(), load[:8, 8:].sum(), load[8:, :8].sum(), load[8:, 8:].sum()]
+        assert domain.load.max() < max(uniform)
+
+    # each object has a single domain
+    layout = domain.decompose(pos, smoothing=0)
+    pos1, index1 = ExchangeColumns(layout, pos, index)
+    assert len(pos1) == layout.newlength
+    allindex = numpy.concatenate(comm.allgather(index1))
+    assert sorted(allindex) == list(range(500 * comm.size))
+
+    # and the ghosts hold all the neighbors
+    layout = domain.decompose(pos, smoothing=smoothing)
+    pos2, index2 = ExchangeColumns(layout, pos, index)
+    assert len(numpy.unique(index2)) == len(index2)
+    check_neighbors(comm, pos, pos1, pos2, smoothing, BoxSize if periodic else None)
+
+@MPITest([1, 4])
+def test_bisection_domain_positions(comm):
+    # objects on a thin curved shell, as in a survey footprint
+    rng = numpy.random.RandomState(42 + comm.rank)
+    phi = rng.uniform(0, 0.5 * numpy.pi, size=1000)
+    r = rng.uniform(100, 110, size=1000)
+    pos = numpy.array([r * numpy.cos(phi), r * numpy.sin(phi), rng.uniform(0, 10, size=1000)]).T
+    index = numpy.arange(len(pos)) + 1000 * comm.rank
+
+    domain = BisectionDomain.from_positions(pos, comm)
+    assert domain.load.sum() == 1000 * comm.size
+
+    # the objects are balanced between the ranks
+    layout = domain.decompose(pos, smoothing=0)
+    pos1, index1 = ExchangeColumns(layout, pos, index)
+    sizes = comm.allgather(len(pos1))
+    assert max(sizes) - min(sizes) <= 0.02 * 1000
+    assert_array_equal(sizes, domain.load)
+
+    # the ghosts hold all the neighbors
+    layout = domain.decompose(pos, smoothing=3.0)
+    pos2, index2 = ExchangeColumns(layout, pos, index)
+    check_neighbors(comm, pos, pos1, pos2, 3.0, None)
+
+    # gather the copies back
+    assert_array_equal(layout.gather(numpy.ones(len(pos2)), mode='sum') >= 1, True)
+    assert_array_equal(layout.gather(index2, mode='any'), index)
+    assert_array_equal(layout.gather(index2, mode=numpy.fmax), index)
@@ -139,7 +139,8 @@ class AnalyticUniformRandoms(object):
 
         return R1R2
 
-def LandySzalayEstimator(pair_counter, data1, data2, randoms1, randoms2, R1R2=None, logger=None, **kwargs):
+def LandySzalayEstimator(pair_counter, data1, data2, randoms1, randoms2, R1R2=None, logger=None,
+                         split_randoms=None, **kwargs):
     """
     Compute the correlation function from data/randoms using the
     Landy - Szalay estimator to compute the correlation function.
@@ -158,17 +159,34 @@ def LandySzalayEstimator(pair_counter, data1, data2, randoms1, randoms2, R1R2=No
         the second randoms catalog; can be None for auto-correlations
     R1R2 : SimulationBoxPairCount, SurveyDataPairCount, optional
         if provided, random pairs R1R2 are not recalculated
+    split_randoms : int, optional
+        if provided, count the random pairs R1R2 only within this number of
+        independent subsets of the randoms, and sum them; this costs
+        a fraction ``1 / split_randoms`` of the full R1R2, while the data -
+        random pairs still use all of the randoms
     **kwargs :
         the parameters passed to the ``pair_counter`` class to count pairs
 
+    Notes
+    -----
+    If the ``paircount_cache_dir`` option is set (see
+    :class:`~nbodykit.set_options`), R1R2 is stored in a
+    :class:`~nbodykit.diskcache.PairCountCache`, keyed by the dask graphs
+    of the columns of the randoms and the binning; random pairs counted
+    before are loaded from the cache, such that only the data - data and
+    data - random pairs are counted.
+
     Returns
     -------
     D1D2, D1R2, D2R1, R1R2, CF : BinnedStatistic
-        the various terms of the LS estimator + the correlation function result
+        the various terms of the LS estimator + the correlation function result;
+        if the pairs are counted by ``region``, the correlation functions with
+        each region left out in turn are in ``CF.attrs['corr_jk']``
 
     References
     ----------
     http://adsabs.harvard.edu/abs/1993ApJ...412...64L
+    Keihanen et al. 2019, https://arxiv.org/abs/1905.01133 (split randoms)
     """
     # make sure we have the randoms
     assert randoms1 is not None
@@ -180,7 +198,7 @@ def LandySzalayEstimator(pair_counter, data1, data2, randoms1, randoms2, R1R2=No
     if logger is not None and comm.rank == 0:
         logger.info("computing randoms1 - randoms2 pair counts")
     if not R1R2:
-        R1R2 = pair_counter(first=randoms1, second=randoms2, **kwargs)
+        R1R2 = _count_randoms(pair_counter, randoms1, randoms2, split_randoms, logger, **kwargs)
 
     # data1 x data2
     if logger is not None and comm.rank == 0:
@@ -229,8 +247,156 @@ def LandySzalayEstimator(pair_counter, data1, data2, randoms1, randoms2, R1R2=No
         warnings.warn(msg)
 
     CF = _create_tpcf_result(D1D2.pairs, CF)
+
+    # the jackknife samples, from the pairs between each pair of regions
+    if kwargs.get('region', None) is not None:
+        CF.attrs['corr_jk'] = _leave_one_out_landy_szalay(D1D2, D1R2, D2R1, R1R2)
+
     return D1D2.pairs, D1R2.pairs, D2R1.pairs, R1R2.pairs, CF
 
+def _leave_one_out_landy_szalay(D1D2, D1R2, D2R1, R1R2):
+    """
+    Internal function to compute the Landy-Szalay estimator with each of
+    the regions left out in turn, from pair counts by region.
+
+    Returns an array of shape ``(nregions,)`` followed by the shape of the
+    pair counts; bins with no random pairs are NaN.
+    """
+    # the same regions for all of the pair counts
+    nregions = max(pc.attrs.get('nregions', 0) for pc in [D1D2, D1R2, D2R1, R1R2])
+    DD, tDD = D1D2.leave_one_out(nregions)
+    DR, tDR = D1R2.leave_one_out(nregions)
+    RD, tRD = D2R1.leave_one_out(nregions)
+    RR, tRR = R1R2.leave_one_out(nregions)
+
+    # the normalization of each sample
+    shape = (-1,) + (1,) * (RR.ndim - 1)
+    fDD = (tRR / tDD).reshape(shape)
+    fDR = (tRR / tDR).reshape(shape)
+    fRD = (tRR / tRD).reshape(shape)
+
+    CF = numpy.zeros(RR.shape)
+    CF[:] = numpy.nan
+    nonzero = RR['npairs'] > 0
+    with numpy.errstate(divide='ignore', invalid='ignore'):
+        xi = (fDD * DD['wnpairs'] - fDR * DR['wnpairs'] - fRD * RD['wnpairs']) / RR['wnpairs'] + 1
+    CF[nonzero] = xi[nonzero]
+    return CF
+
+def _count_randoms(pair_counter, randoms1, randoms2, split_randoms, logger, **kwargs):
+    """
+    Internal function to count the random - random pairs, from the pair
+    count cache if possible, and within independent subsets of the randoms
+    if ``split_randoms`` is given.
+    """
+    from nbodykit.diskcache import PairCountCache
+
+    comm = randoms1.comm
+    cache = PairCountCache.get(comm=comm)
+    if cache is not None:
+        key = cache.key(_pair_count_token(randoms1, randoms2, split_randoms, kwargs))
+        R1R2 = cache.load(key, pair_counter)
+        if R1R2 is not None:
+            R1R2.pairs.attrs['total_wnpairs'] = R1R2.attrs['total_wnpairs']
+            return R1R2
+
+    if split_randoms is None:
+        R1R2 = pair_counter(first=randoms1, second=randoms2, **kwargs)
+    else:
+        # assign the randoms to subsets by their index
+        results = []
+        for i in range(split_randoms):
+            if logger is not None and comm.rank == 0:
+                logger.info("counting randoms pairs in subset %d of %d" % (i + 1, split_randoms))
+            first = randoms1[randoms1.Index % split_randoms == i]
+            if randoms2 is randoms1:
+                second = first
+            else:
+                second = randoms2[randoms2.Index % split_randoms == i]
+            results.append(pair_counter(first=first, second=second, **kwargs))
+        R1R2 = _sum_pair_counts(results)
+        R1R2.attrs['N1'] = randoms1.csize
+        R1R2.attrs['N2'] = randoms2.csize if randoms2 is not randoms1 else None
+
+    R1R2.attrs['split_randoms'] = split_randoms
+    if cache is not None:
+        cache.store(key, R1R2)
+    return R1R2
+
+def _sum_pair_counts(results):
+    """
+    Internal function to sum the pair counts of several pair counting
+    results, with the same binning.
+
+    The pairs are normalized by the sum of the total weighted pairs of
+    each result, such that the estimators see the pairs within the subsets
+    only.
+    """
+    import copy
+
+    toret = copy.copy(results[0])
+    toret.attrs = dict(toret.attrs)
+
+    pairs = toret.pairs.copy()
+    x = pairs.dims[0]
+    npairs = sum(r.pairs['npairs'] for r in results)
+    xsum = sum(r.pairs[x] * r.pairs['npairs'] for r in results)
+    pairs[x] = numpy.where(npairs > 0, xsum / numpy.where(npairs > 0, npairs, 1), numpy.nan)
+    pairs['npairs'] = npairs
+
+    # the weighted pairs of each weighting scheme
+    for name in pairs.variables:
+        if name.startswith('wnpairs'):
+            pairs[name] = sum(r.pairs[name] for r in results)
+    for name in toret.attrs:
+        if name.startswith('total_wnpairs'):
+            toret.attrs[name] = sum(r.attrs[name] for r in results)
+            pairs.attrs[name] = toret.attrs[name]
+    toret.pairs = pairs
+
+    # and the pairs between regions
+    if toret.attrs.get('region', None) is not None:
+        nregions = max(r.attrs['nregions'] for r in results)
+        region_pairs = [r.get_region_pairs(nregions) for r in results]
+        toret.region_pairs = region_pairs[0][0].copy()
+        for name in ['npairs', 'wnpairs']:
+            toret.region_pairs[name] = sum(pairs[name] for pairs, total in region_pairs)
+        toret.attrs['nregions'] = nregions
+        toret.attrs['region_total_wnpairs'] = sum(total for pairs, total in region_pairs)
+    return toret
+
+def _pair_count_token(randoms1, randoms2, split_randoms, kwargs):
+    """
+    Internal function to return the arguments identifying a random -
+    random pair count in the pair count cache; the same on all ranks.
+    """
+    from dask.base import tokenize
+    from nbodykit.algorithms.pair_counters.base import weight_columns
+
+    # these do not change the result
+    ignored = ['show_progress', 'domain_factor', 'decomposition']
+
+    def token(value):
+        # the names of dask arrays are hashes of their graphs
+        if hasattr(value, 'dask'):
+            return (value.name, value.shape, str(value.dtype))
+        # a cosmology is identified by its parameters
+        if hasattr(value, 'pars'):
+            return sorted(value.pars.items())
+        return value
+
+    names = [kwargs[k] for k in ['ra', 'dec', 'redshift', 'position', 'region'] if kwargs.get(k, None) is not None]
+    if kwargs.get('weight', None) is not None:
+        names += weight_columns(kwargs['weight'])
+    catalogs = []
+    for source in [randoms1, randoms2]:
+        columns = [source[name] for name in names + ['Selection'] if name in source]
+        local = tokenize([token(column) for column in columns])
+        catalogs.append((source.csize, source.comm.allgather(local)))
+
+    config = dict((k, token(v)) for k, v in kwargs.items() if k not in ignored)
+    return (catalogs, randoms2 is randoms1, split_randoms, tokenize(config))
+
 def NaturalEstimator(D1D2):
     """
     Internal function to computing the correlation function using
@@ -1,6 +1,6 @@
 from runtests.mpi import MPITest
 from nbodykit.lab import *
-from nbodykit import setup_logging
+from nbodykit import setup_logging, set_options
 
 from numpy.testing import assert_array_equal, assert_allclose
 import kdcount.correlate as correlate
@@ -212,6 +212,64 @@ def test_survey_cross(comm):
     assert_allclose(D2R1['npairs'], r.D2R1['npairs'])
     assert_allclose(R1R2['npairs'], r.R1R2['npairs'])
 
+@MPITest([4])
+def test_survey_split_randoms(comm):
+    import tempfile, shutil
+    cosmo = cosmology.Planck15
+
+    # data and randoms
+    data, randoms = generate_survey_data(seed=42, comm=comm)
+    redges = numpy.linspace(1.0, 10, 5)
+
+    r = SurveyData2PCF('1d', data, randoms, redges, cosmo=cosmo)
+
+    path = comm.bcast(tempfile.mkdtemp() if comm.rank == 0 else None)
+    with set_options(paircount_cache_dir=path):
+        r1 = SurveyData2PCF('1d', data, randoms, redges, cosmo=cosmo, split_randoms=4)
+
+        # a quarter of the random pairs, with the same normalized counts
+        assert r1.R1R2['npairs'].sum() < 0.3 * r.R1R2['npairs'].sum()
+        RR = r.R1R2['wnpairs'] / r.R1R2.attrs['total_wnpairs']
+        RR1 = r1.R1R2['wnpairs'] / r1.R1R2.attrs['total_wnpairs']
+        assert_allclose(RR1, RR, rtol=0.1)
+        assert_allclose(r1.corr['corr'], r.corr['corr'], atol=0.05)
+        assert_array_equal(r1.D1D2['npairs'], r.D1D2['npairs'])
+        assert_array_equal(r1.D1R2['npairs'], r.D1R2['npairs'])
+
+        # the random pairs of new data are loaded from the cache
+        data2, _ = generate_survey_data(seed=84, comm=comm)
+        r2 = SurveyData2PCF('1d', data2, randoms, redges, cosmo=cosmo, split_randoms=4)
+        assert len(os.listdir(path)) == 1
+        assert_array_equal(r2.R1R2['npairs'], r1.R1R2['npairs'])
+        assert r2.R1R2.attrs['total_wnpairs'] == r1.R1R2.attrs['total_wnpairs']
+
+    comm.barrier()
+    if comm.rank == 0:
+        shutil.rmtree(path)
+
+@MPITest([1, 4])
+def test_sim_jackknife_regions(comm):
+
+    # data and randoms, labeled by four regions
+    data = generate_sim_data(seed=42, comm=comm)
+    randoms = UniformCatalog(nbar=6e-4, BoxSize=512., seed=84, comm=comm)
+    for cat in [data, randoms]:
+        cat['Region'] = (cat['Position'][:,0] // 256).astype('i4') * 2 + (cat['Position'][:,1] // 256).astype('i4')
+
+    redges = numpy.linspace(5.0, 25.0, 5)
+    r = SimulationBox2PCF('1d', data, redges, periodic=False, randoms1=randoms, region='Region')
+    assert r.corr_jk.shape == (4, 4)
+
+    # the full correlation is unchanged
+    r1 = SimulationBox2PCF('1d', data, redges, periodic=False, randoms1=randoms)
+    assert_allclose(r.corr['corr'], r1.corr['corr'])
+
+    # each jackknife sample matches the pair counts without the region
+    for k in range(4):
+        d = data[data['Region'] != k]
+        rk = SimulationBox2PCF('1d', d, redges, periodic=False, randoms1=randoms[randoms['Region'] != k])
+        assert_allclose(r.corr_jk[k], rk.corr['corr'], rtol=1e-10)
+
 @MPITest([1])
 def test_low_nbar_randoms(comm):
 
@@ -36,20 +36,23 @@ class BasePairCount2PCF(object):
         the second data catalog to cross-correlate; must have a 'Position' column
     R1R2 : SimulationBoxPairCount, SurveyDataPairCount, optional
         if provided, random pairs R1R2 are not recalculated in the Landy-Szalay estimator
+    split_randoms : int, optional
+        if provided, count the random pairs R1R2 of the Landy-Szalay estimator
+        within this number of independent subsets of the randoms only
     **kws :
         additional keyword arguments passed to the appropriate pair counting class
     """
 
     def __init__(self, mode, data1, edges,
                     Nmu=None, pimax=None,
-                    randoms1=None, randoms2=None, data2=None, R1R2=None, **kws):
+                    randoms1=None, randoms2=None, data2=None, R1R2=None, split_randoms=None, **kws):
 
         self.comm = data1.comm
 
         edges = numpy.array(edges)
 
         # store the attributes
-        self.attrs = {'mode':mode, 'edges':edges, 'Nmu':Nmu, 'pimax':pimax}
+        self.attrs = {'mode':mode, 'edges':edges, 'Nmu':Nmu, 'pimax':pimax, 'split_randoms':split_randoms}
         self.attrs.update(kws)
 
         # store the catalogs
@@ -84,6 +87,7 @@ class BasePairCount2PCF(object):
         # get the config
         attrs = self.attrs.copy()
         config = attrs.pop('config')
+        split_randoms = attrs.pop('split_randoms')
         attrs.update(config)
 
         # whether we are doing sim volume or mock survey
@@ -95,6 +99,9 @@ class BasePairCount2PCF(object):
         # use analytic randoms for a periodic box
         if 'periodic' in attrs and attrs['periodic'] and self.randoms1 is None:
 
+            if attrs.get('region', None) is not None:
+                raise ValueError("jackknife regions require a catalog of randoms as the ``randoms1`` keyword")
+
             if attrs['mode'] == 'angular':
                 self.data1 = _restrict_to_spherical_volume(self.data1, self.data1[attrs['position']], self.data1.attrs['BoxSize'])
                 if self.data2 is not None:
@@ -110,6 +117,7 @@ class BasePairCount2PCF(object):
             self.R1R2, self.corr = NaturalEstimator(DD)
             self.D1D2 = DD.pairs
             self.D1R2 = self.D2R1 = None
+            self.corr_jk = None
 
         # need catalog randoms
         else:
@@ -126,8 +134,9 @@ class BasePairCount2PCF(object):
             # use the Landy-Szalay estimator
             result = LandySzalayEstimator(pair_counter, self.data1, self.data2,
                                             self.randoms1, self.randoms2, R1R2=self.R1R2,
-                                            logger=self.logger, **attrs)
+                                            logger=self.logger, split_randoms=split_randoms, **attrs)
             self.D1D2, self.D1R2, self.D2R1, self.R1R2, self.corr = result
+            self.corr_jk = self.corr.attrs.pop('corr_jk', None)
 
     def __getstate__(self):
 
@@ -142,6 +151,7 @@ class BasePairCount2PCF(object):
             else:
                 state[pc] = None
 
+        state['corr_jk'] = getattr(self, 'corr_jk', None)
         state['attrs'] = self.attrs
         return state
 
@@ -149,6 +159,7 @@ class BasePairCount2PCF(object):
 
         edges = state.pop('edges')
         dims = state.pop('dims')
+        state.setdefault('corr_jk', None)
         self.__dict__.update(state)
 
         self.corr = WedgeBinnedStatistic(dims, edges, self.corr)
@@ -239,6 +250,20 @@ class SimulationBox2PCF(BasePairCount2PCF):
         if not provided, analytic randoms will be used
     R1R2 : SimulationBoxPairCount, optional
         if provided, random pairs R1R2 are not recalculated in the Landy-Szalay estimator
+    split_randoms : int, optional
+        if provided, count the random pairs R1R2 of the Landy-Szalay estimator
+        as the sum of the pairs within this number of independent subsets of
+        the randoms, at a fraction ``1 / split_randoms`` of the cost of the
+        full R1R2 (Keihanen et al. 2019); the data - random pairs use all
+        of the randoms. R1R2 is also loaded from the ``paircount_cache_dir``
+        cache if set; see :class:`~nbodykit.set_options`
+    region : str, optional
+        the name of an integer column labelling the jackknife region of each
+        object in the data and the randoms, from 0 to the number of regions
+        minus one; if given, the pairs between each pair of regions are
+        counted in the same pass as the total pairs, and the correlation
+        functions with each region left out in turn are computed from them,
+        in :attr:`corr_jk`
     periodic : bool, optional
         whether to use periodic boundary conditions
     BoxSize : float, 3-vector, optional
@@ -278,9 +303,9 @@ class SimulationBox2PCF(BasePairCount2PCF):
     logger = logging.getLogger('SimulationBox2PCF')
 
     def __init__(self, mode, data1, edges, Nmu=None, pimax=None,
-                    data2=None, randoms1=None, randoms2=None, R1R2=None,
+                    data2=None, randoms1=None, randoms2=None, R1R2=None, split_randoms=None,
                     periodic=True, BoxSize=None, los='z',
-                    weight='Weight', position='Position', show_progress=False, **config):
+                    weight='Weight', position='Position', show_progress=False, region=None, **config):
 
         # format the input arguments
         args = dict(locals())
@@ -303,6 +328,7 @@ class SimulationBox2PCF(BasePairCount2PCF):
         - :attr:`SimulationBox2PCF.R1R2`
         - :attr:`SimulationBox2PCF.corr`
         - :attr:`SimulationBox2PCF.wp` (if ``mode='projected'``)
+        - :attr:`SimulationBox2PCF.corr_jk` (if ``region`` is given)
 
         Attributes
         ----------
@@ -320,6 +346,11 @@ class SimulationBox2PCF(BasePairCount2PCF):
         wp : :class:`~nbodykit.binned_statistic.BinnedStatistic`
             the projected correlation function, :math:`w_p(r_p)`, computed
             if ``mode='projected'``; correlation is stored as the ``corr`` variable
+        corr_jk : numpy.ndarray
+            the correlation function values with each of the jackknife regions
+            left out in turn, of shape ``(nregions,)`` followed by the shape
+            of :attr:`corr`; the jackknife covariance is
+            ``(N - 1) / N * sum_k (corr_jk[k] - mean) (corr_jk[k] - mean)``
 
         Notes
         -----
@@ -377,6 +408,20 @@ class SurveyData2PCF(BasePairCount2PCF):
         for both.
     R1R2 : SurveyDataPairCount, optional
         if provided, random pairs R1R2 are not recalculated in the Landy-Szalay estimator
+    split_randoms : int, optional
+        if provided, count the random pairs R1R2 of the Landy-Szalay estimator
+        as the sum of the pairs within this number of independent subsets of
+        the randoms, at a fraction ``1 / split_randoms`` of the cost of the
+        full R1R2 (Keihanen et al. 2019); the data - random pairs use all
+        of the randoms. R1R2 is also loaded from the ``paircount_cache_dir``
+        cache if set; see :class:`~nbodykit.set_options`
+    region : str, optional
+        the name of an integer column labelling the jackknife region of each
+        object in the data and the randoms, from 0 to the number of regions
+        minus one; if given, the pairs between each pair of regions are
+        counted in the same pass as the total pairs, and the correlation
+        functions with each region left out in turn are computed from them,
+        in :attr:`corr_jk`
     ra : str, optional
         the name of the column in the source specifying the
         right ascension coordinates in units of degrees; default is 'RA'
@@ -392,6 +437,11 @@ class SurveyData2PCF(BasePairCount2PCF):
         if ``True``, perform the pair counting calculation in 10 iterations,
         logging the progress after each iteration; this is useful for
         understanding the scaling of the code
+    decomposition : 'grid', 'bisection', optional
+        the domain decomposition of the pair counting; ``'bisection'``
+        recursively bisects the actual distribution of the data, which
+        avoids mostly empty domains on curved sky footprints; see
+        :class:`~nbodykit.algorithms.SurveyDataPairCount`
     **config : key/value pairs
         additional keywords to pass to the :mod:`Corrfunc` function
 
@@ -414,9 +464,9 @@ class SurveyData2PCF(BasePairCount2PCF):
     logger = logging.getLogger('SurveyData2PCF')
 
     def __init__(self, mode, data1, randoms1, edges, cosmo=None,
-                    Nmu=None, pimax=None, data2=None, randoms2=None, R1R2=None,
+                    Nmu=None, pimax=None, data2=None, randoms2=None, R1R2=None, split_randoms=None,
                     ra='RA', dec='DEC', redshift='Redshift', weight='Weight',
-                    show_progress=False, **config):
+                    show_progress=False, decomposition='grid', region=None, **config):
 
         # format the input arguments
         args = dict(locals())
@@ -439,6 +489,7 @@ class SurveyData2PCF(BasePairCount2PCF):
         - :attr:`SurveyData2PCF.R1R2`
         - :attr:`SurveyData2PCF.corr`
         - :attr:`SurveyData2PCF.wp` (if ``mode='projected'``)
+        - :attr:`SurveyData2PCF.corr_jk` (if ``region`` is given)
 
         Attributes
         ----------
@@ -456,6 +507,11 @@ class SurveyData2PCF(BasePairCount2PCF):
         wp : :class:`~nbodykit.binned_statistic.BinnedStatistic`
             the projected correlation function, :math:`w_p(r_p)`, computed
             if ``mode='projected'``; correlation is stored as the ``corr`` variable
+        corr_jk : numpy.ndarray
+            the correlation function values with each of the jackknife regions
+            left out in turn, of shape ``(nregions,)`` followed by the shape
+            of :attr:`corr`; the jackknife covariance is
+            ``(N - 1) / N * sum_k (corr_jk[k] - mean) (corr_jk[k] - mean)``
 
         Notes
         -----
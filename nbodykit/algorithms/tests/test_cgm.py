@@ -114,6 +114,46 @@ def test_nonperiodic_cgm(comm):
     assert_array_equal(cen_id, cen_id2)
     assert_array_equal(cgm_gal_type, cgm_gal_type2)
 
+@MPITest([1, 4])
+def test_bisection_cgm(comm):
+
+    source = UniformCatalog(3e-4, BoxSize=256, seed=42, comm=comm)
+
+    # add mass
+    logmass = source.rng.uniform(12, 15)
+    source['halo_mvir'] = 10**(logmass)
+
+    # add fake galaxy types
+    gal_type = numpy.empty(len(source))
+    gal_type[logmass<14.5] = 0
+    gal_type[logmass>14.5] = 1
+    source['gal_type'] = gal_type
+
+    # run the algorithm
+    rankby = ['halo_mvir', 'gal_type']
+    rpar = 10.0
+    rperp = 10.0
+    r = CylindricalGroups(source, rpar=rpar, rperp=rperp, rankby=rankby, periodic=True,
+                          flat_sky_los=[0,0,1], decomposition='bisection')
+
+    # data for direct CGM
+    pos = numpy.concatenate(comm.allgather(source['Position']), axis=0)
+    mass = numpy.concatenate(comm.allgather(source['halo_mvir']), axis=0)
+    gal_type = numpy.concatenate(comm.allgather(source['gal_type']), axis=0)
+
+    # direct results
+    kws = {'periodic':True, 'BoxSize':source.attrs['BoxSize']}
+    N_cgm, cgm_gal_type, cen_id = direct_cgm(pos, mass, gal_type, rperp, rpar, **kws)
+
+    # gather and compare
+    N_cgm2 = numpy.concatenate(comm.allgather(r.groups['num_cgm_sats']), axis=0)
+    cen_id2 = numpy.concatenate(comm.allgather(r.groups['cgm_haloid']), axis=0)
+    cgm_gal_type2 = numpy.concatenate(comm.allgather(r.groups['cgm_type']), axis=0)
+
+    assert_array_equal(N_cgm, N_cgm2)
+    assert_array_equal(cen_id, cen_id2)
+    assert_array_equal(cgm_gal_type, cgm_gal_type2)
+
 
 def direct_cgm(pos, mass, gal_type, rperp, rpar, periodic=False, BoxSize=None):
     """
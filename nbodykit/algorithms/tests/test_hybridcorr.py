@@ -0,0 +1,92 @@
+from runtests.mpi import MPITest
+from nbodykit.lab import *
+from nbodykit import setup_logging
+from numpy.testing import assert_array_equal, assert_allclose
+import os
+import pytest
+
+# debug logging
+setup_logging("debug")
+
+@MPITest([1, 4])
+def test_hybridcorr_1d(comm):
+
+    source = UniformCatalog(nbar=3e-4, BoxSize=512., seed=42, comm=comm)
+    redges = numpy.linspace(10, 150, 15)
+
+    r = HybridCorr('1d', source, redges, rcross=40., Nmesh=128)
+    corr = r.corr
+    assert_array_equal(corr['provenance'], [0] * 3 + [1] * 11)
+    assert corr.attrs['provenance'] == ['direct', 'fft']
+    assert corr.attrs['crossover_residual'].shape == (1,)
+
+    # below the crossover, the pair counts
+    direct = SimulationBox2PCF('1d', source, redges[:5], periodic=True)
+    assert_allclose(corr['corr'][:3], direct.corr['corr'][:3])
+    assert_allclose(corr['r'][:3], direct.corr['r'][:3])
+
+    # above, the FFT weighted by the number of separations in each bin
+    x = r.fft.corr.coords['r']
+    modes = r.fft.corr['modes']
+    xi = r.fft.corr['corr'].real
+    for i in range(3, 14):
+        valid = (x >= redges[i]) & (x < redges[i+1])
+        assert_allclose(corr['corr'][i], (modes * xi)[valid].sum() / modes[valid].sum())
+
+    # matching at the crossover
+    assert_allclose(corr.attrs['crossover_residual'], corr['corr'][3] - direct.corr['corr'][3])
+
+@MPITest([1, 4])
+def test_hybridcorr_clustered(comm):
+
+    # Gaussian clusters of 16 objects, correlated well past the crossover
+    rng = numpy.random.RandomState(42 + comm.rank)
+    ncen = 2500 // comm.size
+    centers = rng.uniform(0, 512., size=(ncen, 1, 3))
+    pos = centers + rng.normal(scale=15., size=(ncen, 16, 3))
+    source = ArrayCatalog({'Position': pos.reshape(-1, 3) % 512.}, BoxSize=[512.]*3, comm=comm)
+    redges = numpy.linspace(10, 150, 15)
+
+    r = HybridCorr('1d', source, redges, rcross=40., Nmesh=128, overlap=2)
+    direct = r.direct.corr['corr'][3:5]
+    residual = r.corr.attrs['crossover_residual']
+    assert (direct > 0.005).all()
+
+    # in the overlap bins the estimators agree to well below the signal
+    assert (abs(residual) < 0.1 * direct + 1e-3).all()
+
+@MPITest([1])
+def test_hybridcorr_2d_save(comm):
+
+    source = UniformCatalog(nbar=3e-4, BoxSize=512., seed=42, comm=comm)
+    redges = numpy.linspace(10, 150, 15)
+
+    r = HybridCorr('2d', source, redges, rcross=50., Nmesh=128, Nmu=5, los='x', overlap=2)
+    assert r.corr.shape == (14, 5)
+    assert r.corr.attrs['crossover_residual'].shape == (2, 5)
+    assert_array_equal(r.corr['provenance'][:4], 0)
+    assert_array_equal(r.corr['provenance'][4:], 1)
+    poles = r.corr.to_poles([0, 2])
+
+    r.save('hybridcorr-test.json')
+    r2 = HybridCorr.load('hybridcorr-test.json', comm=comm)
+
+    assert_array_equal(r.corr['corr'], r2.corr['corr'])
+    assert_array_equal(r.corr['provenance'], r2.corr['provenance'])
+    assert r2.corr.attrs['rcross'] == 50.
+
+    if comm.rank == 0: os.remove('hybridcorr-test.json')
+
+@MPITest([1])
+def test_hybridcorr_bad_crossover(comm):
+
+    source = UniformCatalog(nbar=3e-4, BoxSize=512., seed=42, comm=comm)
+    redges = numpy.linspace(10, 150, 15)
+
+    # the crossover is not a bin edge
+    with pytest.raises(ValueError):
+        r = HybridCorr('1d', source, redges, rcross=45., Nmesh=128)
+
+    # the crossover is within a few cells
+    with pytest.warns(UserWarning):
+        r = HybridCorr('1d', source, redges, rcross=20., Nmesh=32)
@@ -334,6 +334,11 @@ class SurveyData3PCF(Base3PCF):
         the integer value by which to oversubscribe the domain decomposition
         mesh before balancing loads; this number can affect the distribution
         of loads on the ranks -- an optimal value will lead to balanced loads
+    decomposition : 'grid', 'bisection', optional
+        the domain decomposition; ``'grid'`` balances the cells of a mesh
+        over the bounding box of the data, and ``'bisection'`` recursively
+        bisects the actual distribution of the data, which avoids mostly
+        empty domains on curved sky footprints
 
     References
     ----------
@@ -342,7 +347,8 @@ class SurveyData3PCF(Base3PCF):
     logger = logging.getLogger("SurveyData3PCF")
 
     def __init__(self, source, poles, edges, cosmo, domain_factor=4,
-                    ra='RA', dec='DEC', redshift='Redshift', weight='Weight'):
+                    ra='RA', dec='DEC', redshift='Redshift', weight='Weight',
+                    decomposition='grid'):
 
         # initialize the base class
         required_cols = [ra, dec, redshift, weight]
@@ -355,6 +361,7 @@ class SurveyData3PCF(Base3PCF):
         self.attrs['dec'] = dec
         self.attrs['redshift'] = redshift
         self.attrs['domain_factor'] = domain_factor
+        self.attrs['decomposition'] = decomposition
 
         # run the algorithm
         self.poles = self.run()
@@ -384,7 +391,8 @@ class SurveyData3PCF(Base3PCF):
                                                             self.attrs, self.logger,
                                                             smoothing,
                                                             return_cartesian=True,
-                                                            domain_factor=self.attrs['domain_factor'])
+                                                            domain_factor=self.attrs['domain_factor'],
+                                                            decomposition=self.attrs['decomposition'])
 
         # run the algorithm
         return self._run(pos, w, pos_sec, w_sec)
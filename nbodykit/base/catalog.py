@@ -32,9 +32,13 @@ class ColumnAccessor(da.Array):
     is_default : bool, optional
         whether this column is a default column; default columns are not
         serialized to disk, as they are automatically available as columns
+    column : str, optional
+        the name of the hard-coded column of ``catalog`` this accessor
+        reads, if any; used to push row selections down to the storage
+        via :func:`CatalogSourceBase.read_rows`
 
     """
-    def __new__(cls, catalog, daskarray, is_default=False):
+    def __new__(cls, catalog, daskarray, is_default=False, column=None):
         self = da.Array.__new__(ColumnAccessor,
                 daskarray.dask,
                 daskarray.name,
@@ -44,6 +48,10 @@ class ColumnAccessor(da.Array):
         self.catalog = catalog
         self.is_default = is_default
         self.attrs = {}
+
+        # the hard column and the local row range of it that we view
+        self.column = column
+        self.rows = None if column is None else (0, len(daskarray))
         return self
 
     def __getitem__(self, key):
@@ -58,6 +66,13 @@ class ColumnAccessor(da.Array):
         # return a ColumnAccessor (okay b/c __setitem__ checks for circular references)
         toret = ColumnAccessor(self.catalog, d)
         toret.attrs.update(self.attrs)
+
+        # contiguous row slices keep track of the rows in the hard column
+        if self.rows is not None and isinstance(key, slice):
+            start, stop, step = key.indices(self.rows[1] - self.rows[0])
+            if step == 1:
+                toret.column = self.column
+                toret.rows = (self.rows[0] + start, self.rows[0] + max(start, stop))
         return toret
 
     def as_daskarray(self):
@@ -77,10 +92,13 @@ class ColumnAccessor(da.Array):
 
             The dask default optimizer induces too many (unnecesarry)
             IO calls. We turn this feature off by default, and only apply a culling.
+            Common tasks are merged if the ``merge_common_tasks`` option is set.
 
         """
         from dask.optimization import cull
         dsk2, dependencies = cull(dsk, keys)
+        if _global_options['merge_common_tasks']:
+            dsk2, merged = merge_common_tasks(dsk2, keys)
         return dsk2
 
     def compute(self):
@@ -94,6 +112,118 @@ class ColumnAccessor(da.Array):
             r = r + " last: %s" % str(self[-1].compute())
         return r
 
+def _substitute_keys(task, canon):
+    """
+    Replace the keys referenced by ``task`` with their canonical keys.
+    """
+    from dask.core import istask
+    if istask(task):
+        return (task[0],) + tuple(_substitute_keys(arg, canon) for arg in task[1:])
+    if isinstance(task, list):
+        return [_substitute_keys(arg, canon) for arg in task]
+    try:
+        return canon.get(task, task)
+    except TypeError: # unhashable literals
+        return task
+
+def _normalize_subgraphs(task, tokens):
+    """
+    Replace the fused subgraphs called by ``task`` with a token of their
+    structure, which does not depend on the names of their inner keys.
+    """
+    from dask.core import istask, toposort
+    from dask.optimization import SubgraphCallable
+    from dask.base import tokenize
+
+    if istask(task):
+        func = task[0]
+        if isinstance(func, SubgraphCallable):
+            if id(func) not in tokens:
+                names = dict((key, ('_in', i)) for i, key in enumerate(func.inkeys))
+                for i, key in enumerate(toposort(func.dsk)):
+                    names.setdefault(key, ('_task', i))
+                inner = [(names[key], _normalize_subgraphs(_substitute_keys(func.dsk[key], names), tokens))
+                         for key in toposort(func.dsk)]
+                # keep func alive, such that its id is not reused
+                tokens[id(func)] = (func, tokenize(inner, names[func.outkey]))
+            func = ('SubgraphCallable', tokens[id(func)][1])
+        return (func,) + tuple(_normalize_subgraphs(arg, tokens) for arg in task[1:])
+    if isinstance(task, list):
+        return [_normalize_subgraphs(arg, tokens) for arg in task]
+    return task
+
+def merge_common_tasks(dsk, keys):
+    """
+    Merge the tasks of a dask graph that compute the same thing.
+
+    Columns derived independently from the same input (e.g., several
+    outputs of :func:`~nbodykit.transform.CartesianToSky`, or a selection
+    applied to many columns) can end up with different keys for the same
+    computation. This is only valid if the functions of the graph are pure:
+    two tasks calling an impure function (e.g., drawing random numbers)
+    with the same arguments are merged as well. It is therefore only applied
+    if the ``merge_common_tasks`` option is set; see
+    :class:`~nbodykit.set_options`. Tasks are compared after replacing their dependencies
+    with the canonical (first seen) key of each equivalence class, such that
+    equal subexpressions are merged level by level. Tasks that do not
+    tokenize deterministically are never merged. Fused subgraphs (e.g., of
+    element-wise operations) are compared by structure, as their inner keys
+    carry the names of the arrays.
+
+    Parameters
+    ----------
+    dsk : dict
+        the dask graph
+    keys : list
+        the (possibly nested) list of output keys; these remain valid keys
+        of the returned graph
+
+    Returns
+    -------
+    dsk : dict
+        the graph where each merged task is an alias of its canonical key
+    merged : int
+        the number of tasks that were merged
+    """
+    from dask.core import istask, toposort, flatten
+    from dask.optimization import cull
+    from dask.base import tokenize
+
+    canon = {}
+    seen = {}
+    subgraphs = {}
+    dsk2 = {}
+    for key in toposort(dsk):
+        task = dsk[key]
+        if istask(task) or isinstance(task, list):
+            task = _substitute_keys(task, canon)
+            token = tokenize(_normalize_subgraphs(task, subgraphs))
+        else:
+            try:
+                alias = task in dsk
+            except TypeError:
+                alias = False
+            if alias:
+                # an alias is equivalent to its target
+                canon[key] = canon.get(task, task)
+                dsk2[key] = canon[key]
+                continue
+            # literal data is only the same if it is the same object
+            token = id(task)
+
+        if token in seen:
+            canon[key] = seen[token]
+            dsk2[key] = seen[token]
+        else:
+            seen[token] = key
+            dsk2[key] = task
+
+    merged = sum(1 for key in canon if canon[key] != key)
+    if merged:
+        # drop the aliases that are no longer referenced
+        dsk2, dependencies = cull(dsk2, list(flatten(keys)))
+    return dsk2, merged
+
 def column(name=None, is_default=False):
     """
     Decorator that defines the decorated function as a column in a
@@ -372,10 +502,12 @@ class CatalogSourceBase(object):
             if self.base is None:
                 # get the right column
                 is_default = False
+                column = None
                 if sel in self._overrides:
                     r = self._overrides[sel]
                 elif sel in self.hardcolumns:
                     r = self.get_hardcolumn(sel)
+                    column = sel
                 elif sel in self._defaults:
                     r = getattr(self, sel)()
                     is_default = True
@@ -383,7 +515,7 @@ class CatalogSourceBase(object):
                     raise KeyError("column `%s` is not defined in this source; " %sel + \
                                     "try adding column via `source[column] = data`")
                 # return a ColumnAccessor for pretty prints
-                return ColumnAccessor(self, r, is_default=is_default)
+                return ColumnAccessor(self, r, is_default=is_default, column=column)
             else:
                 # chain to the memory owner
                 # this will not work if there are overrides
@@ -527,6 +659,37 @@ class CatalogSourceBase(object):
         else:
             raise ValueError("no such hard-coded column %s" %col)
 
+    def read_rows(self, col, index):
+        """
+        Read a hard-coded column only at the given local rows, directly
+        from the underlying storage.
+
+        This is the hook used by the selection pushdown mode (see the
+        ``selection_pushdown`` option of :class:`~nbodykit.set_options`).
+        Catalogs backed by files override this to read only the requested
+        rows; the default returns ``None``, meaning the rows cannot be
+        pushed down and the full column must be computed instead.
+
+        .. note::
+            If the :attr:`base` attribute is set, ``read_rows()``
+            will called using :attr:`base` instead of ``self``.
+
+        Parameters
+        ----------
+        col : str
+            the name of the hard-coded column
+        index : array_like
+            sorted integer array of the local rows to read
+
+        Returns
+        -------
+        array_like or None :
+            the column data at ``index``, or ``None`` if not supported
+        """
+        if self.base is not None: return self.base.read_rows(col, index)
+
+        return None
+
     def compute(self, *args, **kwargs):
         """
         Our version of :func:`dask.compute` that computes
@@ -547,19 +710,56 @@ class CatalogSourceBase(object):
             Otherwise it's passed through unchanged.
 
         """
-        import dask
+        from dask.base import unpack_collections, collections_to_dsk, get_scheduler
+        from dask.local import get_sync
+        from nbodykit import _get_thread_pool
+        from mpi4py import MPI
+        import dask.threaded
+        import time
 
         # return the base compute if it exists
         if self.base is not None:
             return self.base.compute(*args, **kwargs)
 
-        toret = dask.compute(*args, **kwargs)
+        # this is dask.compute, except that tasks shared between the
+        # collections can be merged, such that they are computed once
+        collections, repack = unpack_collections(*args, traverse=kwargs.pop('traverse', True))
+        if not collections:
+            toret = args
+        else:
+            schedule = get_scheduler(scheduler=kwargs.pop('scheduler', None),
+                                     collections=collections,
+                                     get=kwargs.pop('get', None))
+
+            dsk = collections_to_dsk(collections, kwargs.pop('optimize_graph', True), **kwargs)
+            keys = [x.__dask_keys__() for x in collections]
+            postcomputes = [x.__dask_postcompute__() for x in collections]
+
+            if _global_options['merge_common_tasks']:
+                ntasks = len(dsk)
+                t0 = time.time()
+                dsk, merged = merge_common_tasks(dsk, keys)
+                self.logger.debug("merged %d of %d tasks shared between columns in %.3f s"
+                                  % (merged, ntasks, time.time() - t0))
+
+            # hybrid mode: run the chunks on a pool of threads of this rank.
+            # The tasks start in the same priority order as with the
+            # synchronous scheduler, and the scheduler and the callbacks stay
+            # on the main thread; a nested compute from a worker thread
+            # runs synchronously.
+            nthreads = _global_options['threads_per_rank']
+            if nthreads > 1 and schedule is get_sync and MPI.Is_thread_main():
+                schedule = dask.threaded.get
+                kwargs['pool'] = _get_thread_pool(nthreads)
+
+            results = schedule(dsk, keys, **kwargs)
+            toret = repack([f(r, *a) for r, (f, a) in zip(results, postcomputes)])
 
         # do not return tuples of length one
         if len(toret) == 1: toret = toret[0]
         return toret
 
-    def save(self, output, columns=None, dataset=None, datasets=None, header='Header', compute=True):
+    def save(self, output, columns=None, dataset=None, datasets=None, header='Header', compute=True, overlap=False):
         """
         Save the CatalogSource to a :class:`bigfile.BigFile`.
 
@@ -585,6 +785,13 @@ class CatalogSourceBase(object):
             if True, wait till the store operations finish
             if False, return a dictionary with column name and a future object for the store.
             use dask.compute() to wait for the store operations on the result.
+        overlap : boolean, default False
+            if True and ``compute`` is True, compute the chunks of all columns
+            together in a single pass over the dask graph, such that
+            computations shared by the columns are done only once, and write
+            the chunks with a background thread, overlapping the I/O with
+            the computation. The chunks waiting to be written are bounded by
+            the ``save_queue_size`` option; see :class:`~nbodykit.set_options`.
         """
         import bigfile
         import json
@@ -684,7 +891,27 @@ class CatalogSourceBase(object):
                                 raise ValueError("cannot save '%s' key in attrs dictionary" % key)
 
             # lock=False to avoid dask from pickling the lock with the object.
-            if compute:
+            if compute and overlap:
+                # compute all blocks in one pass; writes go through a queue
+                writer = _AsyncBlockWriter(_global_options['save_queue_size'])
+                wrapped = [writer.wrap(target) for target in targets]
+                if self.comm.rank == 0:
+                    self.logger.info("started writing columns %s" % str(columns))
+                with writer:
+                    da.store(sources, wrapped, regions=regions, lock=False, compute=True)
+                for target in targets:
+                    target.bb.close()
+
+                # write throughput of each rank, excluding the computation
+                rates = self.comm.allgather(writer.nbytes / 1024.**2 / max(writer.write_time, 1e-9))
+                nbytes = self.comm.allreduce(writer.nbytes)
+                elapsed = max(self.comm.allgather(writer.elapsed))
+                if self.comm.rank == 0:
+                    args = (str(columns), nbytes / 1024.**2, elapsed, numpy.mean(rates), min(rates), max(rates))
+                    self.logger.info("finished writing columns %s: %.1f MB in %.1f s, "
+                                     "writes at %.1f MB/s per rank (min %.1f, max %.1f)" % args)
+                future = None
+            elif compute:
                 # write blocks one by one
                 for column, source, target, region in zip(columns, sources, targets, regions):
                     if self.comm.rank == 0:
@@ -1097,6 +1324,100 @@ class CatalogSource(CatalogSourceBase):
 
         return c
 
+    def pin(self, columns=None):
+        """
+        Pin the selected columns in the :class:`~nbodykit.GlobalCache`,
+        such that their computed values are never evicted, for the lifetime
+        of this object.
+
+        The columns are kept in the cache once computed, e.g., by the first
+        :func:`compute` or painting that uses them.
+
+        Parameters
+        ----------
+        columns : list of str, optional
+            the names of the columns to pin; default is all columns
+        """
+        from nbodykit import GlobalCache
+
+        if columns is None:
+            columns = self.columns
+        if isinstance(columns, string_types):
+            columns = [columns]
+
+        from dask.core import flatten
+        keys = set()
+        for col in columns:
+            keys.update(flatten(self[col].__dask_keys__()))
+
+        GlobalCache.get().pin(keys, owner=self)
+
+    def checkpoint(self, columns=None, cache=None):
+        """
+        Return a copy of the CatalogSource, where the selected columns are
+        stored in, and read from, a persistent on-disk cache.
+
+        Columns are keyed by a hash of their dask graph, so a column that has
+        been checkpointed before (e.g., by a previous run of the same script)
+        is read back from disk instead of being computed again. Columns
+        missing from the cache are computed together in a single pass.
+
+        Unlike :func:`persist`, the columns are memory mapped from the
+        cache, rather than being held in memory.
+
+        Parameters
+        ----------
+        columns : list of str, optional
+            the names of the columns to checkpoint; default is all columns
+        cache : :class:`~nbodykit.diskcache.ColumnCache`, optional
+            the cache to use; default is the cache configured by the
+            ``column_cache_dir`` option, see :class:`~nbodykit.set_options`
+
+        Returns
+        -------
+        CatalogSource :
+            a copy of ``self``, with the selected columns replaced by
+            columns reading from the cache
+        """
+        from nbodykit.diskcache import ColumnCache
+
+        if cache is None:
+            cache = ColumnCache.get()
+
+        if columns is None:
+            columns = self.columns
+        if isinstance(columns, string_types):
+            columns = [columns]
+
+        arrays = [self[col] for col in columns]
+
+        # compute the missing columns together
+        cached = [cache.load(array) for array in arrays]
+        missing = [i for i, value in enumerate(cached) if value is None]
+        if len(missing):
+            computed = self.compute(*[arrays[i] for i in missing])
+            if len(missing) == 1: computed = [computed]
+            for i, value in zip(missing, computed):
+                cache.store(arrays[i], value, evict=False)
+                cached[i] = cache.load(arrays[i])
+                if cached[i] is None: # not readable back
+                    cached[i] = numpy.asarray(value)
+
+        nmissing = self.comm.allreduce(len(missing))
+        self.logger.info("checkpoint: %d of %d columns read from cache" %
+                    (len(columns) * self.comm.size - nmissing, len(columns) * self.comm.size))
+
+        # evict on a single rank, keeping the columns of all ranks
+        keys = self.comm.allgather([cache.key(array) for array in arrays])
+        if self.comm.rank == 0:
+            cache.evict(keep=set(sum(keys, [])))
+
+        toret = self.copy()
+        for col, array, value in zip(columns, arrays, cached):
+            toret[col] = da.from_array(value, chunks=array.chunks, name=array.name)
+
+        return toret
+
     def sort(self, keys, reverse=False, usecols=None):
         """
         Return a CatalogSource, sorted globally across all MPI ranks
@@ -1112,9 +1433,11 @@ class CatalogSource(CatalogSourceBase):
         ----------
         keys : list, tuple
             the names of columns to sort by. If multiple columns are provided,
-            the data is sorted consecutively in the order provided
+            the data is sorted by the first column, then ties are sorted by
+            the second column, and so on; rows with equal keys keep their
+            original order
         reverse : bool, optional
-            if ``True``, perform descending sort operations
+            if ``True``, sort in descending order of all keys
         usecols : list, optional
             the name of the columns to include in the returned CatalogSource
         """
@@ -1163,6 +1486,147 @@ class CatalogSource(CatalogSourceBase):
             toret.attrs.update(self.attrs)
             return toret
 
+    def groupby(self, by):
+        """
+        Group the rows of the CatalogSource by the value of an integer
+        column, e.g., a halo label, to compute reductions over each group.
+
+        Parameters
+        ----------
+        by : str
+            the name of the integer column holding the group labels
+
+        Returns
+        -------
+        :class:`~nbodykit.base.groupby.CatalogGroupBy` :
+            the grouped catalog; call its
+            :func:`~nbodykit.base.groupby.CatalogGroupBy.agg` method to
+            compute the reductions
+
+        Examples
+        --------
+        >>> halos = cat.groupby('HaloLabel').agg({'Mass' : ['sum', 'count']})
+        """
+        from nbodykit.base.groupby import CatalogGroupBy
+        return CatalogGroupBy(self, by)
+
+    def merge(self, other, on, how='inner', usecols=None, other_usecols=None, suffixes=('', '_other')):
+        """
+        Join the rows of the CatalogSource with the rows of ``other``
+        that have the same value of the integer column ``on``, e.g.,
+        galaxies to their host halos by halo ID.
+
+        Both catalogs are repartitioned by a hash of ``on`` with a single
+        all-to-all exchange each, and joined locally; the result is
+        redistributed evenly across ranks.
+
+        This is a **collective** operation.
+
+        Parameters
+        ----------
+        other : CatalogSource
+            the catalog to join with
+        on : str
+            the name of the integer column to join on; it must be a column
+            of both catalogs
+        how : 'inner', 'left'
+            with ``'inner'``, only rows with a match in both catalogs are
+            returned; with ``'left'``, rows of this catalog without a match
+            are kept, with the columns of ``other`` set to NaN (floating
+            types) or zero (other types)
+        usecols : list, optional
+            the columns of this catalog to include; default is all non-default
+            columns
+        other_usecols : list, optional
+            the columns of ``other`` to include; default is all non-default
+            columns
+        suffixes : tuple of str, optional
+            the suffixes appended to the names of columns present in both
+            catalogs, for this catalog and ``other`` respectively
+
+        Returns
+        -------
+        CatalogSource :
+            a catalog with a row per matching pair of rows, ordered by
+            the value of ``on`` within each rank; rows matching several
+            rows of ``other`` are repeated
+        """
+        from nbodykit.base.groupby import hash_partition
+        from nbodykit.utils import ExchangeArray
+
+        if how not in ['inner', 'left']:
+            raise ValueError("'how' should be 'inner' or 'left', not '%s'" % how)
+        if on not in self or on not in other:
+            raise ValueError("the join column '%s' must be a column of both catalogs" % on)
+        if other.comm.size != self.comm.size:
+            raise ValueError("cannot join catalogs on communicators of different sizes")
+
+        def select(cat, usecols):
+            if usecols is None:
+                usecols = [col for col in cat.columns if not cat[col].is_default]
+            elif isinstance(usecols, string_types):
+                usecols = [usecols]
+            bad = set(usecols) - set(cat.columns)
+            if len(bad):
+                raise ValueError("invalid column names in usecols: %s" %str(bad))
+            return [col for col in usecols if col != on]
+
+        lcols = select(self, usecols)
+        rcols = select(other, other_usecols)
+
+        # send the rows of both sides to the owner of their key
+        left = _pack_columns(self, [on] + lcols)
+        left = ExchangeArray(left, hash_partition(left[on], self.comm.size), self.comm)
+        right = _pack_columns(other, [on] + rcols)
+        right = ExchangeArray(right, hash_partition(right[on], self.comm.size), self.comm)
+
+        # join locally: the matches of each left row are a range of the sorted right rows
+        left = left[numpy.argsort(left[on], kind='mergesort')]
+        right = right[numpy.argsort(right[on], kind='mergesort')]
+        lo = numpy.searchsorted(right[on], left[on], side='left')
+        counts = numpy.searchsorted(right[on], left[on], side='right') - lo
+        if how == 'left':
+            nrows = numpy.maximum(counts, 1)
+        else:
+            nrows = counts
+        total = nrows.sum()
+        li = numpy.repeat(numpy.arange(len(left)), nrows)
+        ri = numpy.repeat(lo - (numpy.cumsum(nrows) - nrows), nrows) + numpy.arange(total)
+        matched = numpy.repeat(counts > 0, nrows)
+
+        # the output rows
+        names = {}
+        for col in lcols:
+            names[col, 0] = col + suffixes[0] if col in rcols else col
+        for col in rcols:
+            names[col, 1] = col + suffixes[1] if col in lcols else col
+        dtype = [(on, left.dtype[on])]
+        dtype += [(names[col, 0], left.dtype[col]) for col in lcols]
+        dtype += [(names[col, 1], right.dtype[col]) for col in rcols]
+        data = numpy.empty(total, dtype=dtype)
+        data[on] = left[on][li]
+        for col in lcols:
+            data[names[col, 0]] = left[col][li]
+        for col in rcols:
+            column = data[names[col, 1]]
+            if len(right):
+                column[...] = right[col][numpy.where(matched, ri, 0)]
+            column[~matched] = numpy.nan if column.dtype.kind in 'fc' else 0
+
+        self.logger.debug("rank %d joined %d rows with %d rows into %d rows" % (self.comm.rank, len(left), len(right), total))
+
+        # balance the rows across ranks, keeping their order
+        sizes = self.comm.allgather(total)
+        start = sum(sizes[:self.comm.rank])
+        bounds = numpy.array([sum(sizes) * i // self.comm.size for i in range(self.comm.size)])
+        dest = numpy.searchsorted(bounds, numpy.arange(start, start + total), side='right') - 1
+        data = ExchangeArray(data, dest, self.comm)
+
+        cols = dict((name, data[name]) for name in data.dtype.names)
+        toret = CatalogSource._from_columns(len(data), self.comm, **cols)
+        toret.attrs.update(self.attrs)
+        return toret
+
     @column(is_default=True)
     def Selection(self):
         """
@@ -1216,10 +1680,54 @@ class CatalogSource(CatalogSourceBase):
         return ConstantArray(1.0, self.size, chunks=_global_options['dask_chunk_size'])
 
 
+def _sortable_key(array, reverse=False):
+    """
+    Map the values of a column to unsigned integers of the same order.
+
+    Floating point values are mapped with the usual trick of flipping the
+    sign bit of positive values and all bits of negative values; signed
+    integers have their sign bit flipped.
+
+    Returns
+    -------
+    key : array_like
+        the unsigned integer key, in ascending order of the column, or in
+        descending order if ``reverse`` is ``True``
+    nbits : int
+        the number of significant bits of ``key``
+    """
+    array = numpy.ascontiguousarray(array)
+    dt = array.dtype
+    if dt.kind not in 'fiub' or dt.shape:
+        raise ValueError("must be integer or floating type")
+
+    # the bits are only ordered in the native byte order
+    if not dt.isnative:
+        dt = dt.newbyteorder('=')
+        array = array.astype(dt)
+
+    nbits = 8 * dt.itemsize
+    key = array.view('u%d' % dt.itemsize)
+    signbit = key.dtype.type(1 << (nbits - 1))
+    if dt.kind == 'f':
+        negative = (key & signbit) != 0
+        key = numpy.where(negative, ~key, key | signbit)
+    elif dt.kind == 'i':
+        key = key ^ signbit
+
+    if reverse:
+        key = ~key
+    return key, nbits
+
 def _sort_data(comm, cat, rankby, reverse=False, usecols=None):
     """
     Sort the input data by the specified columns
 
+    The sort keys are packed into a single composite integer key, with
+    the original position of each row as the least significant part, such
+    that ties keep their original order. Only the composite keys are sorted;
+    the data is then moved to its sorted position once.
+
     Parameters
     ----------
     comm :
@@ -1242,46 +1750,187 @@ def _sort_data(comm, cat, rankby, reverse=False, usecols=None):
     # remove duplicates from usecols
     usecols = list(set(usecols))
 
-    # the columns we need in the sort steps
+    # compute the sort keys and the data in a single pass
     columns = list(set(rankby)|set(usecols))
+    values = cat.compute(*[cat[col] for col in columns])
+    if len(columns) == 1:
+        values = [values]
+    values = dict(zip(columns, values))
+
+    # the original global position of each row
+    start = sum(comm.allgather(cat.size)[:comm.rank])
+    origin = numpy.arange(start, start + cat.size, dtype='u8')
+
+    # pack the sort keys into 64-bit words, starting from the least
+    # significant word (the original position)
+    words = [origin]
+    word = numpy.zeros(cat.size, dtype='u8')
+    used = 0
+    for col in reversed(rankby):
+        try:
+            key, nbits = _sortable_key(values[col], reverse=reverse)
+        except ValueError:
+            args = (col, str(values[col].dtype))
+            raise ValueError("cannot sort by column '%s' with dtype '%s'; must be integer or floating type" %args)
+        if used + nbits > 64:
+            words.append(word)
+            word = numpy.zeros(cat.size, dtype='u8')
+            used = 0
+        word |= key.astype('u8') << numpy.uint64(used)
+        used += nbits
+    words.append(word)
+
+    # sort the composite keys; mpsort orders multi-word keys
+    # with the last word being the most significant
+    sortkey = numpy.empty(cat.size, dtype=[('key', ('u8', len(words)))])
+    for i, word in enumerate(words):
+        sortkey['key'][:, i] = word
+    mpsort.sort(sortkey, orderby='key', comm=comm)
+
+    # move the data to the sorted positions at once
+    dtype = [(col, values[col].dtype, values[col].shape[1:]) for col in cat if col in usecols]
+    data = numpy.empty(cat.size, dtype=dtype)
+    for col in usecols:
+        data[col] = values[col]
+
+    return mpsort.permute(data, sortkey['key'][:, 0], comm=comm)
 
-    # make the data to sort
-    dtype = [('_sortkey', 'i8')]
-    for col in cat:
-        if col in columns:
-            dt = (cat[col].dtype.char,)
-            dt += cat[col].shape[1:]
-            if len(dt) == 1: dt = dt[0]
-            dtype.append((col, dt))
-    dtype = numpy.dtype(dtype)
+def _pack_columns(cat, columns):
+    """
+    Compute the columns of a catalog at once, into a structured array.
+    """
+    values = cat.compute(*[cat[col] for col in columns])
+    if len(columns) == 1:
+        values = [values]
 
+    dtype = [(col, value.dtype, value.shape[1:]) for col, value in zip(columns, values)]
     data = numpy.empty(cat.size, dtype=dtype)
-    for col in columns:
-        data[col] = cat[col]
+    for col, value in zip(columns, values):
+        data[col] = value
+    return data
 
-    # sort the particles by the specified columns and store the
-    # corrected sorted index
-    for col in reversed(rankby):
-        dt = data.dtype[col]
-        rankby_name = col
-
-        # make an integer key for floating columns
-        # this assumes the lexial order of float as integer is consistant.
-        if issubclass(dt.type, numpy.float32):
-            data['_sortkey'] = numpy.frombuffer(data[col].tobytes(), dtype='i4')
-            if reverse:
-                data['_sortkey'] *= -1
-            rankby_name = '_sortkey'
-        elif issubclass(dt.type, numpy.float64):
-            data['_sortkey'] = numpy.frombuffer(data[col].tobytes(), dtype='i8')
-            if reverse:
-                data['_sortkey'] *= -1
-            rankby_name = '_sortkey'
-        elif not issubclass(dt.type, numpy.integer):
-            args = (col, str(dt))
-            raise ValueError("cannot sort by column '%s' with dtype '%s'; must be integer or floating type" %args)
+def _compute_selected(catalog, selection, columns):
+    """
+    Compute the columns only at the rows where ``selection`` is ``True``,
+    pushing the row selection down to the storage where possible.
 
-        # do the parallel sort
-        mpsort.sort(data, orderby=rankby_name, comm=comm)
+    Columns that are (contiguous slices of) hard-coded columns of a catalog
+    implementing :func:`CatalogSourceBase.read_rows` are read only at the
+    selected rows; the selection and all other columns are computed in
+    full, in a single call to :func:`CatalogSourceBase.compute`, and the
+    other columns are sliced afterwards.
+
+    Parameters
+    ----------
+    catalog : CatalogSourceBase
+        the catalog used to compute the columns that cannot be pushed down
+    selection : array_like
+        the boolean selection, matching the length of the columns
+    columns : list of array_like
+        the columns to compute
+
+    Returns
+    -------
+    data : list of array_like
+        the selected rows of each column
+    nbytes : int
+        the number of bytes read from the pushed-down columns
+    nbytes_full : int
+        the number of bytes the pushed-down columns would have required
+        without pushdown
+    """
+    # the columns that can be read at the selected rows; asking for no
+    # rows does not read anything
+    empty = numpy.empty(0, dtype='i8')
+    pushed = [getattr(col, 'rows', None) is not None
+              and col.catalog.read_rows(col.column, empty) is not None
+              for col in columns]
+
+    # compute the selection and the rest together, such that shared work
+    # is done only once
+    rest = [i for i in range(len(columns)) if not pushed[i]]
+    sel, computed = catalog.compute(selection, [columns[i] for i in rest])
+    sel = numpy.asarray(sel, dtype='?')
+    index = sel.nonzero()[0]
+
+    data = [None] * len(columns)
+    for i, d in zip(rest, computed):
+        data[i] = d[sel]
+
+    nbytes = 0
+    nbytes_full = 0
+    for i, col in enumerate(columns):
+        if not pushed[i]:
+            continue
+        data[i] = col.catalog.read_rows(col.column, col.rows[0] + index)
+        rowsize = col.dtype.itemsize * int(numpy.prod(col.shape[1:]))
+        nbytes += len(index) * rowsize
+        nbytes_full += len(sel) * rowsize
+
+    return data, nbytes, nbytes_full
+
+class _AsyncBlockWriter(object):
+    """
+    Write blocks of data to array-like targets from a background thread.
+
+    Blocks are put into a queue of at most ``maxsize`` blocks by
+    ``__setitem__`` of the wrapped targets (see :func:`wrap`), which blocks
+    when the queue is full, bounding the memory of blocks waiting to be
+    written. Use as a context manager: the writer thread is started on
+    enter; on exit all queued blocks are written, and the first error of
+    the writer thread is re-raised.
+    """
+    def __init__(self, maxsize):
+        from six.moves import queue
+        self.queue = queue.Queue(maxsize=maxsize)
+        self.nbytes = 0
+        self.write_time = 0. # in the writes only
+        self.elapsed = 0. # from enter to exit, including the computation
+        self.error = None
+
+    def wrap(self, target):
+        """
+        Return a target that puts the blocks to write into the queue.
+        """
+        writer = self
+        class _QueuedTarget(object):
+            def __setitem__(self, sl, value):
+                if writer.error is not None:
+                    raise writer.error
+                writer.queue.put((target, sl, value))
+        return _QueuedTarget()
+
+    def _run(self):
+        import time
+        while True:
+            item = self.queue.get()
+            if item is None:
+                break
+            target, sl, value = item
+            # keep draining after an error, such that put() never blocks
+            if self.error is not None:
+                continue
+            try:
+                t0 = time.time()
+                target[sl] = value
+                self.write_time += time.time() - t0
+                self.nbytes += value.nbytes
+            except Exception as e:
+                self.error = e
+
+    def __enter__(self):
+        import threading
+        import time
+        self.t0 = time.time()
+        self.thread = threading.Thread(target=self._run)
+        self.thread.daemon = True
+        self.thread.start()
+        return self
 
-    return data[usecols]
+    def __exit__(self, type, value, traceback):
+        import time
+        self.queue.put(None)
+        self.thread.join()
+        self.elapsed = time.time() - self.t0
+        if type is None and self.error is not None:
+            raise self.error
@@ -0,0 +1,204 @@
+from nbodykit.utils import ExchangeArray
+from six import string_types
+import numpy
+import logging
+
+def hash_partition(labels, nranks):
+    """
+    Assign integer labels to ranks with a multiplicative hash, such that
+    the labels are spread evenly, whatever their distribution.
+
+    Parameters
+    ----------
+    labels : array_like
+        the integer labels
+    nranks : int
+        the number of ranks
+
+    Returns
+    -------
+    rank : array_like
+        the rank that owns each label
+    """
+    labels = numpy.asarray(labels)
+    if labels.dtype.kind not in 'iub':
+        raise ValueError("can only partition integer labels, not '%s'" % str(labels.dtype))
+
+    h = labels.astype('u8') * numpy.uint64(0x9E3779B97F4A7C15)
+    return ((h >> numpy.uint64(32)) % numpy.uint64(nranks)).astype('intp')
+
+class CatalogGroupBy(object):
+    """
+    The rows of a :class:`~nbodykit.base.catalog.CatalogSource`, grouped by
+    the value of an integer column, e.g., a halo label.
+
+    Use :func:`agg` to compute reductions over each group. The rows of
+    each group are sent to the rank owning the group, which is chosen by
+    a hash of the label, such that the groups are balanced between ranks
+    and nothing is gathered to a single rank.
+
+    This is returned by :func:`~nbodykit.base.catalog.CatalogSource.groupby`.
+
+    Parameters
+    ----------
+    source : CatalogSource
+        the catalog to group
+    by : str
+        the name of the integer column holding the group label of each row
+    """
+    logger = logging.getLogger('CatalogGroupBy')
+
+    #: the supported aggregations
+    aggregations = ['count', 'sum', 'mean', 'min', 'max', 'var', 'std', 'argmin', 'argmax']
+
+    def __init__(self, source, by):
+        if not isinstance(by, string_types):
+            raise ValueError("groupby expects the name of a single column")
+        if by not in source:
+            raise ValueError("'%s' is not a valid column" % by)
+
+        self.source = source
+        self.by = by
+        self.comm = source.comm
+
+    def _parse(self, spec):
+        # the list of (column, aggregation) pairs
+        toret = []
+        for col in sorted(spec):
+            aggs = spec[col]
+            if isinstance(aggs, string_types):
+                aggs = [aggs]
+            if col not in self.source:
+                raise ValueError("'%s' is not a valid column" % col)
+            for agg in aggs:
+                if agg not in self.aggregations:
+                    raise ValueError("aggregation '%s' is not one of %s" % (agg, str(self.aggregations)))
+                if agg in ['argmin', 'argmax'] and self.source[col].ndim > 1:
+                    raise ValueError("aggregation '%s' requires a scalar column; '%s' is not" % (agg, col))
+                toret.append((col, agg))
+        return toret
+
+    def agg(self, spec):
+        """
+        Compute reductions of columns over each group.
+
+        This is a **collective** operation.
+
+        Parameters
+        ----------
+        spec : dict
+            the names of the columns to reduce, mapped to the name of
+            an aggregation, or a list of them; see :attr:`aggregations`.
+            ``var`` and ``std`` are the population variance and standard
+            deviation; ``argmin`` and ``argmax`` give the global
+            :attr:`~nbodykit.base.catalog.CatalogSource.Index` of the row
+            with the minimum and maximum value (the first one, in case
+            of ties)
+
+        Returns
+        -------
+        CatalogSource :
+            a catalog with one row per group, holding the label column and
+            a ``<column>_<aggregation>`` column for each reduction; the
+            groups are sorted by label on each rank
+
+        Examples
+        --------
+        >>> groups = cat.groupby('HaloLabel')
+        >>> halos = groups.agg({'Position' : 'mean', 'Mass' : ['sum', 'count']})
+        >>> halos.columns
+        ['HaloLabel', 'Mass_count', 'Mass_sum', 'Position_mean', ...]
+        """
+        from nbodykit.base.catalog import CatalogSource
+
+        pairs = self._parse(spec)
+        columns = sorted(set(col for col, agg in pairs) - set([self.by]))
+
+        # compute the label and the needed columns at once
+        values = self.source.compute(*[self.source[col] for col in [self.by] + columns])
+        if not len(columns):
+            values = [values]
+        values = dict(zip([self.by] + columns, values))
+
+        labels = values[self.by]
+        if labels.dtype.kind not in 'iub':
+            raise ValueError("the group label column '%s' must be integer, not '%s'" % (self.by, str(labels.dtype)))
+
+        # pack the rows with their global index and send them to the owner
+        # of their group in a single exchange
+        dtype = [('label', labels.dtype), ('index', 'i8')]
+        dtype += [(col, values[col].dtype, values[col].shape[1:]) for col in columns]
+        data = numpy.empty(len(labels), dtype=dtype)
+        data['label'] = labels
+        start = sum(self.comm.allgather(len(labels))[:self.comm.rank])
+        data['index'] = numpy.arange(start, start + len(labels))
+        for col in columns:
+            data[col] = values[col]
+
+        data = ExchangeArray(data, hash_partition(labels, self.comm.size), self.comm)
+
+        # sort by label; the exchange keeps the rows of a group in order
+        # of the global index, such that the sort is stable on the index
+        data = data[numpy.argsort(data['label'], kind='mergesort')]
+        label = data['label']
+        N = len(label)
+        if N > 0:
+            starts = numpy.flatnonzero(numpy.concatenate([[True], label[1:] != label[:-1]]))
+        else:
+            starts = numpy.zeros(0, dtype='intp')
+        counts = numpy.diff(numpy.append(starts, N))
+        group = numpy.repeat(numpy.arange(len(starts)), counts)
+
+        self.logger.debug("rank %d owns %d groups of %d rows" % (self.comm.rank, len(starts), N))
+
+        toret = {self.by : label[starts]}
+        for col, agg in pairs:
+            x = data[col] if col != self.by else label
+            toret['%s_%s' % (col, agg)] = _aggregate(agg, x, data['index'], starts, counts, group)
+
+        cat = CatalogSource._from_columns(len(starts), self.comm, **toret)
+        cat.attrs['groupby'] = self.by
+        return cat
+
+def _reduceat(ufunc, x, starts, dtype=None):
+    # ufunc.reduceat does not support empty arrays
+    if not len(starts):
+        return numpy.empty((0,) + x.shape[1:], dtype=dtype or x.dtype)
+    return ufunc.reduceat(x, starts, axis=0, dtype=dtype)
+
+def _aggregate(agg, x, index, starts, counts, group):
+    """
+    Reduce ``x`` over the groups of consecutive rows beginning at ``starts``.
+    """
+    # broadcast the counts against vector columns
+    n = counts.reshape((-1,) + (1,) * (x.ndim - 1))
+
+    if agg == 'count':
+        return counts
+
+    if agg == 'sum':
+        dtype = 'f8' if x.dtype.kind == 'f' else ('u8' if x.dtype.kind == 'u' else 'i8')
+        return _reduceat(numpy.add, x, starts, dtype=dtype)
+
+    if agg == 'min':
+        return _reduceat(numpy.minimum, x, starts)
+
+    if agg == 'max':
+        return _reduceat(numpy.maximum, x, starts)
+
+    mean = _reduceat(numpy.add, x, starts, dtype='f8') / n
+    if agg == 'mean':
+        return mean
+
+    if agg in ['var', 'std']:
+        # two passes, as all the rows of a group are local
+        dev = x - mean[group]
+        var = _reduceat(numpy.add, dev ** 2, starts, dtype='f8') / n
+        return var if agg == 'var' else var ** 0.5
+
+    # the first row in each group, ordered by value, then by index;
+    # for argmax the value order is reversed with the dense rank of x
+    if agg == 'argmax':
+        x = -numpy.unique(x, return_inverse=True)[1]
+    order = numpy.lexsort((index, x, group))
+    return index[order[starts]]
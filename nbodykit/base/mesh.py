@@ -337,38 +337,86 @@ class MeshSource(object):
 
         return var
 
-    def preview(self, axes=None, Nmesh=None, root=0):
+    def preview(self, axes=None, Nmesh=None, root=None, method='resample'):
         """
         Gather the mesh into as a numpy array, with
-        (reduced) resolution. The result is broadcast to
-        all ranks, so this uses :math:`\mathrm{Nmesh}^3` per rank.
+        (reduced) resolution, optionally projected onto a subset of
+        the axes.
+
+        With ``method='resample'``, the mesh is resampled to ``Nmesh`` in
+        Fourier space, and the result is projected; this uses
+        :math:`\mathrm{Nmesh}^3` per rank.
+
+        With ``method='block'``, each rank projects and downsamples its
+        local part of the mesh, slab by slab, and the partial images are
+        then summed across ranks; only the final image is allocated on each
+        rank. A cell of the reduced mesh holds the mean of the cells of the
+        mesh it covers, and the projection is the sum over the removed axes
+        of the reduced mesh. Nmesh larger than the mesh is resampled.
 
         Parameters
         ----------
         Nmesh : int, array_like
-            The desired Nmesh of the result. Be aware this function
-            allocates memory to hold a full ``Nmesh`` on each rank.
+            The desired Nmesh of the result; default is the Nmesh of the
+            mesh. The result holds the ``Nmesh`` of the kept ``axes``.
         axes : int, array_like
-            The axes to project the preview onto., e.g. (0, 1)
+            The axes to project the preview onto., e.g. (0, 1); default
+            is all axes
         root : int, optional
-            the rank number to treat as root when gathering to a single rank
+            if given, the rank number to gather the result to; the other
+            ranks return None. By default the result is broadcast to all
+            ranks.
+        method : 'resample', 'block'
+            how to reduce the resolution: Fourier resampling of the full
+            mesh, or local block means
 
         Returns
         -------
         out : array_like
             An numpy array holding the real density field.
         """
+        from mpi4py import MPI
+
+        if method not in ['resample', 'block']:
+            raise ValueError("method must be 'resample' or 'block', not '%s'" % str(method))
+
         field = self.to_field(mode='real')
         if Nmesh is None:
             Nmesh = self.pm.Nmesh
+        Nmesh = numpy.ones(len(self.pm.Nmesh), dtype='i8') * Nmesh
 
-        return field.preview(Nmesh, axes=axes)
+        if axes is None: axes = range(len(Nmesh))
+        if not hasattr(axes, '__iter__'): axes = (axes,)
+        axes = list(axes)
 
-    def save(self, output, dataset='Field', mode='real'):
+        if method == 'resample' or any(Nmesh > self.pm.Nmesh):
+            # upsampling needs resampling of the full mesh
+            result = field.preview(Nmesh, axes=axes)
+        else:
+            result = _project_field(field.value, field.start, self.pm.Nmesh, Nmesh, axes)
+            if root is None:
+                self.comm.Allreduce(MPI.IN_PLACE, result)
+            elif self.comm.rank == root:
+                self.comm.Reduce(MPI.IN_PLACE, result, root=root)
+            else:
+                self.comm.Reduce(result, None, root=root)
+            result = result.astype(field.dtype)
+
+        if root is not None and self.comm.rank != root:
+            return None
+        return result
+
+    def save(self, output, dataset='Field', mode='real', dtype=None, tolerance=None, compression=None):
         """
         Save the mesh as a :class:`~nbodykit.source.mesh.bigfile.BigFileMesh`
         on disk, either in real or complex space.
 
+        The field is written slab by slab from its local data, without
+        making a copy of the field. It can be stored with reduced precision
+        and/or compressed; the encoding is recorded in the ``codec.*`` attrs
+        of the dataset, and decoded by
+        :class:`~nbodykit.source.mesh.bigfile.BigFileMesh`.
+
         Parameters
         ----------
         output : str
@@ -377,18 +425,28 @@ class MeshSource(object):
             name of the bigfile data set where the field is stored
         mode : str, optional
             real or complex; the form of the field to store
+        dtype : str, optional
+            the floating point type to store the values with, e.g. 'f2';
+            default is the type of the field. Values out of its range, e.g.
+            above 65504 for 'f2', raise a ValueError
+        tolerance : float, optional
+            if given, store the values quantized to integers, such that the
+            absolute error of the loaded values is no larger than ``tolerance``;
+            the values must be finite
+        compression : str, optional
+            the lossless codec to compress the stored values with; one of
+            'zlib', 'bz2' and 'lzma'
         """
         import bigfile
         import warnings
         import json
         from nbodykit.utils import JSONEncoder
+        from nbodykit.source.mesh.bigfile import write_field
 
         field = self.compute(mode=mode)
 
         with bigfile.FileMPI(self.pm.comm, output, create=True) as ff:
-            data = numpy.empty(shape=field.size, dtype=field.dtype)
-            field.ravel(out=data)
-            with ff.create_from_array(dataset, data) as bb:
+            with write_field(ff, dataset, field, dtype=dtype, tolerance=tolerance, compression=compression) as bb:
                 if isinstance(field, RealField):
                     bb.attrs['ndarray.shape'] = field.pm.Nmesh
                     bb.attrs['BoxSize'] = field.pm.BoxSize
@@ -401,6 +459,8 @@ class MeshSource(object):
                 for key in field.attrs:
                     # do not override the above values -- they are vectors (from pm)
                     if key in bb.attrs: continue
+                    # the encoding of a loaded mesh does not apply
+                    if key.startswith('codec.'): continue
                     value = field.attrs[key]
                     try:
                         bb.attrs[key] = value
@@ -411,6 +471,56 @@ class MeshSource(object):
                         except:
                             warnings.warn("attribute %s of type %s is unsupported and lost while saving MeshSource" % (key, type(value)))
 
+def _project_field(value, start, Nmesh, Npreview, axes):
+    """
+    Project the local block ``value`` of a mesh onto ``axes``, reducing
+    its resolution to ``Npreview``, slab by slab along the first axis.
+
+    Returns the partial image of this rank, of shape ``Npreview[axes]``;
+    the image of the full mesh is the sum of the partial images.
+    """
+    ndim = len(Nmesh)
+    kept = sorted(axes)
+
+    # the cells of the mesh covered by each cell of the preview; the
+    # weight of a cell is one over the number of cells of its preview cell
+    bins = []
+    weights = []
+    for d in range(ndim):
+        b = numpy.arange(start[d], start[d] + value.shape[d]) * Npreview[d] // Nmesh[d]
+        count = numpy.bincount(numpy.arange(Nmesh[d]) * Npreview[d] // Nmesh[d], minlength=Npreview[d])
+        bins.append(b)
+        weights.append(1.0 / count[b])
+
+    # the distinct preview cells along the trailing axes; they are contiguous
+    first = [numpy.unique(b, return_index=True) for b in bins]
+
+    image = numpy.zeros([Npreview[d] for d in kept], dtype='f8')
+    if value.size == 0:
+        return image.transpose([kept.index(d) for d in axes]).copy()
+
+    for ix in range(value.shape[0]):
+        s = value[ix] * weights[0][ix]
+
+        # reduce the trailing axes, from the last one
+        index = []
+        for d in reversed(range(1, ndim)):
+            shape = [1] * s.ndim
+            shape[d - 1] = -1
+            s = s * weights[d].reshape(shape)
+            if d in kept:
+                s = numpy.add.reduceat(s, first[d][1], axis=d - 1)
+                index.insert(0, first[d][0])
+            else:
+                s = s.sum(axis=d - 1)
+
+        index = list(numpy.ix_(*index)) if len(index) else []
+        if 0 in kept:
+            index.insert(0, bins[0][ix])
+        image[tuple(index)] += s
+
+    return image.transpose([kept.index(d) for d in axes]).copy()
+
 class MeshFilter(object):
     """
     A filter function that can be applied to a Mesh
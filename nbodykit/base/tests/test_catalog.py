@@ -178,6 +178,116 @@ def test_save(comm):
     if comm.rank == 0:
         shutil.rmtree(tmpfile)
 
+@MPITest([1, 4])
+def test_compute_common_tasks(comm):
+
+    # count the evaluations of a computation shared by two columns
+    calls = []
+    def shared(x):
+        calls.append(len(x))
+        return x * 2
+
+    with set_options(dask_chunk_size=100, merge_common_tasks=True):
+        source = UniformCatalog(nbar=2e-4, BoxSize=512., seed=42, comm=comm)
+
+        # the same computation, under two different names
+        a = source['Position'].map_blocks(shared, dtype='f8', name='shared-a')
+        b = source['Position'].map_blocks(shared, dtype='f8', name='shared-b')
+        source['A'] = a[:, 0]
+        source['B'] = b.sum(axis=-1)
+
+        A, B = source.compute(source['A'], source['B'])
+
+    # each chunk of the shared computation is evaluated only once
+    assert sum(calls) == source.size
+
+    pos = source['Position'].compute()
+    assert_allclose(A, 2 * pos[:, 0])
+    assert_allclose(B, 2 * pos.sum(axis=-1))
+
+@MPITest([1, 4])
+def test_compute_impure_tasks(comm):
+
+    def noise(x):
+        return numpy.random.uniform(size=len(x))
+
+    source = UniformCatalog(nbar=2e-4, BoxSize=512., seed=42, comm=comm)
+
+    # the same impure computation, under two different names
+    source['ra'] = source['Selection'].map_blocks(noise, dtype='f8', name='noise-a')
+    source['rb'] = source['Selection'].map_blocks(noise, dtype='f8', name='noise-b')
+
+    # tasks are not merged by default
+    ra, rb = source.compute(source['ra'], source['rb'])
+    assert (ra != rb).all()
+
+@MPITest([1, 4])
+def test_compute_threads(comm):
+    import threading
+
+    # record the threads computing the chunks
+    threads = set()
+    def record(x):
+        threads.add(threading.current_thread())
+        return x * 2
+
+    with set_options(dask_chunk_size=100):
+        source = UniformCatalog(nbar=2e-4, BoxSize=512., seed=42, comm=comm)
+        source['A'] = source['Position'].map_blocks(record, dtype='f8')
+        A1 = source['A'].compute()
+        assert threads == set([threading.current_thread()])
+
+        with set_options(threads_per_rank=4):
+            threads.clear()
+            source['B'] = source['Position'].map_blocks(record, dtype='f8', name='record-b')
+            A2 = source['B'].compute()
+
+    # the chunks only ran on the worker threads
+    assert threading.current_thread() not in threads
+    assert_array_equal(A1, A2)
+
+@MPITest([1, 4])
+def test_save_overlap(comm):
+
+    import tempfile
+    import shutil
+
+    # initialize an output directory
+    if comm.rank == 0:
+        tmpfile = tempfile.mkdtemp()
+    else:
+        tmpfile = None
+    tmpfile = comm.bcast(tmpfile)
+
+    # count the evaluations of a computation shared by two columns
+    calls = []
+    def shared(x):
+        calls.append(len(x))
+        return x * 2
+
+    with set_options(dask_chunk_size=100):
+        source = UniformCatalog(nbar=2e-4, BoxSize=512., seed=42, comm=comm)
+        doubled = source['Position'].map_blocks(shared, dtype='f8')
+        source['A'] = doubled[:, 0]
+        source['B'] = doubled.sum(axis=-1)
+
+        source.save(tmpfile, ['A', 'B'], overlap=True)
+
+    # each chunk of the shared computation is evaluated only once
+    assert sum(calls) == source.size
+
+    source2 = BigFileCatalog(tmpfile, comm=comm)
+
+    def allconcat(data):
+        return numpy.concatenate(comm.allgather(data), axis=0)
+    A, B = source.compute(source['A'], source['B'])
+    assert_allclose(allconcat(A), allconcat(source2['A']))
+    assert_allclose(allconcat(B), allconcat(source2['B']))
+
+    comm.barrier()
+    if comm.rank == 0:
+        shutil.rmtree(tmpfile)
+
 @MPITest([1, 4])
 def test_tomesh(comm):
 
@@ -468,3 +578,115 @@ def test_sort(comm):
 
     arr = numpy.concatenate(comm.allgather(s['ranks'].compute()))
     assert (numpy.diff(arr) > 0).all()
+
+@MPITest([1, 4])
+def test_sort_multiple_keys(comm):
+    # the CatalogSource
+    source = UniformCatalog(nbar=2e-4, BoxSize=512., seed=42, comm=comm)
+
+    # keys with ties, negative floats and signed integers
+    source['a'] = (source['Position'][:, 0] // 128).astype('i4') - 2
+    source['b'] = source['Position'][:, 1] - 256.
+    source['c'] = source.Index
+
+    a, b, c = numpy.concatenate(comm.allgather(source['a'].compute())), \
+              numpy.concatenate(comm.allgather(source['b'].compute())), \
+              numpy.concatenate(comm.allgather(source['c'].compute()))
+
+    s = source.sort(['a', 'b'], usecols=['a', 'b', 'c'])
+    order = numpy.lexsort((b, a))
+    assert_array_equal(numpy.concatenate(comm.allgather(s['c'].compute())), c[order])
+
+    # descending order of all keys
+    s = source.sort(['a', 'b'], reverse=True, usecols=['c'])
+    order = numpy.lexsort((-b, -a))
+    assert_array_equal(numpy.concatenate(comm.allgather(s['c'].compute())), c[order])
+
+@MPITest([1, 4])
+def test_sort_non_native(comm):
+    # the CatalogSource
+    source = UniformCatalog(nbar=2e-4, BoxSize=512., seed=42, comm=comm)
+
+    # big and little endian keys, with negative values
+    x = source['Position'][:, 0] - 256.
+    source['big'] = x.astype('>f8')
+    source['little'] = x.astype('<f8')
+
+    for key in ['big', 'little']:
+        s = source.sort(key, usecols=[key])
+        arr = numpy.concatenate(comm.allgather(s[key].compute()))
+        assert (numpy.diff(arr) >= 0).all()
+
+    # the keys of a big endian array, in both orders
+    from nbodykit.base.catalog import _sortable_key
+    a = numpy.array([1, 2, 3, -1.5], dtype='>f8')
+    key, nbits = _sortable_key(a)
+    assert_array_equal(numpy.argsort(key), [3, 0, 1, 2])
+    key, nbits = _sortable_key(a, reverse=True)
+    assert_array_equal(numpy.argsort(key), [2, 1, 0, 3])
+
+@MPITest([1, 4])
+def test_groupby(comm):
+    source = UniformCatalog(nbar=2e-4, BoxSize=512., seed=42, comm=comm)
+    source['label'] = (source['Position'][:, 0] // 32).astype('i8')
+    source['x'] = source['Position'][:, 1]
+
+    groups = source.groupby('label').agg({
+                'x' : ['count', 'sum', 'mean', 'min', 'max', 'std', 'argmin', 'argmax'],
+                'Position' : 'mean'})
+
+    # compare to the gathered catalog
+    label = numpy.concatenate(comm.allgather(source['label'].compute()))
+    x = numpy.concatenate(comm.allgather(source['x'].compute()))
+    pos = numpy.concatenate(comm.allgather(source['Position'].compute()))
+
+    # each group lives on a single rank
+    assert groups.csize == len(numpy.unique(label))
+    for l, count, xsum, xmean, xmin, xmax, xstd, imin, imax, pmean in zip(*groups.compute(
+            groups['label'], groups['x_count'], groups['x_sum'], groups['x_mean'],
+            groups['x_min'], groups['x_max'], groups['x_std'], groups['x_argmin'],
+            groups['x_argmax'], groups['Position_mean'])):
+        sel = label == l
+        assert count == sel.sum()
+        assert_allclose(xsum, x[sel].sum())
+        assert_allclose(xmean, x[sel].mean())
+        assert_allclose(xstd, x[sel].std())
+        assert xmin == x[sel].min()
+        assert xmax == x[sel].max()
+        assert imin == numpy.flatnonzero(sel)[x[sel].argmin()]
+        assert imax == numpy.flatnonzero(sel)[x[sel].argmax()]
+        assert_allclose(pmean, pos[sel].mean(axis=0))
+
+@MPITest([1, 4])
+def test_merge(comm):
+    # halos with a subset of IDs, and galaxies pointing to them
+    halos = UniformCatalog(nbar=2e-5, BoxSize=512., seed=42, comm=comm)
+    halos['ID'] = halos.Index * 2
+    halos['Mass'] = halos['Position'][:, 0]
+
+    galaxies = UniformCatalog(nbar=2e-4, BoxSize=512., seed=84, comm=comm)
+    galaxies['ID'] = (galaxies['Position'][:, 0] / 512. * halos.csize * 3).astype('i8')
+
+    ID = numpy.concatenate(comm.allgather(galaxies['ID'].compute()))
+    mass = dict(zip(numpy.concatenate(comm.allgather(halos['ID'].compute())),
+                    numpy.concatenate(comm.allgather(halos['Mass'].compute()))))
+
+    # inner join; the Position of halos gets a suffix
+    joined = galaxies.merge(halos, on='ID', usecols=['Position'], other_usecols=['Mass', 'Position'])
+    assert set(joined.columns) >= set(['ID', 'Position', 'Position_other', 'Mass'])
+    assert joined.csize == sum(i in mass for i in ID)
+    for i, m in zip(*joined.compute(joined['ID'], joined['Mass'])):
+        assert m == mass[i]
+
+    # the output is balanced
+    sizes = comm.allgather(joined.size)
+    assert max(sizes) - min(sizes) <= 1
+
+    # left join keeps the galaxies without a halo
+    joined = galaxies.merge(halos, on='ID', how='left', usecols=[], other_usecols=['Mass'])
+    assert joined.csize == galaxies.csize
+    for i, m in zip(*joined.compute(joined['ID'], joined['Mass'])):
+        if i in mass:
+            assert m == mass[i]
+        else:
+            assert numpy.isnan(m)
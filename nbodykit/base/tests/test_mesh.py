@@ -111,6 +111,65 @@ def test_real_save(comm):
     if comm.rank == 0:
         shutil.rmtree(tmpfile)
 
+@MPITest([1,4])
+def test_save_encoded(comm):
+
+    cosmo = cosmology.Planck15
+
+    # initialize an output directory
+    if comm.rank == 0:
+        tmpfile = tempfile.mkdtemp()
+    else:
+        tmpfile = None
+    tmpfile = comm.bcast(tmpfile)
+
+    # linear mesh
+    Plin = cosmology.LinearPower(cosmo, redshift=0.55, transfer='EisensteinHu')
+    source = LinearMesh(Plin, Nmesh=64, BoxSize=512, seed=42, comm=comm)
+    real = source.compute(mode='real')
+    complex = source.compute(mode='complex')
+
+    # lossless compression
+    source.save(tmpfile, dataset='zlib', mode='real', compression='zlib')
+    source2 = BigFileMesh(tmpfile, dataset='zlib', comm=comm)
+    assert_array_equal(source2.compute(mode='real'), real)
+
+    source.save(tmpfile, dataset='complex', mode='complex', compression='zlib')
+    source2 = BigFileMesh(tmpfile, dataset='complex', comm=comm)
+    assert_array_equal(source2.compute(mode='complex'), complex)
+
+    # reduced precision
+    source.save(tmpfile, dataset='f2', mode='real', dtype='f2')
+    source2 = BigFileMesh(tmpfile, dataset='f2', comm=comm)
+    assert_allclose(source2.compute(mode='real'), real, rtol=1e-3, atol=1e-6)
+
+    # values out of the range of the reduced precision
+    large = source.apply(lambda x, v: v * 1e6, kind='relative', mode='real')
+    with pytest.raises(ValueError):
+        large.save(tmpfile, dataset='f2-large', mode='real', dtype='f2')
+
+    # quantized with an error bound, and compressed
+    source.save(tmpfile, dataset='quantized', mode='real', tolerance=1e-3, compression='zlib')
+    source2 = BigFileMesh(tmpfile, dataset='quantized', comm=comm)
+    assert_allclose(source2.compute(mode='real'), real, atol=1.0001e-3, rtol=0)
+
+    # NaN values cannot be quantized, and too small a tolerance does not fit
+    nan = source.apply(lambda x, v: v * numpy.nan, kind='relative', mode='real')
+    with pytest.raises(ValueError):
+        nan.save(tmpfile, dataset='quantized-nan', mode='real', tolerance=1e-3)
+    with pytest.raises(ValueError):
+        source.save(tmpfile, dataset='quantized-fine', mode='real', tolerance=1e-30)
+
+    # the loaded mesh can be saved without encoding
+    source2.save(tmpfile, dataset='plain', mode='real')
+    source3 = BigFileMesh(tmpfile, dataset='plain', comm=comm)
+    assert_array_equal(source3.compute(mode='real'), source2.compute(mode='real'))
+
+    # cleanup
+    comm.barrier()
+    if comm.rank == 0:
+        shutil.rmtree(tmpfile)
+
 @MPITest([1,4])
 def test_preview(comm):
 
@@ -130,6 +189,38 @@ def test_preview(comm):
     preview[...] **= 2
     assert_allclose(preview.sum(), real.csum(), rtol=1e-5)
 
+@MPITest([1,4])
+def test_preview_projection(comm):
+
+    cosmo = cosmology.Planck15
+
+    # linear mesh
+    Plin = cosmology.LinearPower(cosmo, redshift=0.55, transfer='EisensteinHu')
+    source = LinearMesh(Plin, Nmesh=64, BoxSize=512, seed=42, comm=comm)
+
+    full = source.preview()
+
+    # downsample by block means, then project
+    expected = full.reshape(32, 2, 32, 2, 32, 2).mean(axis=(1, 3, 5))
+    preview = source.preview(Nmesh=32, axes=(0, 1), method='block')
+    assert preview.shape == (32, 32)
+    assert_allclose(preview, expected.sum(axis=2), rtol=1e-4, atol=1e-4)
+
+    preview = source.preview(axes=(2, 0), method='block')
+    assert_allclose(preview, full.sum(axis=1).T, rtol=1e-4, atol=1e-4)
+
+    # the default is Fourier resampling
+    real = source.compute(mode='real')
+    assert_allclose(source.preview(Nmesh=32, axes=(0, 1)),
+                    real.preview(Nmesh=32, axes=(0, 1)), rtol=1e-5, atol=1e-5)
+
+    # gather to a single rank
+    preview = source.preview(Nmesh=16, axes=0, root=0, method='block')
+    if comm.rank == 0:
+        assert_allclose(preview.sum(), full.sum() / 64, rtol=1e-4)
+    else:
+        assert preview is None
+
 @MPITest([1,4])
 def test_resample(comm):
 
@@ -0,0 +1,523 @@
+"""
+Persistent, on-disk caches of computed results.
+
+The entries of a cache are files or directories in a single directory,
+named by a deterministic key of the computation that produced them. The
+least recently used entries are evicted once the total size of the cache
+exceeds a cap.
+"""
+import numpy
+import logging
+import shutil
+import uuid
+import os
+
+class DiskCache(object):
+    """
+    A directory of cached entries on disk, with a least-recently-used
+    eviction policy bounded by the total size of the entries.
+
+    Each entry is a file or a directory in :attr:`path`, named by its key.
+    The modification time of an entry records when it was last used.
+
+    Parameters
+    ----------
+    path : str
+        the directory holding the entries; created if it does not exist
+    max_size : float
+        the maximum total size of the entries in bytes; the least recently
+        used entries are evicted when the size exceeds this value
+    """
+    logger = logging.getLogger('DiskCache')
+
+    def __init__(self, path, max_size=1e10):
+        self.path = os.path.abspath(path)
+        self.max_size = max_size
+
+        if not os.path.exists(self.path):
+            try:
+                os.makedirs(self.path)
+            except OSError: # another rank created it
+                if not os.path.isdir(self.path):
+                    raise
+
+    def __repr__(self):
+        return "%s(path=%s, max_size=%g)" % (self.__class__.__name__, self.path, self.max_size)
+
+    def __contains__(self, key):
+        return os.path.exists(self.filename(key))
+
+    def filename(self, key):
+        """
+        The name of the file or directory storing the entry ``key``.
+        """
+        return os.path.join(self.path, key)
+
+    def touch(self, key):
+        """
+        Mark the entry ``key`` as used now.
+        """
+        try:
+            os.utime(self.filename(key), None)
+        except OSError: # evicted in the mean time
+            pass
+
+    def entries(self):
+        """
+        Return a list of ``(key, size, mtime)`` of the entries in the cache,
+        from the least recently used to the most recently used.
+        """
+        toret = []
+        for key in os.listdir(self.path):
+            if key.startswith('.'): # incomplete entries
+                continue
+            try:
+                toret.append((key, _du(self.filename(key)), os.path.getmtime(self.filename(key))))
+            except OSError: # evicted in the mean time
+                pass
+        return sorted(toret, key=lambda e: e[2])
+
+    @property
+    def size(self):
+        """
+        The total size of the entries in bytes.
+        """
+        return sum(size for key, size, mtime in self.entries())
+
+    def evict(self, keep=()):
+        """
+        Evict the least recently used entries, until the total size is
+        no more than :attr:`max_size`.
+
+        This is not collective; when several ranks use the same cache,
+        a single rank shall evict, keeping the entries of all ranks.
+
+        Parameters
+        ----------
+        keep : list of str, optional
+            keys of entries that shall not be evicted
+        """
+        entries = self.entries()
+        total = sum(size for key, size, mtime in entries)
+        for key, size, mtime in entries:
+            if total <= self.max_size:
+                break
+            if key in keep:
+                continue
+            self.logger.debug("evicting %s (%d bytes) from %s" % (key, size, self.path))
+            self._remove(key)
+            total -= size
+
+    def invalidate(self, key=None):
+        """
+        Remove an entry from the cache; if ``key`` is None, remove all
+        entries.
+        """
+        if key is None:
+            for key, size, mtime in self.entries():
+                self._remove(key)
+        else:
+            self._remove(key)
+
+    def _remove(self, key):
+        fn = self.filename(key)
+        try:
+            if os.path.isdir(fn):
+                shutil.rmtree(fn)
+            else:
+                os.remove(fn)
+        except OSError: # removed by someone else
+            pass
+
+    def _tempname(self, key):
+        """
+        A temporary name to write the entry ``key`` to before it is
+        complete; hidden from :func:`entries`.
+        """
+        return os.path.join(self.path, '.%s.%s' % (key, uuid.uuid4().hex))
+
+class ColumnCache(DiskCache):
+    """
+    A persistent cache of computed columns.
+
+    A column (a :class:`dask.array.Array`) is keyed by a hash of its dask
+    graph, i.e., by the name of the array, together with its shape and
+    data type. The name of a dask array is a deterministic hash of the
+    operations and inputs producing it, so the same column built in
+    another script, or another :class:`~nbodykit.batch.TaskManager` task,
+    has the same key.
+
+    Columns are distributed, so each rank stores its local part of the
+    column as a separate ``.npy`` file, read back through memory mapping.
+
+    See :func:`~nbodykit.base.catalog.CatalogSource.checkpoint`.
+
+    Parameters
+    ----------
+    path : str
+        the directory holding the cached columns; a local disk is preferred
+    max_size : float
+        the maximum total size of the cached columns in bytes
+    """
+    logger = logging.getLogger('ColumnCache')
+
+    @classmethod
+    def get(cls):
+        """
+        Return the default column cache, as configured by the
+        ``column_cache_dir`` and ``column_cache_size`` global options;
+        see :class:`~nbodykit.set_options`.
+        """
+        from nbodykit import _global_options
+
+        path = _global_options['column_cache_dir']
+        if path is None:
+            raise ValueError("set the `column_cache_dir` option to use the default column cache")
+        return cls(path, max_size=_global_options['column_cache_size'])
+
+    def key(self, array):
+        """
+        The key of a column, a hash of its dask graph.
+        """
+        from dask.base import tokenize
+        return 'column-%s.npy' % tokenize(array.name, array.shape, str(array.dtype))
+
+    def load(self, array):
+        """
+        Return the cached value of ``array`` as a memory mapped
+        :class:`numpy.ndarray`, or ``None`` if it is not cached.
+        """
+        key = self.key(array)
+        try:
+            # empty arrays cannot be memory mapped
+            mmap_mode = 'r' if numpy.prod(array.shape) > 0 else None
+            value = numpy.load(self.filename(key), mmap_mode=mmap_mode)
+        except (IOError, OSError, ValueError):
+            self.logger.debug("miss for %s" % array.name)
+            return None
+
+        self.touch(key)
+        self.logger.debug("hit for %s" % array.name)
+        return value
+
+    def store(self, array, value, evict=True):
+        """
+        Store the computed ``value`` of ``array`` in the cache, evicting
+        old entries if needed.
+
+        Parameters
+        ----------
+        array : :class:`dask.array.Array`
+            the column
+        value : array_like
+            the computed value of ``array``
+        evict : bool, optional
+            whether to evict old entries; when several ranks share the cache,
+            only one of them shall evict, see :func:`evict`
+        """
+        key = self.key(array)
+        tmp = self._tempname(key)
+        with open(tmp, 'wb') as ff:
+            numpy.save(ff, numpy.asarray(value))
+        os.rename(tmp, self.filename(key))
+
+        if evict:
+            self.evict(keep=[key])
+
+    def load_stats(self, key):
+        """
+        Return the dictionary of summary statistics stored under ``key``
+        by :func:`store_stats`, or ``None`` if it is not cached.
+        """
+        try:
+            with numpy.load(self.filename(key)) as ff:
+                stats = dict((name, ff[name]) for name in ff.files)
+        except (IOError, OSError, ValueError):
+            return None
+
+        self.touch(key)
+        return stats
+
+    def store_stats(self, key, stats):
+        """
+        Store a dictionary of summary statistics of columns under ``key``;
+        see :func:`~nbodykit.utils.get_data_stats`.
+        """
+        tmp = self._tempname(key)
+        with open(tmp, 'wb') as ff:
+            numpy.savez(ff, **stats)
+        os.rename(tmp, self.filename(key))
+
+        self.evict(keep=[key])
+
+    def checkpoint(self, array, value=None):
+        """
+        Return ``array`` backed by the cache.
+
+        If ``array`` is not yet cached, it is computed (unless its ``value``
+        is given) and stored first. The returned dask array reads the
+        stored data through memory mapping, and keeps the name of
+        ``array``, such that columns derived from it hash the same.
+
+        Parameters
+        ----------
+        array : :class:`dask.array.Array`
+            the column to cache
+        value : array_like, optional
+            the computed value of ``array``, if already known
+
+        Returns
+        -------
+        :class:`dask.array.Array` :
+            the column, reading from the cache
+        """
+        import dask.array as da
+
+        cached = self.load(array)
+        if cached is None:
+            if value is None:
+                value = array.compute()
+            self.store(array, value)
+            cached = self.load(array)
+            if cached is None: # evicted right away; too large for the cache
+                cached = numpy.asarray(value)
+
+        return da.from_array(cached, chunks=array.chunks, name=array.name)
+
+def _du(path):
+    """
+    The size of a file, or of all files in a directory, in bytes.
+    """
+    if not os.path.isdir(path):
+        return os.path.getsize(path)
+    size = 0
+    for root, dirs, files in os.walk(path):
+        for fn in files:
+            size += os.path.getsize(os.path.join(root, fn))
+    return size
+
+class MeshCache(DiskCache):
+    """
+    A persistent cache of painted meshes.
+
+    Each entry is a :mod:`bigfile` file holding a real field in the
+    ``Field`` dataset, in the format of
+    :func:`~nbodykit.base.mesh.MeshSource.save`; it can be loaded with
+    :class:`~nbodykit.source.mesh.bigfile.BigFileMesh` as well. The
+    meta-data of the field are stored in the attrs of the dataset.
+
+    All methods that access entries are collective: rank 0 decides on hits
+    and evictions, and the field is read and written by all ranks.
+
+    See :func:`~nbodykit.source.mesh.catalog.CatalogMesh.to_real_field`.
+
+    Parameters
+    ----------
+    path : str
+        the directory holding the cached meshes; a local disk is preferred
+    max_size : float
+        the maximum total size of the cached meshes in bytes
+    comm : MPI.Communicator
+        the communicator of the meshes
+    """
+    logger = logging.getLogger('MeshCache')
+
+    def __init__(self, path, max_size=1e10, comm=None):
+        from nbodykit import CurrentMPIComm
+        self.comm = CurrentMPIComm.get() if comm is None else comm
+        DiskCache.__init__(self, path, max_size=max_size)
+
+    @classmethod
+    def get(cls, comm=None):
+        """
+        Return the default mesh cache, as configured by the
+        ``mesh_cache_dir`` and ``mesh_cache_size`` global options, or None
+        if ``mesh_cache_dir`` is not set; see :class:`~nbodykit.set_options`.
+        """
+        from nbodykit import _global_options
+
+        path = _global_options['mesh_cache_dir']
+        if path is None:
+            return None
+        return cls(path, max_size=_global_options['mesh_cache_size'], comm=comm)
+
+    def key(self, *args):
+        """
+        The key of a mesh, a hash of ``args``. The arguments shall be
+        the same on all ranks.
+        """
+        from dask.base import tokenize
+        return 'mesh-%s' % tokenize(*args)
+
+    def load(self, key, pm):
+        """
+        Return the cached real field of ``key`` on the ParticleMesh ``pm``,
+        with its meta-data in ``attrs``, or ``None`` if it is not cached.
+        """
+        from nbodykit.source.mesh.bigfile import read_field
+        from pmesh.pm import RealField
+        import bigfile
+
+        hit = self.comm.bcast(key in self if self.comm.rank == 0 else None)
+        if not hit:
+            if self.comm.rank == 0:
+                self.logger.info("miss for %s" % key)
+            return None
+
+        real = RealField(pm)
+        with bigfile.FileMPI(self.comm, self.filename(key)) as ff:
+            read_field(ff, 'Field', real)
+            with ff['Field'] as ds:
+                real.attrs = {}
+                for k in ds.attrs:
+                    if k in ('Nmesh', 'BoxSize', 'ndarray.shape') or k.startswith('codec.'):
+                        continue
+                    real.attrs[k] = numpy.squeeze(ds.attrs[k])[()]
+
+        if self.comm.rank == 0:
+            self.touch(key)
+            self.logger.info("hit for %s; loaded the field from %s" % (key, self.filename(key)))
+        return real
+
+    def store(self, key, real):
+        """
+        Store the real field of ``key``, with its meta-data in ``attrs``,
+        evicting old entries if needed. If the field cannot be stored,
+        a warning is logged on rank 0, and the field is not cached.
+        """
+        from nbodykit.source.mesh.bigfile import write_field
+        import bigfile
+
+        tmp = self.comm.bcast(self._tempname(key) if self.comm.rank == 0 else None)
+        try:
+            with bigfile.FileMPI(self.comm, tmp, create=True) as ff:
+                with write_field(ff, 'Field', real) as bb:
+                    bb.attrs['ndarray.shape'] = real.pm.Nmesh
+                    bb.attrs['BoxSize'] = real.pm.BoxSize
+                    bb.attrs['Nmesh'] = real.pm.Nmesh
+                    for k in getattr(real, 'attrs', {}):
+                        bb.attrs[k] = real.attrs[k]
+            error = None
+        except Exception as e:
+            error = e
+
+        # the entry is complete once all ranks have written it
+        errors = [e for e in self.comm.allgather(error) if e is not None]
+        if self.comm.rank == 0:
+            if not errors:
+                try:
+                    self._remove(key)
+                    os.rename(tmp, self.filename(key))
+                    self.evict(keep=[key])
+                    self.logger.info("stored %s in %s" % (key, self.filename(key)))
+                except Exception as e:
+                    errors.append(e)
+
+            # failing to store is not fatal; the mesh is just not cached
+            if errors:
+                self._remove(os.path.basename(tmp))
+                self.logger.warning("failed to store %s in %s: %s" % (key, self.path, str(errors[0])))
+        self.comm.barrier()
+
+class PairCountCache(DiskCache):
+    """
+    A persistent cache of pair counts, e.g., the random - random pairs
+    of the Landy-Szalay estimator, which only depend on the randoms and
+    on the binning and are the same for many mocks.
+
+    Each entry is a JSON file holding the state of a pair counting result,
+    in the format of
+    :func:`~nbodykit.algorithms.SurveyDataPairCount.save`.
+
+    All methods that access entries are collective: rank 0 reads and
+    writes the entries and broadcasts the result.
+
+    See :func:`~nbodykit.algorithms.paircount_tpcf.estimators.LandySzalayEstimator`.
+
+    Parameters
+    ----------
+    path : str
+        the directory holding the cached pair counts
+    max_size : float
+        the maximum total size of the cached pair counts in bytes
+    comm : MPI.Communicator
+        the communicator of the pair counting
+    """
+    logger = logging.getLogger('PairCountCache')
+
+    def __init__(self, path, max_size=1e9, comm=None):
+        from nbodykit import CurrentMPIComm
+        self.comm = CurrentMPIComm.get() if comm is None else comm
+        DiskCache.__init__(self, path, max_size=max_size)
+
+    @classmethod
+    def get(cls, comm=None):
+        """
+        Return the default pair count cache, as configured by the
+        ``paircount_cache_dir`` and ``paircount_cache_size`` global options,
+        or None if ``paircount_cache_dir`` is not set; see
+        :class:`~nbodykit.set_options`.
+        """
+        from nbodykit import _global_options
+
+        path = _global_options['paircount_cache_dir']
+        if path is None:
+            return None
+        return cls(path, max_size=_global_options['paircount_cache_size'], comm=comm)
+
+    def key(self, *args):
+        """
+        The key of a pair count, a hash of ``args``. The arguments shall be
+        the same on all ranks.
+        """
+        from dask.base import tokenize
+        return 'paircount-%s.json' % tokenize(*args)
+
+    def load(self, key, cls):
+        """
+        Return the cached pair count result of ``key``, as an instance of the
+        pair counting algorithm ``cls``, or ``None`` if it is not cached.
+        """
+        import json
+        from nbodykit.utils import JSONDecoder
+
+        state = None
+        if self.comm.rank == 0:
+            try:
+                with open(self.filename(key), 'r') as ff:
+                    state = json.load(ff, cls=JSONDecoder)
+                self.touch(key)
+                self.logger.info("hit for %s; loaded the pair counts from %s" % (key, self.filename(key)))
+            except (IOError, OSError, ValueError):
+                self.logger.info("miss for %s" % key)
+        state = self.comm.bcast(state)
+        if state is None:
+            return None
+
+        result = object.__new__(cls)
+        result.__setstate__(state)
+        result.comm = self.comm
+        return result
+
+    def store(self, key, result):
+        """
+        Store the pair count ``result``, evicting old entries if needed.
+        If the result cannot be stored, a warning is logged on rank 0, and
+        the result is not cached.
+        """
+        import json
+        from nbodykit.utils import JSONEncoder
+
+        if self.comm.rank == 0:
+            tmp = self._tempname(key)
+            try:
+                with open(tmp, 'w') as ff:
+                    json.dump(result.__getstate__(), ff, cls=JSONEncoder)
+                os.rename(tmp, self.filename(key))
+                self.evict(keep=[key])
+                self.logger.info("stored %s in %s" % (key, self.filename(key)))
+            except Exception as e:
+                # failing to store is not fatal; the result is just not cached
+                self._remove(os.path.basename(tmp))
+                self.logger.warning("failed to store %s in %s: %s" % (key, self.path, str(e)))
+        self.comm.barrier()
@@ -1,6 +1,7 @@
 from six import string_types
 import numpy
 import logging
+import os
 from abc import abstractmethod
 from nbodykit import _global_options
 
@@ -13,6 +14,12 @@ class FileType(object):
     """
     logger = logging.getLogger("FileType")
 
+    def __new__(cls, *args, **kwargs):
+        obj = object.__new__(cls)
+        # the options the file is opened with, part of its token
+        obj._options = (args, kwargs)
+        return obj
+
     @abstractmethod
     def read(self, columns, start, stop, step=1):
         """
@@ -119,6 +126,31 @@ class FileType(object):
         args = (self.__class__.__name__, self.path, self.dataset if hasattr(self, 'dataset') else "None", self.ncol, self.shape)
         return "%s(path=%s, dataset=%s, ncolumns=%d, shape=%s>" % args
 
+    def __dask_tokenize__(self):
+        """
+        A deterministic token of the file, such that the names of the
+        dask arrays returned by :func:`get_dask` only change if the
+        file on disk, or the options it is opened with, change.
+        """
+        from dask.base import tokenize
+
+        base = getattr(self, 'base', None)
+        if base is not None:
+            # a view: the token of the file and the selected columns
+            return (base.__dask_tokenize__(), self.columns, str(self.dtype), self.shape)
+
+        path = getattr(self, 'path', None)
+        try:
+            stat = os.stat(path)
+            stat = (stat.st_size, getattr(stat, 'st_mtime_ns', stat.st_mtime))
+        except (TypeError, OSError):
+            stat = None
+        dataset = getattr(self, 'dataset', None)
+
+        # all of the constructor arguments, e.g. offsets or rows to skip
+        options = tokenize(*getattr(self, '_options', ((), {})))
+        return (self.__class__.__name__, path, dataset, stat, options, str(self.dtype), self.shape)
+
     def __contains__(self, col):
         return col in self.columns
 
@@ -37,19 +37,38 @@ class FileStack(FileType):
         self.path = path
 
         # save the list of relevant files
-        if isinstance(path, list):
-            filenames = path
-        elif isinstance(path, string_types):
-            if '*' in path:
-                from glob import glob
-                filenames = list(map(os.path.abspath, sorted(glob(path))))
-            else:
-                if not os.path.exists(path):
-                    raise FileNotFoundError(path)
-                filenames = [os.path.abspath(path)]
-        else:
-            raise ValueError("'path' should be a string or a list of strings")
-        self.files = [filetype(fn, *args, **kwargs) for fn in filenames]
+        filenames = find_files(path)
+        self._set_files([filetype(fn, *args, **kwargs) for fn in filenames])
+
+    @classmethod
+    def from_files(cls, path, files):
+        """
+        Create a FileStack from a list of already initialized file objects.
+
+        This skips opening the files, e.g., when the file objects have been
+        created in parallel or loaded from a manifest.
+
+        Parameters
+        ----------
+        path : str, list of str
+            the path the files were found from; see :func:`find_files`
+        files : list of :class:`~nbodykit.io.base.FileType`
+            the file objects, in the order of the stack
+        """
+        if not len(files):
+            raise ValueError("cannot create a FileStack without any files")
+
+        # check that the files are instances of FileType
+        if not all(isinstance(f, FileType) for f in files):
+            raise ValueError("the stack of `filetype` objects must be subclasses of `FileType`")
+
+        obj = object.__new__(cls)
+        obj.path = path
+        obj._set_files(files)
+        return obj
+
+    def _set_files(self, files):
+        self.files = files
         self.sizes = numpy.array([len(f) for f in self.files], dtype='i8')
 
         # set dtype and size
@@ -59,6 +78,11 @@ class FileStack(FileType):
     def __repr__(self):
         return "FileStack(%s, ... %d files)" % (repr(self.files[0]), self.nfiles)
 
+    def __dask_tokenize__(self):
+        if getattr(self, 'base', None) is not None:
+            return FileType.__dask_tokenize__(self)
+        return ('FileStack', [f.__dask_tokenize__() for f in self.files])
+
     @property
     def attrs(self):
         """
@@ -110,3 +134,32 @@ class FileStack(FileType):
 
         self.logger.debug("Reading column %s [%d:%d] from file %s" % (columns, sl[0], sl[1], self))
         return numpy.concatenate(toret, axis=0)[::step]
+
+def find_files(path):
+    """
+    Return the list of file names specified by ``path``.
+
+    Parameters
+    ----------
+    path : str, list of str
+        list of file names, or string specifying single file or
+        containing a glob-like '*' pattern
+
+    Returns
+    -------
+    filenames : list of str
+        the file names, sorted if ``path`` is a glob pattern
+    """
+    if isinstance(path, list):
+        filenames = path
+    elif isinstance(path, string_types):
+        if '*' in path:
+            from glob import glob
+            filenames = list(map(os.path.abspath, sorted(glob(path))))
+        else:
+            if not os.path.exists(path):
+                raise FileNotFoundError(path)
+            filenames = [os.path.abspath(path)]
+    else:
+        raise ValueError("'path' should be a string or a list of strings")
+    return filenames
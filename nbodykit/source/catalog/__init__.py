@@ -7,7 +7,7 @@ from .file import TPMBinaryCatalog
 from .file import FITSCatalog
 from .file import Gadget1Catalog
 
-from .array import ArrayCatalog
+from .array import ArrayCatalog, SharedArrayCatalog
 from .lognormal import LogNormalCatalog
 from .uniform import UniformCatalog, RandomCatalog
 from .halos import HaloCatalog
@@ -22,6 +22,7 @@ __all__ = ['CSVCatalog',
            'FITSCatalog',
            'Gadget1Catalog',
            'ArrayCatalog',
+           'SharedArrayCatalog',
            'LogNormalCatalog',
            'UniformCatalog', 'RandomCatalog',
            'HaloCatalog',
@@ -2,7 +2,9 @@ from nbodykit.base.catalog import CatalogSource
 from nbodykit.utils import is_structured_array
 from nbodykit import CurrentMPIComm
 from astropy.table import Table
+from mpi4py import MPI
 import numpy
+import logging
 
 class ArrayCatalog(CatalogSource):
     """
@@ -84,3 +86,140 @@ class ArrayCatalog(CatalogSource):
             return self.make_column(self._source[col])
         else:
             return CatalogSource.get_hardcolumn(self, col)
+
+class SharedArrayCatalog(ArrayCatalog):
+    """
+    An :class:`ArrayCatalog` holding its columns in memory shared by the
+    ranks of each node, with one copy of the full catalog per node.
+
+    The rows are distributed across ranks as in :class:`ArrayCatalog`, and
+    the local columns are zero-copy views of the shared memory. In addition,
+    :attr:`shared` gives every rank read-only access to all rows, e.g., to
+    look up halos when populating them with galaxies, without each rank
+    holding a copy of the full catalog.
+
+    The memory is allocated with MPI-3 shared memory windows; the columns
+    are read-only. Freeing the windows is collective, so the memory is not
+    released when the catalog is garbage collected, but with :func:`close`
+    (or at the end of a ``with`` block), or else when MPI is finalized.
+
+    Parameters
+    ----------
+    data : obj:`dict`, :class:`numpy.ndarray`, :class:`astropy.table.Table`
+        the local rows of the catalog on each rank; see :class:`ArrayCatalog`
+    comm : MPI Communicator, optional
+        the MPI communicator instance; default (``None``) sets to the
+        current communicator
+    **kwargs :
+        additional keywords to store as meta-data in :attr:`attrs`
+    """
+    logger = logging.getLogger('SharedArrayCatalog')
+
+    @CurrentMPIComm.enable
+    def __init__(self, data, comm=None, **kwargs):
+
+        # convert astropy Tables to structured numpy arrays
+        if isinstance(data, Table):
+            data = data.as_array()
+
+        # check for structured data
+        if not isinstance(data, dict):
+            if not is_structured_array(data):
+                raise ValueError(("input data to SharedArrayCatalog must have a "
+                                   "structured data type with fields"))
+            keys = data.dtype.names
+        else:
+            keys = data.keys()
+
+        # the data type and the sizes must be known on all ranks
+        keys = sorted(keys)
+        dtype = numpy.dtype([(key, (data[key].dtype, data[key].shape[1:])) for key in keys])
+        dtypes = comm.allgather(dtype)
+        if any(dt != dtypes[0] for dt in dtypes):
+            raise ValueError("mismatch between dtypes across ranks in SharedArrayCatalog")
+
+        sizes = comm.allgather(len(data[keys[0]]) if len(keys) else 0)
+        start = sum(sizes[:comm.rank])
+        end = start + sizes[comm.rank]
+
+        #: all rows of the catalog, shared by the ranks of each node
+        self.shared, self._windows = _share_columns(data, dtype, sizes, comm, self.logger)
+
+        # the local rows are views of the shared rows
+        local = dict((key, self.shared[key][start:end]) for key in keys)
+        ArrayCatalog.__init__(self, local, comm=comm, **kwargs)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        """
+        Release the shared memory.
+
+        This is collective. The columns of this catalog, and of catalogs
+        derived from it, shall not be used afterwards.
+        """
+        windows, self._windows = self._windows, []
+        for win in windows:
+            win.Free()
+
+def _share_columns(data, dtype, sizes, comm, logger):
+    """
+    Copy the local rows of the columns of ``data`` to arrays in memory
+    shared by the ranks of each node, holding all rows.
+
+    Returns the dictionary of shared arrays, and the list of the windows
+    holding their memory.
+    """
+    csize = sum(sizes)
+    offsets = numpy.cumsum([0] + sizes)
+
+    # the ranks of this node, and the leaders (first rank) of the nodes
+    nodecomm = comm.Split_type(MPI.COMM_TYPE_SHARED)
+    leadercomm = comm.Split(0 if nodecomm.rank == 0 else MPI.UNDEFINED, comm.rank)
+
+    # the index of the node of each rank, in the leader communicator
+    node = nodecomm.bcast(leadercomm.rank if nodecomm.rank == 0 else None)
+    nodes = comm.allgather(node)
+
+    if comm.rank == 0:
+        logger.info("sharing %d rows of %d bytes on %d nodes" % (csize, dtype.itemsize, len(set(nodes))))
+
+    toret = {}
+    windows = []
+    for key in dtype.names:
+        dt = dtype[key]
+
+        # allocate the memory on the first rank of the node
+        nbytes = csize * dt.itemsize if nodecomm.rank == 0 else 0
+        win = MPI.Win.Allocate_shared(nbytes, dt.itemsize, comm=nodecomm)
+        buf, itemsize = win.Shared_query(0)
+        shared = numpy.ndarray(buffer=buf, dtype=dt.base, shape=(csize,) + dt.shape)
+
+        # fill the local rows, then the rows of the other nodes
+        win.Fence()
+        shared[offsets[comm.rank]:offsets[comm.rank + 1]] = data[key]
+        win.Fence()
+
+        if nodecomm.rank == 0:
+            rowtype = MPI.BYTE.Create_contiguous(dt.itemsize)
+            rowtype.Commit()
+            for rank in range(comm.size):
+                if sizes[rank] == 0: continue
+                rows = shared[offsets[rank]:offsets[rank + 1]]
+                leadercomm.Bcast([rows, rowtype], root=nodes[rank])
+            rowtype.Free()
+        win.Fence()
+
+        shared.flags.writeable = False
+        toret[key] = shared
+
+        windows.append(win)
+
+    nodecomm.Free()
+    if leadercomm != MPI.COMM_NULL:
+        leadercomm.Free()
+    return toret, windows
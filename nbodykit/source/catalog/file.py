@@ -5,6 +5,7 @@ from nbodykit import io
 from nbodykit.extern import docrep
 
 from six import string_types
+import numpy
 import textwrap
 import os
 
@@ -33,23 +34,35 @@ class FileCatalogBase(CatalogSource):
     comm : MPI Communicator, optional
         the MPI communicator instance; default (``None``) sets to the
         current communicator
+    manifest : str, optional
+        the name of a manifest file caching the meta-data of the files
+        (sizes, data types, headers); if the manifest exists and is
+        up-to-date, the files are not scanned again, otherwise the
+        manifest is (re-)written after the scan
+    partition : 'rows', 'files'
+        how to partition the rows among the ranks. 'rows' gives each rank
+        an equal number of rows, regardless of the file boundaries. 'files'
+        assigns whole files to ranks, splitting only the files larger than
+        the share of a rank into equal pieces, balancing the number of bytes
+        read by each rank; this reduces the number of ranks reading from
+        the same file and the number of files opened by each rank.
     """
     @CurrentMPIComm.enable
-    def __init__(self, filetype, args=(), kwargs={}, comm=None):
+    def __init__(self, filetype, args=(), kwargs={}, comm=None, manifest=None,
+                    partition='rows'):
 
         self.comm = comm
         self.filetype = filetype
 
-        # bcast the FileStack
-        if self.comm.rank == 0:
-            self._source = FileStack(filetype, *args, **kwargs)
-        else:
-            self._source = None
-        self._source = self.comm.bcast(self._source)
+        if partition not in ['rows', 'files']:
+            raise ValueError("partition must be 'rows' or 'files', not '%s'" % str(partition))
+        self.partition = partition
+
+        # scan the files in parallel, or load the scan from the manifest
+        self._source = _open_file_stack(self.comm, filetype, args, kwargs, manifest)
 
         # compute the size; start with full file.
-        lstart = self.comm.rank * self._source.size // self.comm.size
-        lend = (self.comm.rank  + 1) * self._source.size // self.comm.size
+        lstart, lend = self._partition_rows(0, self._source.size)
         self._size = lend - lstart
 
         self.start = 0
@@ -91,14 +104,34 @@ class FileCatalogBase(CatalogSource):
             raise ValueError("cannot seek if columns have been attached to the FileCatalog")
 
         other = self.copy()
-        other._lstart = self.start + start +  self.comm.rank * (end - start) // self.comm.size
-        other._lend = self.start + start + (self.comm.rank + 1) * (end - start) // self.comm.size
+        other._lstart, other._lend = self._partition_rows(self.start + start, self.start + end)
         other._size = other._lend - other._lstart
         other.start = start
         other.end = end
         CatalogSource.__init__(other, comm=self.comm)
         return other
 
+    def _partition_rows(self, start, end):
+        """
+        Return the range of rows in the file stack for this rank,
+        partitioning the rows ``[start, end)`` according to
+        :attr:`partition`.
+        """
+        bounds = partition_rows(self._source.sizes, start, end, self.comm.size,
+                                    partition=self.partition)
+
+        if self.partition == 'files' and self.comm.rank == 0:
+            # number of files touched by each rank
+            edges = numpy.cumsum(self._source.sizes)
+            first = numpy.searchsorted(edges, bounds[:-1], side='right')
+            last = numpy.searchsorted(edges, bounds[1:] - 1, side='right')
+            nfiles = numpy.where(bounds[1:] > bounds[:-1], last - first + 1, 0)
+            nbytes = numpy.diff(bounds) * self._source.dtype.itemsize
+            self.logger.info("file-aligned partition: at most %d file(s) per rank, "
+                             "%d to %d bytes per rank" % (nfiles.max(), nbytes.min(), nbytes.max()))
+
+        return bounds[self.comm.rank], bounds[self.comm.rank + 1]
+
     def __repr__(self):
         path = self._source.path
         name = self.__class__.__name__
@@ -125,6 +158,203 @@ class FileCatalogBase(CatalogSource):
         else:
             return CatalogSource.get_hardcolumn(self, col)
 
+    def read_rows(self, col, index):
+        """
+        Read a column from the underlying file source, only at the given
+        local rows.
+
+        The rows are grouped into contiguous read ranges with
+        :func:`~nbodykit.io.base.find_slice_chunks`, such that only those
+        ranges are read from disk.
+        """
+        if col not in self._source.dtype.names:
+            return CatalogSource.read_rows(self, col, index)
+
+        f = self._source[col]
+        if len(index) == 0:
+            return numpy.empty((0,) + f.shape[1:], dtype=f.dtype)
+
+        return f[numpy.asarray(index, dtype='i8') + self._lstart]
+
+
+def partition_rows(sizes, start, end, nranks, partition='rows'):
+    """
+    Partition the rows ``[start, end)`` of a stack of files among ranks.
+
+    Parameters
+    ----------
+    sizes : array_like
+        the number of rows in each file of the stack
+    start : int
+        the first row to partition
+    end : int
+        the end of the rows to partition
+    nranks : int
+        the number of ranks
+    partition : 'rows', 'files'
+        with 'rows', each rank gets the same number of rows. With 'files',
+        the boundaries between ranks are placed on the file boundaries
+        closest to the even split; files larger than the share of one rank
+        are first cut into equal pieces, whose boundaries are used as well.
+
+    Returns
+    -------
+    bounds : array_like
+        the ``nranks + 1`` boundaries; rank ``i`` reads the rows
+        ``[bounds[i], bounds[i+1])``
+    """
+    ranks = numpy.arange(nranks + 1, dtype='i8')
+    if partition == 'rows':
+        return start + ranks * (end - start) // nranks
+
+    if partition != 'files':
+        raise ValueError("partition must be 'rows' or 'files', not '%s'" % str(partition))
+
+    # file boundaries within [start, end)
+    edges = numpy.concatenate([[0], numpy.cumsum(sizes, dtype='i8')])
+    edges = numpy.unique(edges.clip(start, end))
+
+    # cut the files that are larger than the share of one rank into pieces
+    share = 1.0 * (end - start) / nranks
+    candidates = [edges]
+    for a, b in zip(edges[:-1], edges[1:]):
+        npieces = int(round((b - a) / share))
+        if npieces > 1:
+            candidates.append(a + numpy.arange(1, npieces, dtype='i8') * (b - a) // npieces)
+    candidates = numpy.unique(numpy.concatenate(candidates))
+
+    # place each boundary to the nearest candidate
+    ideal = start + ranks * share
+    i = numpy.searchsorted(candidates, ideal).clip(1, max(len(candidates) - 1, 1))
+    left = candidates[i - 1]
+    right = candidates[numpy.minimum(i, len(candidates) - 1)]
+    bounds = numpy.where(ideal - left <= right - ideal, left, right)
+    bounds[0] = start
+    bounds[-1] = end
+
+    return numpy.maximum.accumulate(bounds)
+
+def _open_file_stack(comm, filetype, args, kwargs, manifest=None):
+    """
+    Create the :class:`~nbodykit.io.stack.FileStack` of a file catalog.
+
+    The files are opened (reading their sizes, data types and headers)
+    in parallel, with each rank opening a contiguous subset of the files,
+    and the file objects are gathered to all ranks in a single step.
+
+    If ``manifest`` is given, rank 0 first tries to load the file objects
+    from it. The manifest is only used if it was written for the same
+    file type and arguments, and none of the files has changed since.
+    Otherwise it is (re-)written after the scan.
+    """
+    import pickle
+    import inspect
+    from nbodykit.io.base import FileType
+    from nbodykit.io.stack import find_files
+
+    # check that filetype is subclass of FileType
+    if not inspect.isclass(filetype) or not issubclass(filetype, FileType):
+        raise ValueError("the stack of `filetype` objects must be subclasses of `FileType`")
+
+    # the path is the first argument, or a keyword
+    if len(args):
+        path, args = args[0], tuple(args[1:])
+    else:
+        kwargs = dict(kwargs)
+        if 'path' not in kwargs:
+            raise ValueError("the `path` of the files must be given")
+        path = kwargs.pop('path')
+
+    # find the files, and try the manifest
+    files = None
+    if comm.rank == 0:
+        try:
+            filenames = find_files(path)
+            if manifest is not None:
+                key = _manifest_key(filetype, filenames, args, kwargs)
+                if os.path.exists(manifest):
+                    try:
+                        with open(manifest, 'rb') as ff:
+                            d = pickle.load(ff)
+                        if d['key'] == key:
+                            files = d['files']
+                    except Exception:
+                        pass
+            error = None
+        except Exception as e:
+            filenames = None
+            error = e
+    else:
+        filenames = None
+        error = None
+
+    error, filenames, files = comm.bcast((error, filenames, files))
+    if error is not None:
+        raise error
+
+    if files is not None:
+        if comm.rank == 0:
+            FileCatalogBase.logger.info("loaded meta-data of %d files from manifest %s" % (len(files), manifest))
+        return FileStack.from_files(path, files)
+
+    # open a contiguous subset of the files on each rank
+    N = len(filenames)
+    start = comm.rank * N // comm.size
+    end = (comm.rank + 1) * N // comm.size
+    try:
+        files = [filetype(fn, *args, **kwargs) for fn in filenames[start:end]]
+        error = None
+    except Exception as e:
+        files = []
+        error = e
+
+    # gather all of the file objects in one step
+    allfiles = comm.allgather((error, files))
+    for error, _ in allfiles:
+        if error is not None:
+            raise error
+
+    files = sum([f for _, f in allfiles], [])
+    if comm.rank == 0:
+        FileCatalogBase.logger.info("scanned meta-data of %d files on %d ranks" % (N, comm.size))
+
+    stack = FileStack.from_files(path, files)
+
+    # save the scan for later
+    if manifest is not None:
+        error = None
+        if comm.rank == 0:
+            try:
+                tmp = manifest + '.tmp'
+                with open(tmp, 'wb') as ff:
+                    pickle.dump({'key': key, 'files': files}, ff, protocol=pickle.HIGHEST_PROTOCOL)
+                os.rename(tmp, manifest)
+                FileCatalogBase.logger.info("saved meta-data of %d files to manifest %s" % (N, manifest))
+            except Exception as e:
+                error = e
+
+        # raise on all ranks
+        error = comm.bcast(error)
+        if error is not None:
+            raise error
+
+    return stack
+
+def _manifest_key(filetype, filenames, args, kwargs):
+    """
+    The key identifying a manifest: the file type, its arguments and
+    the names, sizes and modification times of the files.
+    """
+    import pickle
+
+    stats = []
+    for fn in filenames:
+        st = os.stat(fn)
+        stats.append((os.path.abspath(fn), st.st_size, getattr(st, 'st_mtime_ns', st.st_mtime)))
+
+    qualname = '%s.%s' %(filetype.__module__, filetype.__name__)
+    options = pickle.dumps((args, sorted(kwargs.items())), protocol=2)
+    return (qualname, options, stats)
 
 def _make_docstring(filetype, examples):
     """
@@ -149,6 +379,13 @@ comm : MPI Communicator, optional
     current communicator
 attrs : dict, optional
     dictionary of meta-data to store in :attr:`attrs`
+manifest : str, optional
+    the name of a manifest file caching the meta-data of the files, such
+    that later opens of the same files do not need to scan them again
+partition : 'rows', 'files', optional
+    how to partition the rows among the ranks; 'files' assigns whole
+    files (or equal pieces of large files) to ranks, balanced by size.
+    Default is 'rows', an equal number of rows per rank.
 """.format(qualname=qualname)
 
     if examples is not None:
@@ -187,7 +424,10 @@ def FileCatalogFactory(name, filetype, examples=None):
     def __init__(self, *args, **kwargs):
         comm = kwargs.pop('comm', None)
         attrs = kwargs.pop('attrs', {})
-        FileCatalogBase.__init__(self, filetype=filetype, args=args, kwargs=kwargs, comm=comm)
+        manifest = kwargs.pop('manifest', None)
+        partition = kwargs.pop('partition', 'rows')
+        FileCatalogBase.__init__(self, filetype=filetype, args=args, kwargs=kwargs,
+                                    comm=comm, manifest=manifest, partition=partition)
         self.attrs.update(attrs)
 
     # make the doc string for this class
@@ -1,6 +1,6 @@
 from nbodykit.base.catalog import CatalogSource
 from pmesh.domain import GridND
-from nbodykit.utils import split_size_3d
+from nbodykit.utils import split_size_3d, ExchangeColumns
 import numpy
 
 class SubVolumesCatalog(CatalogSource):
@@ -52,9 +52,13 @@ class SubVolumesCatalog(CatalogSource):
         self._frozen = {}
         if columns is None: columns = source.columns
 
-        for column in columns:
-            data = source[column].compute()
-            self._frozen[column] = self.make_column(layout.exchange(data))
+        # exchange all of the columns at once
+        data = source.compute(*[source[column] for column in columns])
+        if len(columns) == 1:
+            data = [data]
+
+        for column, array in zip(columns, ExchangeColumns(layout, *data)):
+            self._frozen[column] = self.make_column(array)
 
     @property
     def hardcolumns(self):
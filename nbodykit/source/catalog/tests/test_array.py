@@ -73,3 +73,38 @@ def test_dict(comm):
     source['Velocity'] = source['Position'] + source['Velocity']
     source['Position'] = source['Position'] + source['Velocity']
     assert_allclose(source['Position'], 3)
+
+@MPITest([1, 4])
+def test_shared(comm):
+
+    # a different number of rows on each rank
+    data = numpy.empty(10 * comm.rank, dtype=[
+            ('Position', ('f8', 3)),
+            ('ID', 'i8')]
+            )
+    data['Position'] = numpy.random.random(size=(len(data), 3))
+    data['ID'] = numpy.arange(len(data)) + 1000 * comm.rank
+    source = SharedArrayCatalog(data, BoxSize=100, comm=comm)
+
+    assert source.size == len(data)
+    assert source.attrs['BoxSize'] == 100
+    for col in ['Position', 'ID']:
+        assert_array_equal(data[col], source[col])
+
+        # all rows are available on all ranks, read-only
+        alldata = numpy.concatenate(comm.allgather(data[col]), axis=0)
+        assert_array_equal(source.shared[col], alldata)
+        assert not source.shared[col].flags.writeable
+
+    # the memory is released when closed
+    windows = source._windows
+    assert len(windows) == 2
+    source.close()
+    assert all(win == MPI.WIN_NULL for win in windows)
+    source.close()
+
+    # or at the end of the block
+    with SharedArrayCatalog(data, comm=comm) as source:
+        windows = source._windows
+        assert_array_equal(data['ID'], source['ID'])
+    assert all(win == MPI.WIN_NULL for win in windows)
@@ -1,8 +1,9 @@
 from runtests.mpi import MPITest
 from nbodykit.lab import *
-from nbodykit import setup_logging
-from numpy.testing import assert_allclose
+from nbodykit import setup_logging, set_options, utils
+from numpy.testing import assert_allclose, assert_array_equal
 import tempfile
+import pytest
 import os
 
 @MPITest([1])
@@ -148,3 +149,182 @@ def test_stack_list(comm):
 
     os.unlink(tmpfile1)
     os.unlink(tmpfile2)
+
+@MPITest([1, 4])
+def test_selection_pushdown(comm):
+
+    from nbodykit.base.catalog import _compute_selected
+
+    # fake structured array, the same on all ranks
+    rng = numpy.random.RandomState(42)
+    dset = numpy.empty(1024, dtype=[('Position', ('f8', 3)), ('Mass', 'f8')])
+    dset['Position'] = rng.random_sample(size=(1024, 3))
+    dset['Mass'] = rng.random_sample(size=1024)
+
+    if comm.rank == 0:
+        tmpfile = tempfile.mkstemp()[1]
+        with open(tmpfile, 'wb') as ff:
+            dset['Position'].tofile(ff)
+            dset['Mass'].tofile(ff)
+        tmpfile = comm.bcast(tmpfile)
+    else:
+        tmpfile = comm.bcast(None)
+
+    source = BinaryCatalog(tmpfile, dset.dtype, comm=comm)
+
+    sel = source['Mass'] < 0.2
+    columns = [source['Position'][10:], source['Mass'][10:] * 2]
+    data, nbytes, nbytes_full = _compute_selected(source, sel[10:], columns)
+
+    # the file column is pushed down, the derived column is not
+    local = dset[source._lstart:source._lend][10:]
+    mask = local['Mass'] < 0.2
+    assert_allclose(data[0], local['Position'][mask])
+    assert_allclose(data[1], local['Mass'][mask] * 2)
+    assert nbytes == mask.sum() * 24
+    assert nbytes_full == len(local) * 24
+
+    # painting-like use with the global option reads only the selected rows
+    with set_options(selection_pushdown=True):
+        pos = source['Position']
+        pmin, pmax = utils.get_data_bounds(pos, comm, selection=sel)
+
+    allpos = dset['Position'][dset['Mass'] < 0.2]
+    assert_allclose(pmin, allpos.min(axis=0))
+    assert_allclose(pmax, allpos.max(axis=0))
+
+    comm.barrier()
+    if comm.rank == 0:
+        os.unlink(tmpfile)
+
+@MPITest([1, 4])
+def test_manifest(comm):
+
+    # the same data on all ranks
+    rng = numpy.random.RandomState(42)
+    data = rng.random_sample(size=(6, 100))
+
+    if comm.rank == 0:
+        tmpdir = tempfile.mkdtemp()
+        for i in range(6):
+            data[i].tofile(os.path.join(tmpdir, 'test-%d.dat' % i))
+        tmpdir = comm.bcast(tmpdir)
+    else:
+        tmpdir = comm.bcast(None)
+
+    path = os.path.join(tmpdir, 'test-*.dat')
+    manifest = os.path.join(tmpdir, 'manifest')
+
+    # the first open scans the files and writes the manifest
+    f1 = BinaryCatalog(path, [('a', 'f8')], manifest=manifest, comm=comm)
+    assert os.path.exists(manifest)
+    assert f1._source.nfiles == 6
+    assert f1.csize == 600
+
+    # the second open uses the manifest
+    f2 = BinaryCatalog(path, [('a', 'f8')], manifest=manifest, comm=comm)
+    assert_allclose(f1['a'].compute(), f2['a'].compute())
+    assert_allclose(numpy.concatenate(comm.allgather(f2['a'].compute())), data.ravel())
+
+    # a new file invalidates the manifest
+    comm.barrier()
+    if comm.rank == 0:
+        numpy.ones(50).tofile(os.path.join(tmpdir, 'test-6.dat'))
+    comm.barrier()
+
+    f3 = BinaryCatalog(path, [('a', 'f8')], manifest=manifest, comm=comm)
+    assert f3._source.nfiles == 7
+    assert f3.csize == 650
+
+    # the path given as a keyword
+    f4 = BinaryCatalog(path=path, dtype=[('a', 'f8')], manifest=manifest, comm=comm)
+    assert f4.csize == 650
+
+    # failing to write the manifest raises on all ranks
+    with pytest.raises((IOError, OSError)):
+        BinaryCatalog(path, [('a', 'f8')], manifest=os.path.join(tmpdir, 'missing', 'manifest'), comm=comm)
+
+    comm.barrier()
+    if comm.rank == 0:
+        import shutil
+        shutil.rmtree(tmpdir)
+
+@MPITest([1, 4])
+def test_file_partition(comm):
+
+    from nbodykit.source.catalog.file import partition_rows
+
+    # files are never split if they are smaller than the share of a rank
+    bounds = partition_rows([100, 250, 30, 20], 0, 400, 4, partition='files')
+    assert_array_equal(bounds, [0, 100, 225, 350, 400])
+
+    # large files are split into equal pieces
+    bounds = partition_rows([900], 0, 900, 3, partition='files')
+    assert_array_equal(bounds, [0, 300, 600, 900])
+
+    # the same data on all ranks, in files of different sizes
+    sizes = [100, 250, 30, 20, 300, 60]
+    data = numpy.random.RandomState(42).random_sample(size=sum(sizes))
+    offsets = numpy.cumsum([0] + sizes)
+
+    if comm.rank == 0:
+        tmpdir = tempfile.mkdtemp()
+        for i in range(len(sizes)):
+            data[offsets[i]:offsets[i+1]].tofile(os.path.join(tmpdir, 'test-%d.dat' % i))
+        tmpdir = comm.bcast(tmpdir)
+    else:
+        tmpdir = comm.bcast(None)
+
+    path = os.path.join(tmpdir, 'test-*.dat')
+    f = BinaryCatalog(path, [('a', 'f8')], partition='files', comm=comm)
+    assert f.csize == sum(sizes)
+
+    # local ranges start and end on the file boundaries or the pieces
+    bounds = partition_rows(sizes, 0, sum(sizes), comm.size, partition='files')
+    assert f._lstart == bounds[comm.rank]
+    assert f._lend == bounds[comm.rank + 1]
+    assert_allclose(numpy.concatenate(comm.allgather(f['a'].compute())), data)
+
+    # query_range partitions the range by files as well
+    region = f.query_range(50, 400)
+    assert_allclose(numpy.concatenate(comm.allgather(region['a'].compute())), data[50:400])
+
+    comm.barrier()
+    if comm.rank == 0:
+        import shutil
+        shutil.rmtree(tmpdir)
+
+@MPITest([1])
+def test_column_names_deterministic(comm):
+
+    dset = numpy.empty(1024, dtype=[('Position', ('f8', 3)), ('Mass', 'f8')])
+    dset['Position'] = numpy.random.random(size=(1024, 3))
+    dset['Mass'] = numpy.random.random(size=1024)
+
+    tmpfile = tempfile.mkstemp()[1]
+    with open(tmpfile, 'wb') as ff:
+        dset['Position'].tofile(ff)
+        dset['Mass'].tofile(ff)
+
+    dtype = [('Position', ('f8', 3)), ('Mass', 'f8')]
+    source1 = BinaryCatalog(tmpfile, dtype, comm=comm)
+    source2 = BinaryCatalog(tmpfile, dtype, comm=comm)
+
+    # the same file and column give the same dask graph
+    assert source1['Mass'].name == source2['Mass'].name
+    assert source1['Selection'].name == source2['Selection'].name
+    assert source1['Mass'].name != source1['Position'].name
+
+    # the name changes with the file on disk
+    name = source1['Mass'].name
+    with open(tmpfile, 'ab') as ff:
+        dset['Mass'][:1].tofile(ff)
+    source3 = BinaryCatalog(tmpfile, dtype, size=1024, comm=comm)
+    assert source3['Mass'].name != name
+
+    # and with the options the file is opened with
+    source4 = BinaryCatalog(tmpfile, dtype, size=1000, comm=comm)
+    source5 = BinaryCatalog(tmpfile, dtype, size=1000, header_size=8, comm=comm)
+    assert source4['Mass'].name != source5['Mass'].name
+
+    os.unlink(tmpfile)
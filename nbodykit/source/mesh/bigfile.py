@@ -6,18 +6,24 @@ from nbodykit.base.mesh import MeshSource
 from nbodykit import CurrentMPIComm
 from nbodykit.utils import JSONDecoder
 from bigfile import FileMPI
+from mpi4py import MPI
 from pmesh.pm import ParticleMesh, ComplexField, RealField
 
 import numpy
 import json
 from six import string_types
 
+# lossless codecs for compressed meshes; in the standard library
+_compressors = {'zlib' : 'zlib', 'bz2' : 'bz2', 'lzma' : 'lzma'}
+
 class BigFileMesh(MeshSource):
     """
     A MeshSource object that reads a mesh from disk using :mod:`bigfile`.
 
     This can read meshes that have been stored with the
-    :func:`~nbodykit.base.mesh.MeshSource.save` function of MeshSource objects.
+    :func:`~nbodykit.base.mesh.MeshSource.save` function of MeshSource objects,
+    including meshes stored with reduced precision or compression, which
+    are decoded according to the ``codec.*`` attrs of the dataset.
 
     Parameters
     ----------
@@ -51,16 +57,19 @@ class BigFileMesh(MeshSource):
                 else:
                     self.attrs[key] = numpy.squeeze(v)
 
+            # the data type of the mesh, before encoding for storage
+            fdtype = _MeshCodec.from_attrs(ff.attrs, ff.dtype).dtype
+
             # fourier space or config space
-            if ff.dtype.kind == 'c':
+            if fdtype.kind == 'c':
                 self.isfourier = True
-                if ff.dtype.itemsize == 16:
+                if fdtype.itemsize == 16:
                     dtype = 'f8'
                 else:
                     dtype = 'f4'
             else:
                 self.isfourier = False
-                if ff.dtype.itemsize == 8:
+                if fdtype.itemsize == 8:
                     dtype = 'f8'
                 else:
                     dtype = 'f4'
@@ -96,13 +105,12 @@ class BigFileMesh(MeshSource):
         # the real field to paint to
         pmread = self.pm
 
-        with FileMPI(comm=self.comm, filename=self.path)[self.dataset] as ds:
-            if self.comm.rank == 0:
-                self.logger.info("reading real field from %s" % self.path)
-            real2 = RealField(pmread)
-            start = numpy.sum(self.comm.allgather(real2.size)[:self.comm.rank], dtype='intp')
-            end = start + real2.size
-            real2.unravel(ds[start:end])
+        if self.comm.rank == 0:
+            self.logger.info("reading real field from %s" % self.path)
+
+        real2 = RealField(pmread)
+        with FileMPI(comm=self.comm, filename=self.path) as ff:
+            read_field(ff, self.dataset, real2)
 
         return real2
 
@@ -126,11 +134,327 @@ class BigFileMesh(MeshSource):
         if self.comm.rank == 0:
             self.logger.info("reading complex field from %s" % self.path)
 
-        with FileMPI(comm=self.comm, filename=self.path)[self.dataset] as ds:
-            complex2 = ComplexField(pmread)
-            assert self.comm.allreduce(complex2.size) == ds.size
-            start = numpy.sum(self.comm.allgather(complex2.size)[:self.comm.rank], dtype='intp')
-            end = start + complex2.size
-            complex2.unravel(ds[start:end])
+        complex2 = ComplexField(pmread)
+        with FileMPI(comm=self.comm, filename=self.path) as ff:
+            read_field(ff, self.dataset, complex2)
 
         return complex2
+
+def _field_runs(field):
+    """
+    Iterate over the local data of a field in runs that are contiguous in
+    the 'C'-order of the full mesh.
+
+    The local data of a field is a block of the full mesh. The trailing
+    axes that are complete on this rank, and the last incomplete axis, form
+    one contiguous run; the leading axes are iterated over, at least over
+    the first axis, such that each run is at most one slab.
+
+    Yields
+    ------
+    index : tuple
+        the index of the run into ``field.value``
+    offset : int
+        the offset of the first element of the run in the full mesh
+    """
+    shape = field.value.shape
+    cshape = tuple(field.cshape)
+    start = tuple(field.start)
+
+    # the axes before the last incomplete axis
+    nlead = len(shape) - 1
+    while nlead > 0 and shape[nlead] == cshape[nlead]:
+        nlead -= 1
+    nlead = max(nlead, 1)
+
+    for index in numpy.ndindex(*shape[:nlead]):
+        gindex = [s + i for s, i in zip(start, index)] + list(start[nlead:])
+        # empty local blocks have no runs
+        if any(g >= n for g, n in zip(gindex, cshape)):
+            continue
+        yield index, numpy.ravel_multi_index(gindex, cshape)
+
+class _MeshCodec(object):
+    """
+    The storage format of a mesh saved by :func:`write_field`.
+
+    Values are optionally stored with reduced precision, either cast to
+    a smaller floating point type (``dtype``), or quantized to integers
+    with an absolute error bound (``tolerance``). Complex values are
+    stored as pairs of real values in that case. The stored values are
+    optionally compressed with a lossless ``compression`` codec.
+
+    The format is recorded in the ``codec.*`` attrs of the dataset.
+    """
+    def __init__(self, dtype, storage=None, tolerance=None, compression=None):
+        self.dtype = numpy.dtype(dtype)
+        self.storage = None if storage is None else numpy.dtype(storage)
+        self.tolerance = tolerance
+        self.compression = compression
+        self.offset = 0.
+
+        if compression is not None and compression not in _compressors:
+            raise ValueError("compression should be one of %s" % str(sorted(_compressors)))
+        if tolerance is not None:
+            if tolerance <= 0:
+                raise ValueError("quantization tolerance must be positive")
+            if storage is not None:
+                raise ValueError("specify only one of the storage `dtype` and the quantization `tolerance`")
+
+    @property
+    def is_trivial(self):
+        return self.storage is None and self.tolerance is None and self.compression is None
+
+    @property
+    def realdtype(self):
+        return self.dtype if self.dtype.kind != 'c' else numpy.dtype('f%d' % (self.dtype.itemsize // 2))
+
+    @property
+    def ncomp(self):
+        """ number of stored values per mesh element"""
+        if self.dtype.kind == 'c' and (self.storage is not None or self.tolerance is not None):
+            return 2
+        return 1
+
+    @classmethod
+    def from_attrs(cls, attrs, dtype):
+        """
+        The codec of a dataset, from its attrs; ``dtype`` is the stored
+        data type of the dataset.
+        """
+        if 'codec.dtype' not in attrs:
+            return cls(dtype)
+
+        def get(key):
+            value = numpy.squeeze(attrs[key])
+            if value.dtype.kind in 'SU':
+                value = str(value)
+                return None if value == '' else value
+            value = float(value)
+            return None if value == 0 else value
+
+        self = cls(get('codec.dtype'), tolerance=get('codec.tolerance'), compression=get('codec.compression'))
+        storage = get('codec.storage')
+        self.storage = None if storage is None else numpy.dtype(storage)
+        self.offset = float(numpy.squeeze(attrs['codec.offset']))
+        return self
+
+    def to_attrs(self, attrs):
+        attrs['codec.dtype'] = self.dtype.str
+        attrs['codec.storage'] = '' if self.storage is None else self.storage.str
+        attrs['codec.tolerance'] = 0. if self.tolerance is None else self.tolerance
+        attrs['codec.offset'] = self.offset
+        attrs['codec.compression'] = '' if self.compression is None else self.compression
+
+    def setup(self, field):
+        """
+        Choose the integer type and offset of quantized values, from the
+        range of the values of ``field``; or check that the values of
+        ``field`` are in the range of the storage data type.
+        """
+        if self.tolerance is None and self.storage is None:
+            return
+
+        value = field.value.view(self.realdtype) if self.dtype.kind == 'c' else field.value
+        comm = field.pm.comm
+
+        # NaN and infinite values can only be stored as floating point;
+        # they stay as they are and are left out of the range
+        finite = numpy.isfinite(value)
+        if not comm.allreduce(bool(finite.all()), op=MPI.LAND):
+            if self.tolerance is not None:
+                raise ValueError("cannot quantize a field with NaN or infinite values")
+            if self.storage.kind in 'iu':
+                raise ValueError("cannot store a field with NaN or infinite values "
+                                 "as the integer data type '%s'" % self.storage.str)
+            value = value[finite]
+
+        vmin = comm.allreduce(value.min() if value.size else numpy.inf, op=MPI.MIN)
+        vmax = comm.allreduce(value.max() if value.size else -numpy.inf, op=MPI.MAX)
+
+        if self.tolerance is None:
+            # casting does not check the range, e.g. 'f2' overflows to inf
+            # above 65504
+            if self.storage.kind == 'f':
+                info = numpy.finfo(self.storage)
+            elif self.storage.kind in 'iu':
+                info = numpy.iinfo(self.storage)
+            else:
+                return
+            if vmin < info.min or vmax > info.max:
+                raise ValueError("the values of the field, in [%g, %g], are out of the range of "
+                                 "the storage data type '%s', [%g, %g]"
+                                 % (vmin, vmax, self.storage.str, info.min, info.max))
+            return
+
+        nlevels = int(numpy.ceil((vmax - vmin) / (2 * self.tolerance))) + 1
+
+        for storage in ['u1', 'u2', 'u4', 'u8']:
+            if nlevels <= numpy.iinfo(storage).max:
+                break
+        else:
+            raise ValueError("the range of the field, [%g, %g], has too many levels of "
+                             "tolerance %g to be stored as 'u8'" % (vmin, vmax, self.tolerance))
+        self.storage = numpy.dtype(storage)
+        self.offset = float(vmin)
+
+    def encode(self, run):
+        """
+        Encode a contiguous 1d run of mesh values to the stored values.
+        """
+        if self.ncomp == 2:
+            run = run.view(self.realdtype)
+        if self.tolerance is not None:
+            run = numpy.rint((run - self.offset) / (2 * self.tolerance))
+        if self.storage is not None:
+            run = run.astype(self.storage)
+        return run
+
+    def decode(self, stored):
+        """
+        Decode the stored values to a 1d run of mesh values.
+        """
+        if self.tolerance is not None:
+            run = (stored * (2 * self.tolerance) + self.offset).astype(self.realdtype)
+        else:
+            run = stored.astype(self.realdtype if self.ncomp == 2 else self.dtype)
+        if self.ncomp == 2:
+            run = run.view(self.dtype)
+        return run
+
+    def compress(self, stored):
+        import importlib
+        return importlib.import_module(_compressors[self.compression]).compress(stored.tobytes())
+
+    def decompress(self, data):
+        import importlib
+        data = importlib.import_module(_compressors[self.compression]).decompress(data)
+        return numpy.frombuffer(data, dtype=self.storage or self.dtype)
+
+def write_field(ff, dataset, field, dtype=None, tolerance=None, compression=None):
+    """
+    Write a field to a bigfile dataset, in the 'C'-order of the full mesh.
+
+    The local data of the field is written slab by slab (see
+    :func:`_field_runs`), without making a copy of the field.
+
+    Parameters
+    ----------
+    ff : bigfile.FileMPI
+        the file to write to
+    dataset : str
+        the name of the dataset
+    field : RealField, ComplexField
+        the field to write
+    dtype : str, optional
+        the data type to store the values with, e.g. 'f2'; default is the
+        data type of the field. A ValueError is raised if the values are out
+        of the range of ``dtype``, e.g. above 65504 for 'f2'
+    tolerance : float, optional
+        if given, store the values quantized to integers, with an absolute
+        error no larger than ``tolerance``. A ValueError is raised if the
+        values are not all finite
+    compression : str, optional
+        the lossless codec to compress the stored values with; one of
+        'zlib', 'bz2' and 'lzma'. The compressed values of a rank are held
+        in memory until written.
+
+    Returns
+    -------
+    bigfile.ColumnMPI :
+        the dataset, open for adding attrs
+    """
+    comm = field.pm.comm
+    codec = _MeshCodec(field.dtype, storage=dtype, tolerance=tolerance, compression=compression)
+    codec.setup(field)
+    storage = codec.storage or codec.dtype
+
+    # sane value -- 32 million items per physical file
+    sizeperfile = 32 * 1024 * 1024
+
+    if codec.compression is None:
+        size = field.csize * codec.ncomp
+        Nfile = (size + sizeperfile - 1) // sizeperfile
+        bb = ff.create(dataset, storage, size, Nfile)
+        for index, offset in _field_runs(field):
+            bb.write(offset * codec.ncomp, codec.encode(field.value[index].ravel()))
+    else:
+        # compress all runs first, to find the size of the dataset
+        chunks = []
+        for index, offset in _field_runs(field):
+            run = field.value[index]
+            chunks.append((offset, run.size, codec.compress(codec.encode(run.ravel()))))
+
+        nbytes = sum(len(data) for offset, n, data in chunks)
+        start = numpy.sum(comm.allgather(nbytes)[:comm.rank], dtype='i8')
+        size = comm.allreduce(nbytes)
+        Nfile = max((size + sizeperfile - 1) // sizeperfile, 1)
+        bb = ff.create(dataset, 'u1', size, Nfile)
+
+        # the index: (offset in the mesh, number of mesh elements,
+        # offset in the dataset, number of bytes) of each chunk
+        index = numpy.empty((len(chunks), 4), dtype='i8')
+        for i, (offset, n, data) in enumerate(chunks):
+            bb.write(start, numpy.frombuffer(data, dtype='u1'))
+            index[i] = offset, n, start, len(data)
+            start += len(data)
+
+        nchunks = comm.allreduce(len(chunks))
+        ichunk = numpy.sum(comm.allgather(len(chunks))[:comm.rank], dtype='i8')
+        with ff.create(dataset + '.index', ('i8', 4), nchunks, 1) as bi:
+            bi.write(ichunk, index)
+
+    if not codec.is_trivial:
+        codec.to_attrs(bb.attrs)
+    return bb
+
+def read_field(ff, dataset, field):
+    """
+    Read a field written by :func:`write_field` from a bigfile dataset,
+    slab by slab into the local data of ``field``.
+
+    Parameters
+    ----------
+    ff : bigfile.FileMPI
+        the file to read from
+    dataset : str
+        the name of the dataset
+    field : RealField, ComplexField
+        the field to read into
+    """
+    with ff[dataset] as ds:
+        codec = _MeshCodec.from_attrs(ds.attrs, ds.dtype)
+        assert field.pm.comm.allreduce(field.size) * codec.ncomp == ds.size or codec.compression is not None
+
+        if codec.compression is None:
+            for index, offset in _field_runs(field):
+                run = field.value[index]
+                if codec.is_trivial and run.flags['C_CONTIGUOUS'] and run.dtype == ds.dtype:
+                    # read directly into the field
+                    ds.read(offset, run.size, out=run.reshape(-1))
+                else:
+                    stored = ds.read(offset * codec.ncomp, run.size * codec.ncomp)
+                    run[...] = codec.decode(stored).reshape(run.shape)
+            return
+
+        with ff[dataset + '.index'] as bi:
+            index = bi[:]
+        index = index[numpy.argsort(index[:, 0])]
+
+        last = None
+        for ind, offset in _field_runs(field):
+            run = field.value[ind]
+            buf = numpy.empty(run.size, dtype=field.dtype)
+            # the chunks overlapping the run
+            first = numpy.searchsorted(index[:, 0], offset, side='right') - 1
+            i = max(first, 0)
+            while i < len(index) and index[i, 0] < offset + run.size:
+                coffset, n, start, nbytes = index[i]
+                if last is None or last[0] != i:
+                    last = i, codec.decode(codec.decompress(ds.read(start, nbytes).tobytes()))
+                lo = max(coffset, offset)
+                hi = min(coffset + n, offset + run.size)
+                if hi > lo:
+                    buf[lo - offset:hi - offset] = last[1][lo - coffset:hi - coffset]
+                i += 1
+            run[...] = buf.reshape(run.shape)
@@ -1,5 +1,6 @@
 from nbodykit.base.mesh import MeshSource
 from nbodykit import _global_options
+from nbodykit.utils import ExchangeColumns
 import numpy
 import logging
 import warnings
@@ -179,17 +180,65 @@ class CatalogMesh(MeshSource):
         See the :ref:`documentation <painting-mesh>` on painting for more
         details on painting catalogs to a mesh.
 
+        If the ``mesh_cache_dir`` option is set (see
+        :class:`~nbodykit.set_options`), the painted field is stored in a
+        :class:`~nbodykit.diskcache.MeshCache`, keyed by the dask graphs of
+        the columns and the paint parameters; a field painted before is
+        loaded from the cache instead of being painted again.
+
         Returns
         -------
         real : :class:`pmesh.pm.RealField`
             the painted real field; this has a ``attrs`` dict storing meta-data
         """
+        from nbodykit.diskcache import MeshCache
+
+        # painting into a given field cannot be cached
+        cache = MeshCache.get(comm=self.comm) if out is None else None
+        if cache is None:
+            return self._paint(out=out, normalize=normalize)
+
+        key = cache.key(*self._cache_token(normalize))
+        real = cache.load(key, self.pm)
+        if real is None:
+            real = self._paint(normalize=normalize)
+            cache.store(key, real)
+        return real
+
+    def _cache_token(self, normalize):
+        """
+        The arguments identifying the painted field in the mesh cache; the
+        same on all ranks.
+        """
+        from dask.base import tokenize
+
+        def token(column):
+            # the names of dask arrays are hashes of their graphs
+            if hasattr(column, 'dask'):
+                return (column.name, column.shape, str(column.dtype))
+            return column
+
+        columns = [self.Position, self.Weight, self.Value, self.Selection]
+        local = tokenize([token(column) for column in columns])
+
+        return (self.comm.allgather(local), [int(n) for n in self.pm.Nmesh], [float(L) for L in self.pm.BoxSize],
+                str(numpy.dtype(self.dtype)), self.resampler, self.interlaced, normalize)
+
+    def _paint(self, out=None, normalize=True):
+        """
+        Paint the density field; see :func:`to_real_field`.
+        """
+        from nbodykit.base.catalog import _compute_selected
 
         pm = self.pm
         Nlocal = 0 # (unweighted) number of particles read on local rank
         Wlocal = 0 # (weighted) number of particles read on local rank
         W2local = 0 # sum of weight square. This is used to estimate shotnoise.
 
+        # bytes read with and without selection pushdown
+        pushdown = _global_options['selection_pushdown'] and self.Selection is not None
+        iostat = numpy.zeros(2, dtype='i8')
+
         # the paint brush window
         resampler = window.methods[self.resampler]
 
@@ -241,10 +290,16 @@ class CatalogMesh(MeshSource):
                 if Selection is not None:
                     columns.append(Selection[s])
 
-                # be sure to use the source to compute
-                data = self.source.compute(columns)
+                if pushdown:
+                    # read only the selected rows of the file columns
+                    sel = Ellipsis
+                    data, nbytes, nbytes_full = _compute_selected(self.source, columns.pop(), columns)
+                    iostat[:] += (nbytes, nbytes_full)
+                else:
+                    # be sure to use the source to compute
+                    data = self.source.compute(columns)
+                    sel = Ellipsis if Selection is None else data.pop()
 
-                sel = Ellipsis if Selection is None else data.pop()
                 value = None      if Value is None else data.pop()[sel]
                 weight = None     if Weight is None else data.pop()[sel]
                 position = data.pop()[sel]
@@ -279,9 +334,7 @@ class CatalogMesh(MeshSource):
                     self.logger.info("Throttling chunksize as some ranks will receive too many particles. (%d > %d)" % (max(newlengths), max_chunksize * 2))
                 raise StopIteration
 
-            p = lay.exchange(position)
-            w = lay.exchange(weight)
-            v = lay.exchange(value)
+            p, w, v = ExchangeColumns(lay, position, weight, value)
 
             if not self.interlaced:
                 pm.paint(p, mass=w * v, resampler=resampler, hold=True, out=toret)
@@ -386,6 +439,12 @@ class CatalogMesh(MeshSource):
         toret.attrs['num_per_cell'] = nbar
 
         csum = toret.csum()
+        if pushdown:
+            nbytes, nbytes_full = pm.comm.allreduce(iostat)
+            if pm.comm.rank == 0 and nbytes_full > 0:
+                self.logger.info("selection pushdown read %d out of %d bytes (%.1f%% reduction)"
+                    % (nbytes, nbytes_full, 100. * (1 - 1. * nbytes / nbytes_full)))
+
         if pm.comm.rank == 0:
             self.logger.info("painted %d out of %d objects to mesh" %(N, self.source.csize))
             self.logger.info("mean particles per cell is %g", nbar)
@@ -78,6 +78,114 @@ def test_shotnoise(comm):
     assert_allclose(r1.attrs['shotnoise'], SN, rtol=1e-2)
     assert_allclose(r2.attrs['shotnoise'], SN, rtol=1e-2)
 
+@MPITest([1, 4])
+def test_paint_selection_pushdown(comm):
+
+    source = UniformCatalog(nbar=3e-4, BoxSize=512., seed=42, comm=comm)
+    source['Selection'] = source['Position'][:, 2] < 128.
+
+    mesh = source.to_mesh(resampler='cic', Nmesh=32)
+
+    r1 = mesh.compute()
+    with set_options(selection_pushdown=True):
+        r2 = mesh.compute()
+
+    assert_allclose(r1, r2)
+    assert r1.attrs['N'] == r2.attrs['N']
+
+@MPITest([1, 4])
+def test_paint_selection_pushdown_file(comm):
+    import tempfile
+    import os
+
+    # fake structured array, the same on all ranks
+    rng = numpy.random.RandomState(42)
+    dset = numpy.empty(4096, dtype=[('Position', ('f8', 3)), ('Mass', 'f8')])
+    dset['Position'] = rng.uniform(0, 512., size=(4096, 3))
+    dset['Mass'] = rng.random_sample(size=4096)
+
+    if comm.rank == 0:
+        tmpfile = tempfile.mkstemp()[1]
+        with open(tmpfile, 'wb') as ff:
+            dset['Position'].tofile(ff)
+            dset['Mass'].tofile(ff)
+    else:
+        tmpfile = None
+    tmpfile = comm.bcast(tmpfile)
+
+    source = BinaryCatalog(tmpfile, dset.dtype, comm=comm)
+    source['Selection'] = source['Mass'] < 0.2
+
+    # count the rows read directly from the file
+    nrows = []
+    read_rows = source.read_rows
+    def counting_read_rows(col, index):
+        nrows.append(len(index))
+        return read_rows(col, index)
+    source.read_rows = counting_read_rows
+
+    mesh = source.to_mesh(resampler='cic', Nmesh=32, BoxSize=512., weight='Mass')
+
+    r1 = mesh.compute()
+    assert sum(nrows) == 0
+    with set_options(selection_pushdown=True):
+        r2 = mesh.compute()
+
+    assert_allclose(r1, r2)
+    assert r1.attrs['N'] == r2.attrs['N']
+    assert_allclose(r1.attrs['W'], r2.attrs['W'])
+
+    # the positions and the weights of the selected rows only
+    local = dset[source._lstart:source._lend]
+    assert sum(nrows) == 2 * (local['Mass'] < 0.2).sum()
+
+    comm.barrier()
+    if comm.rank == 0:
+        os.unlink(tmpfile)
+
+@MPITest([1, 4])
+def test_paint_cache(comm):
+    import tempfile
+    import shutil
+    from nbodykit.diskcache import MeshCache
+
+    if comm.rank == 0:
+        path = tempfile.mkdtemp()
+    else:
+        path = None
+    path = comm.bcast(path)
+
+    source = UniformCatalog(nbar=3e-4, BoxSize=512., seed=42, comm=comm)
+    mesh = source.to_mesh(resampler='cic', Nmesh=32, compensated=True)
+    r0 = mesh.compute()
+
+    with set_options(mesh_cache_dir=path):
+        # miss, then hit
+        r1 = mesh.compute()
+        cache = MeshCache.get(comm=comm)
+        assert len(cache.entries()) == 1
+        r2 = mesh.compute()
+        assert len(cache.entries()) == 1
+
+        # a new mesh of the same catalog hits too
+        mesh2 = source.to_mesh(resampler='cic', Nmesh=32, compensated=True)
+        r3 = mesh2.compute(mode='complex')
+
+        # a different resampler is a different entry
+        mesh3 = source.to_mesh(resampler='tsc', Nmesh=32)
+        mesh3.compute()
+        assert len(cache.entries()) == 2
+
+    assert_allclose(r0, r1)
+    assert_allclose(r0, r2)
+    assert_allclose(r0.r2c(), r3)
+    for key in ['N', 'W', 'shotnoise', 'num_per_cell']:
+        assert_allclose(r2.attrs[key], r0.attrs[key])
+
+    comm.barrier()
+    if comm.rank == 0:
+        shutil.rmtree(path)
+
 @MPITest([1])
 def test_cic_interlacing(comm):
 
@@ -1,4 +1,5 @@
-from nbodykit import GlobalCache
+from nbodykit import GlobalCache, set_options
+from numpy.testing import assert_array_equal
 from nbodykit.lab import UniformCatalog
 
 from runtests.mpi import MPITest
@@ -19,3 +20,108 @@ def test_cache(comm):
     cache.cache.shrink()
 
     assert cache.cache.total_bytes < 100
+
+@MPITest([1, 4])
+def test_cache_report(comm):
+    cache = GlobalCache.get()
+    cache.cache.clear()
+    cache.cache.resize(1e8)
+
+    cat = UniformCatalog(nbar=10000, BoxSize=1.0, seed=42, comm=comm)
+    cat['test'] = cat['Position'] ** 5
+    cat['test'].compute()
+    cat['test'].compute()
+
+    report = cache.report(comm=comm)
+    assert report['entries'] > 0
+    assert report['hits'] > 0
+    assert report['misses'] > 0
+    assert report['nbytes'] == comm.allreduce(sum(cache.usage().values()))
+    assert len(report['largest']) > 0
+
+@MPITest([1])
+def test_cache_misses(comm):
+    import numpy
+    from dask.local import get_sync
+    cache = GlobalCache.get()
+    cache.cache.clear()
+    cache.cache.resize(1e8)
+
+    # the literal and the alias are not looked up in the cache
+    dsk = {'a': numpy.ones(10), 'b': (numpy.cumsum, 'a'), 'c': 'b', 'd': (numpy.sum, 'c')}
+
+    # a miss for each task
+    stats = dict(cache.cache.stats)
+    assert get_sync(dsk, 'd') == 55
+    assert cache.cache.stats['misses'] - stats['misses'] == 2
+    assert cache.cache.stats['hits'] == stats['hits']
+
+    # then no more misses
+    stats = dict(cache.cache.stats)
+    assert get_sync(dsk, 'd') == 55
+    assert cache.cache.stats['misses'] == stats['misses']
+    assert cache.cache.stats['hits'] > stats['hits']
+
+@MPITest([1])
+def test_cache_pin(comm):
+    import gc
+    cache = GlobalCache.get()
+    cache.cache.clear()
+    cache.cache.resize(1e8)
+
+    cat = UniformCatalog(nbar=10000, BoxSize=1.0, seed=42, comm=comm)
+    cat['test'] = cat['Position'] ** 5
+    cat.pin(['test'])
+    keys = set(cache.cache.pinned)
+    assert len(keys) > 0
+
+    cat['test'].compute()
+    assert all(key in cache.cache for key in keys)
+
+    # pinned keys survive shrinking the cache
+    with set_options(global_cache_size=100):
+        assert all(key in cache.cache for key in keys)
+        assert cache.report(comm=comm)['pinned_bytes'] > 0
+
+    # a copy pins the same keys, which stay pinned while either is alive
+    cat2 = cat.copy()
+    cat2.pin(['test'])
+    assert set(cache.cache.pinned) == keys
+    del cat
+    gc.collect()
+    assert set(cache.cache.pinned) == keys
+
+    # unpinned at the end of the lifetime of the catalogs, without
+    # evicting from the garbage collector
+    with set_options(global_cache_size=100):
+        del cat2
+        gc.collect()
+        assert not any(key in cache.cache.pinned for key in keys)
+        assert all(key in cache.cache for key in keys)
+
+@MPITest([1])
+def test_cache_spill(comm):
+    import tempfile
+    import shutil
+    cache = GlobalCache.get()
+    cache.cache.clear()
+    cache.cache.resize(1e8)
+
+    path = tempfile.mkdtemp()
+    cat = UniformCatalog(nbar=10000, BoxSize=1.0, seed=42, comm=comm)
+    cat['test'] = cat['Position'] ** 5
+    test = cat['test'].compute()
+
+    with set_options(global_cache_spill_dir=path):
+        # evict everything to the spill area
+        with set_options(global_cache_size=100):
+            assert cache.cache.total_bytes < 100
+            assert len(cache.cache.spilled) > 0
+
+            # recomputing reads the spilled arrays
+            assert_array_equal(cat['test'].compute(), test)
+            assert cache.report(comm=comm)['spill_hits'] > 0
+
+    cache.cache.clear()
+    assert len(cache.cache.spilled) == 0
+    shutil.rmtree(path)
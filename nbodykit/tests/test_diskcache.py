@@ -0,0 +1,112 @@
+from runtests.mpi import MPITest
+from nbodykit.lab import *
+from nbodykit import set_options
+from nbodykit.diskcache import ColumnCache, PairCountCache
+from numpy.testing import assert_array_equal
+import tempfile
+import shutil
+import numpy
+import os
+
+def make_cache_dir(comm):
+    if comm.rank == 0:
+        path = tempfile.mkdtemp()
+    else:
+        path = None
+    return comm.bcast(path)
+
+def remove_cache_dir(comm, path):
+    comm.barrier()
+    if comm.rank == 0:
+        shutil.rmtree(path)
+
+@MPITest([1, 4])
+def test_checkpoint(comm):
+    path = make_cache_dir(comm)
+
+    cat = UniformCatalog(nbar=1000, BoxSize=1.0, seed=42, comm=comm)
+    cat['Mass'] = (cat['Position'] ** 2).sum(axis=-1)
+    mass = cat['Mass'].compute()
+
+    with set_options(column_cache_dir=path):
+        c1 = cat.checkpoint(['Mass', 'Selection'])
+        assert_array_equal(c1['Mass'].compute(), mass)
+
+        cache = ColumnCache.get()
+        key = cache.key(cat['Mass'])
+        assert key in cache
+        mtime = os.path.getmtime(cache.filename(key))
+
+        # the same column built again hits the cache
+        cat2 = UniformCatalog(nbar=1000, BoxSize=1.0, seed=42, comm=comm)
+        cat2['Mass'] = (cat2['Position'] ** 2).sum(axis=-1)
+        assert cache.key(cat2['Mass']) == key
+        c2 = cat2.checkpoint(['Mass'])
+        assert os.path.getmtime(cache.filename(key)) >= mtime
+        assert_array_equal(c2['Mass'].compute(), mass)
+
+        # derived columns keep the same names
+        assert (c2['Mass'] * 2).name == (cat2['Mass'] * 2).name
+
+        # a different column is a different entry
+        cat2['Mass'] = cat2['Mass'] * 2
+        assert cache.key(cat2['Mass']) != key
+
+    comm.barrier()
+    cache.invalidate()
+    assert key not in cache
+
+    remove_cache_dir(comm, path)
+
+@MPITest([1])
+def test_evict(comm):
+    path = make_cache_dir(comm)
+
+    cache = ColumnCache(path, max_size=2.5 * 8 * 1000)
+    cat = UniformCatalog(nbar=1000, BoxSize=1.0, seed=42, comm=comm)
+    cat = cat[:1000]
+
+    keys = []
+    for i in range(3):
+        array = cat['Position'][:, 0] + i
+        cache.checkpoint(array)
+        keys.append(cache.key(array))
+
+    # the least recently used entry is evicted
+    assert keys[0] not in cache
+    assert keys[1] in cache
+    assert keys[2] in cache
+    assert cache.size <= cache.max_size
+
+    remove_cache_dir(comm, path)
+
+class _Result(object):
+    def __init__(self, state):
+        self.state = state
+
+    def __getstate__(self):
+        return self.state
+
+    def __setstate__(self, state):
+        self.state = state
+
+@MPITest([1, 4])
+def test_paircount_store(comm):
+    path = make_cache_dir(comm)
+
+    cache = PairCountCache(path, comm=comm)
+    key = cache.key('randoms', [0., 1., 2.])
+    assert cache.load(key, _Result) is None
+
+    cache.store(key, _Result({'pairs': [1, 2]}))
+    result = cache.load(key, _Result)
+    assert result.state == {'pairs': [1, 2]}
+
+    # an entry that cannot be serialized is not stored, on any rank
+    key2 = cache.key('randoms', [0., 1.])
+    cache.store(key2, _Result({'pairs': object()}))
+    assert cache.load(key2, _Result) is None
+    assert len(cache.entries()) == 1
+    assert len(os.listdir(path)) == 1
+
+    remove_cache_dir(comm, path)
@@ -70,6 +70,44 @@ def test_gather_array(comm):
     assert len(data1) == 10 * comm.size
 
 
+@MPITest([1, 4])
+def test_gather_scatter_rounds(comm):
+    from nbodykit import utils
+
+    # uneven structured data, with the fields in a different order on each rank
+    N = 10 + 7 * comm.rank
+    start = sum(10 + 7 * r for r in range(comm.rank))
+    fields = [('a', 'i8'), ('b', ('f4', 3))]
+    data = numpy.empty(N, dtype=fields if comm.rank % 2 == 0 else fields[::-1])
+    data['a'] = numpy.arange(start, start + N)
+    data['b'] = data['a'][:, None]
+
+    # split the transfers into messages of three items
+    maxbytes = utils._max_message_bytes
+    utils._max_message_bytes = 3 * data.dtype.itemsize
+    try:
+        alldata = GatherArray(data, comm, root=Ellipsis)
+        assert_array_equal(alldata['a'], numpy.arange(len(alldata)))
+        assert_array_equal(alldata['b'], alldata['a'][:, None] * numpy.ones(3))
+
+        rootdata = GatherArray(data, comm, root=comm.size - 1)
+        if comm.rank == comm.size - 1:
+            assert_array_equal(rootdata, alldata)
+        else:
+            assert rootdata is None
+
+        # scatter back from the last rank
+        counts = comm.allgather(N)
+        back = ScatterArray(rootdata, comm, root=comm.size - 1, counts=counts)
+        assert_array_equal(back['a'], data['a'])
+        assert_array_equal(back['b'], data['b'])
+
+        even = ScatterArray(rootdata, comm, root=comm.size - 1)
+        assert_array_equal(numpy.concatenate(comm.allgather(even['a'])), alldata['a'])
+    finally:
+        utils._max_message_bytes = maxbytes
+
+
 @MPITest([2])
 def test_gather_objects(comm):
 
@@ -154,6 +192,9 @@ def test_gather_bad_shape(comm):
     with pytest.raises(ValueError):
         data = GatherArray(data, comm, root=Ellipsis)
 
+    with pytest.raises(ValueError):
+        data = GatherArray(data, comm, root=1)
+
 @MPITest([2])
 def test_gather_list(comm):
 
@@ -180,6 +221,14 @@ def test_scatter_list(comm):
     with pytest.raises(ValueError):
         data = ScatterArray(data, comm, root=0)
 
+    # nor from another root
+    if comm.rank == 1:
+        data = list(numpy.ones(10, dtype=[('a', 'f')]))
+    else:
+        data = None
+    with pytest.raises(ValueError):
+        data = ScatterArray(data, comm, root=1)
+
 
 @MPITest([2])
 def test_scatter_wrong_counts(comm):
@@ -337,3 +386,99 @@ def test_distributed_array_bincount_gaps(comm):
     assert_array_equal( numpy.concatenate(comm.allgather(N.local)),
         [1, 1, 0, 4, 0, 2])
 
+
+@MPITest([1, 4])
+def test_data_stats_cached(comm):
+    from nbodykit.utils import get_data_stats, get_data_bounds, _data_stats_cache
+    from nbodykit import set_options
+    import tempfile
+    import shutil
+
+    # count the evaluations of the column
+    calls = []
+    def record(x):
+        calls.append(len(x))
+        return x
+
+    source = UniformCatalog(nbar=2e-4, BoxSize=512., seed=42, comm=comm)
+    pos = source['Position'].map_blocks(record, dtype='f8')
+    sel = source['Position'][:, 0] < 256.
+
+    stats = get_data_stats(pos, comm, selection=sel)
+    data = numpy.concatenate(comm.allgather(source.compute(source['Position'][sel])), axis=0)
+    assert stats['count'] == len(data)
+    assert_array_equal(stats['min'], data.min(axis=0))
+    assert_array_equal(stats['max'], data.max(axis=0))
+    numpy.testing.assert_allclose(stats['sum'], data.sum(axis=0))
+
+    # the bounds of the same column are free
+    ncalls = len(calls)
+    pmin, pmax = get_data_bounds(pos, comm, selection=sel)
+    assert len(calls) == ncalls
+    assert_array_equal(pmin, stats['min'])
+
+    # and are found in the on-disk cache by a new run
+    path = comm.bcast(tempfile.mkdtemp() if comm.rank == 0 else None)
+    with set_options(column_cache_dir=path):
+        get_data_stats(pos, comm, selection=sel)
+        _data_stats_cache.clear()
+        pmin, pmax = get_data_bounds(pos, comm, selection=sel)
+    assert len(calls) == ncalls
+    assert_array_equal(pmax, stats['max'])
+
+    # the in-memory cache can be disabled
+    with set_options(data_stats_cache_size=0):
+        assert len(_data_stats_cache) == 0
+        pmin, pmax = get_data_bounds(pos, comm, selection=sel)
+        assert len(_data_stats_cache) == 0
+    assert_array_equal(pmin, stats['min'])
+
+    comm.barrier()
+    if comm.rank == 0:
+        shutil.rmtree(path)
+
+@MPITest([1, 4])
+def test_exchange_columns(comm):
+    from pmesh.domain import GridND
+    from nbodykit.utils import ExchangeColumns, split_size_3d
+
+    numpy.random.seed(42 + comm.rank)
+    pos = numpy.random.uniform(size=(1000, 3))
+    mass = numpy.random.uniform(size=1000)
+    pid = numpy.arange(1000, dtype='i8') + 1000 * comm.rank
+
+    edges = [numpy.linspace(0, 1, n + 1, endpoint=True) for n in split_size_3d(comm.size)]
+    domain = GridND(edges, comm=comm)
+    layout = domain.decompose(pos, smoothing=0.1)
+
+    # a single exchange gives the same as exchanging each column
+    pos1, mass1, pid1 = ExchangeColumns(layout, pos, mass, pid)
+    assert_array_equal(pos1, layout.exchange(pos))
+    assert_array_equal(mass1, layout.exchange(mass))
+    assert_array_equal(pid1, layout.exchange(pid))
+
+    # the columns are contiguous
+    for column in [pos1, mass1, pid1]:
+        assert column.flags['C_CONTIGUOUS']
+
+    with pytest.raises(ValueError):
+        ExchangeColumns(layout, pos, mass[:10])
+
+@MPITest([1, 4])
+def test_affinity_nthreads(comm):
+    from nbodykit.utils import affinity_nthreads
+    from mpi4py import MPI
+
+    if hasattr(os, 'sched_getaffinity'):
+        cpus = set(os.sched_getaffinity(0))
+    else:
+        import multiprocessing
+        cpus = set(range(multiprocessing.cpu_count()))
+
+    # the ranks of a node never get more threads than their cores
+    nthreads = affinity_nthreads(comm)
+    assert 1 <= nthreads <= len(cpus)
+    node = comm.Split_type(MPI.COMM_TYPE_SHARED)
+    allcpus = set().union(*node.allgather(cpus))
+    assert node.allreduce(nthreads) <= max(len(allcpus), node.size)
+    node.Free()
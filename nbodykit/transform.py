@@ -1,5 +1,6 @@
 import numpy
 import dask.array as da
+from dask.base import tokenize
 from six import string_types
 from nbodykit.utils import deprecate
 from nbodykit import _global_options
@@ -105,7 +106,9 @@ def ConstantArray(value, size, chunks=100000):
     """
     ele = numpy.array(value)
     toret = numpy.lib.stride_tricks.as_strided(ele, [size] + list(ele.shape), [0] + list(ele.strides))
-    return da.from_array(toret, chunks=chunks, name=False)
+    # a deterministic name, without hashing the broadcast array
+    name = 'constant-' + tokenize(ele, size, chunks)
+    return da.from_array(toret, chunks=chunks, name=name)
 
 
 def CartesianToEquatorial(pos, observer=[0,0,0], frame='icrs'):
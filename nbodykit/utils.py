@@ -4,6 +4,7 @@ import warnings
 import functools
 import contextlib
 import os, sys
+from collections import OrderedDict
 
 def is_structured_array(arr):
     """
@@ -15,12 +16,12 @@ def is_structured_array(arr):
     return arr.dtype.char ==  'V'
 
 def get_data_bounds(data, comm, selection=None):
-
     """
     Return the global minimum/maximum of a numpy/dask array along the
     first axis.
 
-    This is computed in chunks to avoid memory errors on large data.
+    This is computed in chunks to avoid memory errors on large data;
+    see :func:`get_data_stats`, whose cached statistics are reused.
 
     Parameters
     ----------
@@ -28,17 +29,119 @@ def get_data_bounds(data, comm, selection=None):
         the data to find the bounds of
     comm :
         the MPI communicator
+    selection : array_like, optional
+        if given, only consider the rows where ``selection`` is ``True``
 
     Returns
     -------
     min, max :
         the min/max of ``data``
     """
+    stats = get_data_stats(data, comm, selection=selection)
+    return stats['min'], stats['max']
+
+# the summary statistics of recently used columns, by name; the number
+# kept is the ``data_stats_cache_size`` option
+_data_stats_cache = OrderedDict()
+
+def _trim_data_stats_cache():
+    from nbodykit import _global_options
+    while len(_data_stats_cache) > _global_options['data_stats_cache_size']:
+        _data_stats_cache.popitem(last=False)
+
+def get_data_stats(data, comm, selection=None):
+    """
+    Return the global summary statistics of a numpy/dask array along the
+    first axis.
+
+    The statistics of dask arrays are cached by the names of ``data`` and
+    ``selection`` on all ranks, i.e., by their dask graphs, such that
+    finding the bounds of the same column again (e.g. of randoms shared
+    by several :class:`~nbodykit.algorithms.convpower.catalog.FKPCatalog`)
+    is free. The number of statistics kept in memory is set by the
+    ``data_stats_cache_size`` option. If the ``column_cache_dir`` option
+    is set, the statistics are also stored in the on-disk column cache,
+    and reused by later runs.
+
+    Parameters
+    ----------
+    data : numpy.ndarray or dask.array.Array
+        the data to summarize
+    comm :
+        the MPI communicator
+    selection : array_like, optional
+        if given, only consider the rows where ``selection`` is ``True``
+
+    Returns
+    -------
+    stats : dict
+        the ``min``, ``max`` and ``sum`` of ``data`` along the first axis,
+        and the number of selected rows, ``count``
+    """
     import dask.array as da
+    from dask.base import tokenize
+    from nbodykit import _global_options
+    from nbodykit.diskcache import ColumnCache
+
+    # the key of the statistics, the same on all ranks
+    key = None
+    if isinstance(data, da.Array) and (selection is None or isinstance(selection, da.Array)):
+        names = comm.allgather((data.name, getattr(selection, 'name', None)))
+        key = 'stats-%s.npz' % tokenize(names)
+
+    if key is not None:
+        stats = _data_stats_cache.get(key)
+
+        # look into the on-disk cache
+        cache = None
+        if _global_options['column_cache_dir'] is not None:
+            cache = ColumnCache.get()
+        if stats is None and cache is not None:
+            stats = comm.bcast(cache.load_stats(key) if comm.rank == 0 else None)
+
+        # all ranks must agree, as computing the statistics is collective
+        if comm.allreduce(stats is not None, op=MPI.LAND):
+            # the most recently used statistics are last
+            _data_stats_cache.pop(key, None)
+            _data_stats_cache[key] = stats
+            _trim_data_stats_cache()
+            return _copy_stats(stats)
+
+    stats = _compute_data_stats(data, comm, selection=selection)
+
+    if key is not None:
+        _data_stats_cache[key] = stats
+        _trim_data_stats_cache()
+        if cache is not None and comm.rank == 0:
+            cache.store_stats(key, stats)
+
+    return _copy_stats(stats)
+
+def _copy_stats(stats):
+    # the cached arrays are not to be modified by the caller
+    toret = dict((name, numpy.array(stats[name], copy=True)) for name in stats)
+    toret['count'] = int(toret['count'])
+    return toret
+
+def _compute_data_stats(data, comm, selection=None):
+    """
+    Compute the statistics of :func:`get_data_stats` in a single pass.
+    """
+    import dask.array as da
+    from nbodykit import _global_options
+    from nbodykit.base.catalog import ColumnAccessor, _compute_selected
 
-    # local min/max on this rank
+    # local statistics on this rank
     dmin = numpy.ones(data.shape[1:]) * (numpy.inf)
     dmax = numpy.ones_like(dmin) * (-numpy.inf)
+    dsum = numpy.zeros_like(dmin)
+    count = 0
+
+    # read only the selected rows of data, if possible
+    pushdown = (_global_options['selection_pushdown']
+                and isinstance(data, ColumnAccessor)
+                and isinstance(selection, da.Array))
+    iostat = numpy.zeros(2, dtype='i8')
 
     # max size
     Nlocalmax = max(comm.allgather(len(data)))
@@ -48,32 +151,46 @@ def get_data_bounds(data, comm, selection=None):
     for i in range(0, Nlocalmax, chunksize):
         s = slice(i, i + chunksize)
 
-        if len(data) != 0:
+        if len(data) == 0:
+            continue
 
-            # selection has to be computed many times when data is `large`.
-            if selection is not None:
-                sel = selection[s]
-                if isinstance(selection, da.Array):
-                    sel = sel.compute()
-
-            # be sure to use the source to compute
+        if pushdown:
+            (d,), nbytes, nbytes_full = _compute_selected(data.catalog, selection[s], [data[s]])
+            iostat[:] += (nbytes, nbytes_full)
+        else:
+            # compute the data and the selection together, sharing
+            # their common tasks
             d = data[s]
-            if isinstance(data, da.Array):
-                d = d.compute()
+            sel = selection[s] if selection is not None else None
+            if isinstance(data, ColumnAccessor):
+                d, sel = data.catalog.compute(d, sel)
+            else:
+                d, sel = da.compute(d, sel)
 
             # select
-            if selection is not None:
+            if sel is not None:
                 d = d[sel]
 
-            # update min/max on this rank
-            dmin = numpy.min([d.min(axis=0), dmin], axis=0)
-            dmax = numpy.max([d.max(axis=0), dmax], axis=0)
-
-    # global min/max across all ranks
-    dmin = numpy.asarray(comm.allgather(dmin)).min(axis=0)
-    dmax = numpy.asarray(comm.allgather(dmax)).max(axis=0)
-
-    return dmin, dmax
+        # update the statistics on this rank
+        dmin = numpy.min([d.min(axis=0, initial=numpy.inf), dmin], axis=0)
+        dmax = numpy.max([d.max(axis=0, initial=-numpy.inf), dmax], axis=0)
+        dsum += d.sum(axis=0)
+        count += len(d)
+
+    if pushdown:
+        nbytes, nbytes_full = comm.allreduce(iostat)
+        if comm.rank == 0 and nbytes_full > 0:
+            data.catalog.logger.info(
+                "selection pushdown read %d out of %d bytes (%.1f%% reduction)"
+                % (nbytes, nbytes_full, 100. * (1 - 1. * nbytes / nbytes_full)))
+
+    # global statistics across all ranks
+    stats = {}
+    stats['min'] = numpy.asarray(comm.allgather(dmin)).min(axis=0)
+    stats['max'] = numpy.asarray(comm.allgather(dmax)).max(axis=0)
+    stats['sum'] = comm.allreduce(dsum)
+    stats['count'] = comm.allreduce(count)
+    return stats
 
 def split_size_3d(s):
     """
@@ -106,6 +223,50 @@ def split_size_3d(s):
     c = s
     return a, b, c
 
+def affinity_nthreads(comm):
+    """
+    The number of threads each rank can run without oversubscribing the
+    cores of its node, from the CPU affinity of the ranks.
+
+    The CPUs a rank may run on are shared evenly between the ranks of the
+    same node that may run on them, such that a rank bound to a single
+    core gets one thread, and a rank bound to a socket, as in a hybrid
+    MPI + OpenMP layout, gets one thread per core of the socket.
+
+    This is a **collective** operation.
+
+    Parameters
+    ----------
+    comm :
+        the MPI communicator
+
+    Returns
+    -------
+    nthreads : int
+        the number of threads of this rank, at least one
+    """
+    import multiprocessing
+
+    if hasattr(os, 'sched_getaffinity'):
+        cpus = set(os.sched_getaffinity(0))
+    else:
+        # all of the CPUs; os.cpu_count() is not on Python 2
+        try:
+            cpus = set(range(multiprocessing.cpu_count()))
+        except NotImplementedError:
+            cpus = set([0])
+
+    # the ranks on the same node
+    node = comm.Split_type(MPI.COMM_TYPE_SHARED)
+    try:
+        allcpus = node.allgather(cpus)
+    finally:
+        node.Free()
+
+    # the number of ranks sharing each CPU of this rank
+    share = sum(1. / sum(cpu in other for other in allcpus) for cpu in cpus)
+    return max(1, int(share))
+
 def deprecate(name, alternative, alt_name=None):
     """
     This is a decorator which can be used to mark functions
@@ -120,12 +281,32 @@ def deprecate(name, alternative, alt_name=None):
         return alternative(*args, **kwargs)
     return wrapper
 
+# the largest message sent by GatherArray and ScatterArray, in bytes;
+# larger transfers are split into several rounds
+_max_message_bytes = 1024 ** 3
+
+def _message_rounds(counts, itemsize):
+    # the number of items per message, and the number of rounds needed
+    # to send up to ``counts`` items from any rank
+    chunk = max(1, _max_message_bytes // max(itemsize, 1))
+    nrounds = -(-int(max(counts)) // chunk)
+    return chunk, nrounds
+
+def _log_throughput(name, nbytes, nrounds, elapsed):
+    import logging
+    logging.getLogger(name).debug("transferred %d bytes in %d round(s) in %.3f s (%.1f MB/s)"
+            % (nbytes, nrounds, elapsed, nbytes / 1024. ** 2 / max(elapsed, 1e-9)))
+
 def GatherArray(data, comm, root=0):
     """
     Gather the input data array from all ranks to the specified ``root``.
 
-    This uses `Gatherv`, which avoids mpi4py pickling, and also
-    avoids the 2 GB mpi4py limit for bytes using a custom datatype
+    This uses non-blocking ``Igatherv``, which avoids mpi4py pickling.
+    The items, including all fields of structured arrays, are sent as
+    records of a single custom datatype, and transfers larger than
+    ``_max_message_bytes`` are split into several rounds, which avoids
+    the 2 GB limit on the size of MPI messages. The throughput is
+    logged at the debug level.
 
     Parameters
     ----------
@@ -135,7 +316,9 @@ def GatherArray(data, comm, root=0):
         the MPI communicator
     root : int, or Ellipsis
         the rank number to gather the data to. If root is Ellipsis,
-        broadcast the result to all ranks.
+        broadcast the result to all ranks; the data is then gathered to
+        the first rank and broadcast with ``Ibcast``, which MPI runs
+        along a tree, rather than with a ring-like ``Allgatherv``
 
     Returns
     -------
@@ -166,23 +349,13 @@ def GatherArray(data, comm, root=0):
         if any(dtypes[0][name] == 'O' for name in dtypes[0].names):
             raise ValueError("object data types ('O') not allowed in structured data in GatherArray")
 
-        # compute the new shape for each rank
-        newlength = comm.allreduce(local_length)
-        newshape = list(data.shape)
-        newshape[0] = newlength
-
-        # the return array
-        if root is Ellipsis or comm.rank == root:
-            recvbuffer = numpy.empty(newshape, dtype=dtypes[0], order='C')
-        else:
-            recvbuffer = None
-
-        for name in dtypes[0].names:
-            d = GatherArray(data[name], comm, root=root)
-            if root is Ellipsis or comm.rank == root:
-                recvbuffer[name] = d
-
-        return recvbuffer
+        # the fields are sent together, so reorder them as on the first rank
+        if data.dtype != dtypes[0] and all(data.dtype[name] == dtypes[0][name] for name in names):
+            packed = numpy.empty(data.shape, dtype=dtypes[0])
+            for name in names:
+                packed[name] = data[name]
+            data = packed
+        dtypes = comm.allgather(data.dtype)
 
     # check for 'O' data types
     if dtypes[0] == 'O':
@@ -195,7 +368,7 @@ def GatherArray(data, comm, root=0):
     else:
         bad_shape = None; bad_dtype = None
 
-    bad_shape, bad_dtype = comm.bcast((bad_shape, bad_dtype))
+    bad_shape, bad_dtype = comm.bcast((bad_shape, bad_dtype), root=0 if root is Ellipsis else root)
 
     if bad_shape:
         raise ValueError("mismatch between shape[1:] across ranks in GatherArray")
@@ -230,14 +403,32 @@ def GatherArray(data, comm, root=0):
     offsets = numpy.zeros_like(counts, order='C')
     offsets[1:] = counts.cumsum()[:-1]
 
-    # gather to root
+    # gather to root, in rounds of at most chunk items per rank
+    target = 0 if root is Ellipsis else root
+    chunk, nrounds = _message_rounds(counts, itemsize)
+    start = MPI.Wtime()
+
+    requests = []
+    for i in range(nrounds):
+        first = i * chunk
+        sendbuf = data[first:first + chunk]
+        roundcounts = numpy.clip(counts - first, 0, chunk)
+        requests.append(comm.Igatherv([sendbuf, dt],
+                        [recvbuffer, (roundcounts, offsets + first), dt], root=target))
+    MPI.Request.Waitall(requests)
+
+    # broadcast to all ranks, in rounds of at most chunk items
     if root is Ellipsis:
-        comm.Allgatherv([data, dt], [recvbuffer, (counts, offsets), dt])
-    else:
-        comm.Gatherv([data, dt], [recvbuffer, (counts, offsets), dt], root=root)
+        requests = []
+        for first in range(0, newlength, chunk):
+            requests.append(comm.Ibcast([recvbuffer[first:first + chunk], dt], root=0))
+        MPI.Request.Waitall(requests)
 
     dt.Free()
 
+    if comm.rank == target:
+        _log_throughput('GatherArray', newlength * itemsize, nrounds, MPI.Wtime() - start)
+
     return recvbuffer
 
 def ScatterArray(data, comm, root=0, counts=None):
@@ -245,8 +436,12 @@ def ScatterArray(data, comm, root=0, counts=None):
     Scatter the input data array across all ranks, assuming `data` is
     initially only on `root` (and `None` on other ranks).
 
-    This uses ``Scatterv``, which avoids mpi4py pickling, and also
-    avoids the 2 GB mpi4py limit for bytes using a custom datatype
+    This uses non-blocking ``Iscatterv``, which avoids mpi4py pickling.
+    The items, including all fields of structured arrays, are sent as
+    records of a single custom datatype, and transfers larger than
+    ``_max_message_bytes`` are split into several rounds, which avoids
+    the 2 GB limit on the size of MPI messages. The throughput is
+    logged at the debug level.
 
     Parameters
     ----------
@@ -264,8 +459,6 @@ def ScatterArray(data, comm, root=0, counts=None):
     recvbuffer : array_like
         the chunk of `data` that each rank gets
     """
-    import logging
-
     if counts is not None:
         counts = numpy.asarray(counts, order='C')
         if len(counts) != comm.size:
@@ -276,11 +469,11 @@ def ScatterArray(data, comm, root=0, counts=None):
         bad_input = not isinstance(data, numpy.ndarray)
     else:
         bad_input = None
-    bad_input = comm.bcast(bad_input)
+    bad_input = comm.bcast(bad_input, root=root)
     if bad_input:
         raise ValueError("`data` must by numpy array on root in ScatterArray")
 
-    if comm.rank == 0:
+    if comm.rank == root:
         # need C-contiguous order
         if not data.flags['C_CONTIGUOUS']:
             data = numpy.ascontiguousarray(data)
@@ -289,7 +482,7 @@ def ScatterArray(data, comm, root=0, counts=None):
         shape_and_dtype = None
 
     # each rank needs shape/dtype of input data
-    shape, dtype = comm.bcast(shape_and_dtype)
+    shape, dtype = comm.bcast(shape_and_dtype, root=root)
 
     # object dtype is not supported
     fail = False
@@ -336,12 +529,125 @@ def ScatterArray(data, comm, root=0, counts=None):
     offsets = numpy.zeros_like(counts, order='C')
     offsets[1:] = counts.cumsum()[:-1]
 
-    # do the scatter
-    comm.Barrier()
-    comm.Scatterv([data, (counts, offsets), dt], [recvbuffer, dt])
+    # do the scatter, in rounds of at most chunk items per rank
+    chunk, nrounds = _message_rounds(counts, itemsize)
+    start = MPI.Wtime()
+
+    requests = []
+    for i in range(nrounds):
+        first = i * chunk
+        roundcounts = numpy.clip(counts - first, 0, chunk)
+        requests.append(comm.Iscatterv([data, (roundcounts, offsets + first), dt],
+                        [recvbuffer[first:first + chunk], dt], root=root))
+    MPI.Request.Waitall(requests)
     dt.Free()
+
+    if comm.rank == root:
+        _log_throughput('ScatterArray', shape[0] * itemsize, nrounds, MPI.Wtime() - start)
+
     return recvbuffer
 
+def ExchangeArray(data, dest, comm):
+    """
+    Send each item of the input data array to the specified rank.
+
+    This uses ``Alltoallv``, which avoids mpi4py pickling, and also
+    avoids the 2 GB mpi4py limit for bytes using a custom datatype
+
+    Parameters
+    ----------
+    data : array_like
+        the data on each rank to exchange; structured arrays are sent as
+        a whole
+    dest : array_like
+        the rank to send each item of ``data`` to
+    comm : MPI communicator
+        the MPI communicator
+
+    Returns
+    -------
+    recvbuffer : array_like
+        the items sent to this rank, ordered by the sending rank, and then
+        by the order in ``data`` on the sending rank
+    """
+    if not isinstance(data, numpy.ndarray):
+        raise ValueError("`data` must by numpy array in ExchangeArray")
+
+    dest = numpy.asarray(dest, dtype='intp')
+    if dest.shape != data.shape[:1]:
+        raise ValueError("`dest` must give one rank per item of `data` in ExchangeArray")
+
+    # object dtype is not supported
+    if data.dtype.hasobject:
+        raise ValueError("'object' data type not supported in ExchangeArray; please specify specific data type")
+
+    # group the items by destination, keeping their order
+    order = numpy.argsort(dest, kind='mergesort')
+    data = numpy.ascontiguousarray(data[order])
+
+    # setup the custom dtype
+    duplicity = numpy.product(numpy.array(data.shape[1:], 'intp'))
+    itemsize = duplicity * data.dtype.itemsize
+    dt = MPI.BYTE.Create_contiguous(itemsize)
+    dt.Commit()
+
+    # the send and recv counts and offsets
+    sendcounts = numpy.bincount(dest, minlength=comm.size)
+    recvcounts = numpy.array(comm.alltoall(sendcounts.tolist()), order='C')
+    sendoffsets = numpy.zeros_like(sendcounts, order='C')
+    sendoffsets[1:] = sendcounts.cumsum()[:-1]
+    recvoffsets = numpy.zeros_like(recvcounts, order='C')
+    recvoffsets[1:] = recvcounts.cumsum()[:-1]
+
+    # the return array
+    newshape = list(data.shape)
+    newshape[0] = recvcounts.sum()
+    recvbuffer = numpy.empty(newshape, dtype=data.dtype, order='C')
+
+    comm.Alltoallv([data, (sendcounts, sendoffsets), dt],
+                   [recvbuffer, (recvcounts, recvoffsets), dt])
+    dt.Free()
+    return recvbuffer
+
+def ExchangeColumns(layout, *columns):
+    """
+    Exchange several columns with a domain decomposition layout in a
+    single collective call.
+
+    The columns are packed into one structured array, such that each
+    row travels as a single record. The received columns are unpacked
+    into C-contiguous arrays, as the pair counting and painting routines
+    consuming them expect.
+
+    Parameters
+    ----------
+    layout :
+        the layout returned by the ``decompose`` method of a domain, e.g.,
+        :class:`pmesh.domain.GridND`
+    *columns : array_like
+        the columns to exchange; they must have the same length
+
+    Returns
+    -------
+    columns : tuple of array_like
+        the exchanged columns, in the order given
+    """
+    columns = [numpy.asarray(column) for column in columns]
+    if len(columns) == 1:
+        return (layout.exchange(columns[0]),)
+
+    if len(set(len(column) for column in columns)) > 1:
+        raise ValueError("all columns must have the same length in ExchangeColumns")
+
+    names = ['f%d' % i for i in range(len(columns))]
+    dtype = [(name, column.dtype, column.shape[1:]) for name, column in zip(names, columns)]
+    packed = numpy.empty(len(columns[0]), dtype=dtype)
+    for name, column in zip(names, columns):
+        packed[name] = column
+
+    packed = layout.exchange(packed)
+    return tuple(numpy.ascontiguousarray(packed[name]) for name in names)
+
 def FrontPadArray(array, front, comm):
     """ Padding an array in the front with items before this rank.
 